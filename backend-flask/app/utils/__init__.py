@@ -2,30 +2,23 @@ from functools import wraps
 from flask import jsonify
 from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
 
-def admin_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        from app.models import User
-        verify_jwt_in_request()
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        
-        if not current_user or current_user.role != 'admin':
-            return jsonify({'message': 'Admin access required'}), 403
-        
-        return f(*args, **kwargs)
-    return decorated_function
+def role_required(*roles):
+    """Restrict a route to the given roles, read from the database on every request"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            from app.models import User  # IMPORT DI DALAM FUNGSI
+            verify_jwt_in_request()
+            # This app has no token_version/blocklist check, so a role claim in the token
+            # would outlive demotions and deleted accounts; the stored role is authoritative
+            current_user = User.query.get(get_jwt_identity())
+            
+            if not current_user or current_user.role not in roles:
+                return jsonify({'message': f'{roles[0].capitalize()} access required'}), 403
+            
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
 
-def member_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        from app.models import User
-        verify_jwt_in_request()
-        current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
-        
-        if not current_user or current_user.role != 'member':
-            return jsonify({'message': 'Member access required'}), 403
-        
-        return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+admin_required = role_required('admin')
+member_required = role_required('member')
\ No newline at end of file
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark GET /api/rooms dengan logging DEBUG aktif dan nonaktif, untuk
+memastikan log debug tidak menambah biaya di jalur request saat dimatikan.
+
+Cache katalog dikosongkan tiap request agar yang diukur adalah query + serialisasi.
+Output log dibuang ke /dev/null supaya yang terukur hanya biaya di thread request.
+
+Contoh:
+    python bench_logging.py --requests 500
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from single_app import app, log, log_listener, log_event, invalidate_catalog_cache
+
+
+def time_requests(client, requests):
+    started = time.perf_counter()
+    for _ in range(requests):
+        invalidate_catalog_cache()
+        response = client.get('/api/rooms')
+        if response.status_code != 200:
+            raise RuntimeError(f'GET /api/rooms returned {response.status_code}')
+    return (time.perf_counter() - started) / requests * 1000
+
+
+def time_log_calls(calls):
+    started = time.perf_counter()
+    for i in range(calls):
+        log_event(log, logging.DEBUG, 'bench.event', index=i, room_type='Deluxe', capacity=2)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def run_benchmark(requests, calls):
+    for handler in log_listener.handlers:
+        handler.setStream(open(os.devnull, 'w'))
+    client = app.test_client()
+    client.get('/api/rooms')  # warm up connections and caches
+
+    results = {}
+    for label, level in (('off', logging.INFO), ('on', logging.DEBUG)):
+        log.setLevel(level)
+        results[label] = (time_requests(client, requests), time_log_calls(calls))
+    log.setLevel(app.config['LOG_LEVEL'])
+
+    print(f"📊 Requests per mode: {requests}, log calls per mode: {calls}")
+    for label, (request_ms, call_us) in results.items():
+        print(f"📊 DEBUG {label:>3}: GET /api/rooms {request_ms:.3f} ms/request, log_event {call_us:.3f} µs/call")
+    overhead = results['on'][0] - results['off'][0]
+    print(f"📊 Debug logging overhead: {overhead:+.3f} ms/request")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Structured logging overhead benchmark')
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--calls', type=int, default=100000)
+    args = parser.parse_args()
+
+    run_benchmark(args.requests, args.calls)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Benchmark verifikasi password (biaya utama endpoint login) dengan kebijakan
+hashing yang dikonfigurasi, dilaporkan sebagai login per detik per core.
+
+Contoh:
+    python bench_password_hashing.py --clients 32 --seconds 10
+    PASSWORD_HASH_ITERATIONS=260000 python bench_password_hashing.py
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from single_app import app, hash_password, verify_password, password_hash_method
+
+
+def run_benchmark(clients, seconds):
+    stored_hash = hash_password('benchmark-password')
+    deadline = time.perf_counter() + seconds
+    counts = [0] * clients
+
+    def client(index):
+        while time.perf_counter() < deadline:
+            if not verify_password(stored_hash, 'benchmark-password'):
+                raise RuntimeError('Password verification failed')
+            counts[index] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    total = sum(counts)
+    workers = app.config['PASSWORD_HASH_WORKERS']
+    cores = min(workers, os.cpu_count() or 1)
+    per_second = total / elapsed
+
+    print(f"🔐 Policy: {password_hash_method()}")
+    print(f"🧵 Concurrent clients: {clients}, hashing workers: {workers}, cores available: {os.cpu_count()}")
+    print(f"📊 Logins verified: {total} in {elapsed:.2f}s")
+    print(f"📊 Logins/sec: {per_second:.1f}")
+    print(f"📊 Logins/sec per core: {per_second / cores:.1f}")
+    return per_second / cores
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Password hashing throughput benchmark')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    run_benchmark(args.clients, args.seconds)
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Generator data sintetis berskala besar untuk load test dan benchmark.
+
+Semua baris ditulis lewat SQLAlchemy Core executemany per chunk (tanpa ORM),
+dengan seed tetap sehingga dataset yang sama bisa dibuat ulang. Setiap kamar
+diisi menginap yang tidak saling tumpang tindih, dengan okupansi musiman,
+status yang mengikuti tanggal hari ini, ledger room-night untuk booking aktif
+dan rating untuk sebagian booking yang sudah checked_out. Kamar yang sedang
+ditempati (booking checked_in) berstatus 'booked'.
+
+Generator hanya mengisi database kosong: id dan nomor kamar berasal dari seed,
+jadi menjalankannya lagi di atas data lama pasti bentrok. Pakai --reset.
+
+Contoh:
+    python generate_data.py --reset --rooms 200 --users 5000 --bookings 100000 --ratings 20000
+    python generate_data.py --reset --rooms 10000 --users 500000 --bookings 5000000 --ratings 1000000
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import date, datetime, time as dt_time, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from single_app import (
+    app, db, hash_password, User, RoomType, Room, Facility, FacilityRoom, Booking, BookingRoom,
+    RoomNight, Rating, ROOM_NIGHT_HOLDING_STATUSES, rebuild_dashboard_counters, rebuild_rating_summary
+)
+
+ROOM_TYPES = [
+    ('Standard', 2, 450000), ('Superior', 2, 600000), ('Deluxe', 3, 850000), ('Family', 4, 1100000),
+    ('Junior Suite', 3, 1500000), ('Executive Suite', 4, 2200000), ('Presidential Suite', 6, 5000000),
+]
+FACILITIES = [
+    ('WiFi', 'wifi'), ('AC', 'snowflake'), ('TV', 'tv'), ('Mini Bar', 'wine-glass'), ('Bathtub', 'bath'),
+    ('Balcony', 'door-open'), ('Safe', 'lock'), ('Coffee Maker', 'mug-hot'), ('City View', 'city'), ('Sea View', 'water'),
+]
+FIRST_NAMES = ['Andi', 'Budi', 'Citra', 'Dewi', 'Eka', 'Fajar', 'Gita', 'Hadi', 'Indah', 'Joko', 'Kartika', 'Lina',
+               'Made', 'Nadia', 'Oka', 'Putri', 'Rizky', 'Sari', 'Teguh', 'Wulan', 'John', 'Jane', 'Maria', 'David']
+LAST_NAMES = ['Santoso', 'Wijaya', 'Pratama', 'Saputra', 'Hidayat', 'Kusuma', 'Lestari', 'Nugroho', 'Siregar',
+              'Halim', 'Tanjung', 'Gunawan', 'Smith', 'Doe', 'Wilson', 'Johnson']
+PAYMENT_METHODS = ['credit_card', 'bank_transfer', 'e_wallet', 'cash']
+# Stay length in nights -> weight
+STAY_LENGTHS = [(1, 30), (2, 28), (3, 18), (4, 9), (5, 6), (6, 3), (7, 4), (10, 1), (14, 1)]
+# Stars -> weight; reviews lean positive
+STAR_WEIGHTS = [(5, 42), (4, 31), (3, 14), (2, 7), (1, 6)]
+COMMENTS = ['Kamar bersih dan nyaman.', 'Pelayanan ramah, sarapan enak.', 'Lokasi strategis.',
+            'AC kurang dingin.', 'Sesuai harga.', 'Akan menginap lagi!', 'Check-in agak lama.', None]
+
+
+def seasonal_factor(day):
+    """Demand multiplier: school holidays and year end are busy, weekends slightly busier"""
+    factor = {6: 1.25, 7: 1.35, 8: 1.2, 12: 1.4, 1: 0.85, 2: 0.8}.get(day.month, 1.0)
+    return factor * (1.15 if day.weekday() >= 4 else 1.0)
+
+
+class DataGenerator:
+    def __init__(self, seed, chunk_size):
+        self.rng = random.Random(seed)
+        self.chunk_size = chunk_size
+        self.counts = {}
+        self.stay_lengths, stay_weights = zip(*STAY_LENGTHS)
+        self.stay_cumulative = self._cumulative(stay_weights)
+        self.stars, star_weights = zip(*STAR_WEIGHTS)
+        self.star_cumulative = self._cumulative(star_weights)
+        self.mean_stay = sum(n * w for n, w in STAY_LENGTHS) / sum(stay_weights)
+
+    @staticmethod
+    def _cumulative(weights):
+        total, cumulative = 0, []
+        for weight in weights:
+            total += weight
+            cumulative.append(total)
+        return cumulative
+
+    def uuid(self):
+        # Derived from the seeded RNG so reruns produce identical keys
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def insert(self, connection, table, rows):
+        if rows:
+            connection.execute(table.insert(), rows)
+            self.counts[table.name] = self.counts.get(table.name, 0) + len(rows)
+
+    def insert_chunked(self, table, rows):
+        for start in range(0, len(rows), self.chunk_size):
+            with db.engine.begin() as connection:
+                self.insert(connection, table, rows[start:start + self.chunk_size])
+
+    def generate_catalog(self, room_count, room_type_count):
+        now = datetime.utcnow()
+        room_types = []
+        for i in range(room_type_count):
+            name, capacity, price = ROOM_TYPES[i % len(ROOM_TYPES)]
+            if i >= len(ROOM_TYPES):
+                name = f'{name} {i // len(ROOM_TYPES) + 1}'
+            room_types.append({'id': self.uuid(), 'name': name, 'description': f'{name} room',
+                               'created_at': now, 'capacity': capacity, 'price': price})
+        facilities = [{'id': self.uuid(), 'name': name, 'icon': icon, 'created_at': now} for name, icon in FACILITIES]
+
+        rooms, facility_rooms = [], []
+        per_floor = 40
+        for i in range(room_count):
+            # Cheaper room types are far more common than suites
+            room_type = room_types[min(int(self.rng.expovariate(1.2)), room_type_count - 1)]
+            price = round(room_type['price'] * self.rng.uniform(0.9, 1.15), -3)
+            rooms.append({
+                'id': self.uuid(),
+                'room_type_id': room_type['id'],
+                'room_number': f'G{i // per_floor + 1}{i % per_floor + 1:02d}',
+                'capacity': room_type['capacity'],
+                'price_no_breakfast': price,
+                'price_with_breakfast': price + 100000,
+                'status': 'unavailable' if self.rng.random() < 0.02 else 'available',
+                'description': f"{room_type['name']} room",
+                'created_at': now,
+            })
+            for facility in self.rng.sample(facilities, self.rng.randint(3, len(facilities))):
+                facility_rooms.append({'id': self.uuid(), 'room_id': rooms[-1]['id'], 'facility_id': facility['id']})
+
+        type_names = {room_type['id']: room_type['name'] for room_type in room_types}
+        self.insert_chunked(RoomType.__table__, [
+            {key: value for key, value in room_type.items() if key not in ('capacity', 'price')}
+            for room_type in room_types
+        ])
+        self.insert_chunked(Facility.__table__, facilities)
+        self.insert_chunked(Room.__table__, rooms)
+        self.insert_chunked(FacilityRoom.__table__, facility_rooms)
+        return rooms, type_names
+
+    def generate_users(self, user_count):
+        # One hash for every synthetic account: hashing millions of passwords would dominate the run
+        password = hash_password('password123')
+        now = datetime.utcnow()
+        user_ids = []
+        rows = [{'id': self.uuid(), 'name': 'Admin Hotel', 'email': 'admin@grandimperion.com',
+                 'password': hash_password('admin123'), 'phone': '+62812345678', 'role': 'admin',
+                 'token_version': 0, 'created_at': now}]
+        for i in range(user_count):
+            user_id = self.uuid()
+            user_ids.append(user_id)
+            rows.append({
+                'id': user_id,
+                'name': f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}',
+                'email': f'guest{i}.{user_id[:8]}@example.com',
+                'password': password,
+                'phone': f'+628{self.rng.randint(10 ** 9, 10 ** 10 - 1)}',
+                'role': 'member',
+                'token_version': 0,
+                'created_at': now - timedelta(days=self.rng.randint(0, 1500)),
+            })
+        self.insert_chunked(User.__table__, rows)
+        return user_ids
+
+    def booking_status(self, check_in, check_out, today):
+        roll = self.rng.random()
+        if check_out <= today:
+            return 'cancelled' if roll < 0.08 else 'checked_out'
+        if check_in <= today:
+            return 'checked_in'
+        if roll < 0.1:
+            return 'cancelled'
+        return 'pending' if roll < 0.3 else 'confirmed'
+
+    def generate_bookings(self, rooms, type_names, user_ids, booking_count, rating_count, occupancy, future_days):
+        """Walk each room's timeline backwards from the horizon, laying down non-overlapping stays
+        separated by seasonal gaps; the far future is sparser since most guests book a few weeks ahead"""
+        today = date.today()
+        now = datetime.utcnow()  # no generated timestamp may lie in the future
+        horizon = today + timedelta(days=future_days)
+        per_room, extra = divmod(booking_count, len(rooms))
+        cycle = self.mean_stay / occupancy
+        span_days = math.ceil((per_room + (1 if extra else 0)) * cycle)
+        # Share of stays that will have checked out, used to hit the requested number of ratings
+        past_share = max(min((span_days - future_days) / max(span_days, 1), 1.0), 0.01)
+        rating_rate = min(rating_count / max(booking_count * past_share * 0.92, 1), 1.0)
+        mean_gap = self.mean_stay * (1 - occupancy) / occupancy
+
+        buffers = {table: [] for table in (Booking.__table__, BookingRoom.__table__, RoomNight.__table__, Rating.__table__)}
+        bookings_table, booking_rooms_table, room_nights_table, ratings_table = buffers.values()
+        generated, started = 0, time.perf_counter()
+        first_day = horizon
+        occupied = []
+
+        def flush():
+            with db.engine.begin() as connection:
+                # Parents first for the foreign keys
+                for table, rows in buffers.items():
+                    self.insert(connection, table, rows)
+                    rows.clear()
+
+        for index, room in enumerate(rooms):
+            day = horizon - timedelta(days=self.rng.randint(0, max(int(cycle), 1)))
+            for _ in range(per_room + (1 if index < extra else 0)):
+                nights = self.rng.choices(self.stay_lengths, cum_weights=self.stay_cumulative)[0]
+                check_in, check_out = day - timedelta(days=nights), day
+                # Geometric gap to the previous stay: shorter in busy seasons, longer far ahead of today
+                gap_probability = seasonal_factor(check_in) / (1 + mean_gap)
+                if check_in > today:
+                    gap_probability *= max(math.exp(-(check_in - today).days / 60), 0.1)
+                gap_probability = min(gap_probability, 1.0)
+                gap = 0
+                while self.rng.random() > gap_probability:
+                    gap += 1
+                day = check_in - timedelta(days=gap)
+                first_day = min(first_day, check_in)
+
+                status = self.booking_status(check_in, check_out, today)
+                if status == 'checked_in':
+                    occupied.append(room['id'])
+                breakfast = 'with' if self.rng.random() < 0.45 else 'without'
+                price = room['price_with_breakfast'] if breakfast == 'with' else room['price_no_breakfast']
+                subtotal = price * nights
+                booking_id = self.uuid()
+                lead_days = min(int(self.rng.expovariate(1 / 21)), 365)
+                created_at = min(datetime.combine(check_in - timedelta(days=lead_days), dt_time()) + timedelta(
+                    seconds=self.rng.randint(0, 86399)), now)
+                user_id = user_ids[int(len(user_ids) * self.rng.random() ** 1.5)]  # some guests come back often
+
+                bookings_table.append({
+                    'id': booking_id, 'user_id': user_id,
+                    'nik': f'{self.rng.randint(10 ** 15, 10 ** 16 - 1)}',
+                    'guest_name': f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}',
+                    'phone': f'+628{self.rng.randint(10 ** 9, 10 ** 10 - 1)}',
+                    'check_in': check_in, 'check_out': check_out,
+                    'total_guests': self.rng.randint(1, room['capacity']),
+                    'payment_method': self.rng.choice(PAYMENT_METHODS),
+                    'total_price': subtotal, 'status': status, 'created_at': created_at,
+                })
+                booking_rooms_table.append({
+                    'id': self.uuid(), 'booking_id': booking_id, 'room_id': room['id'],
+                    'room_type': type_names[room['room_type_id']], 'quantity': 1,
+                    'breakfast_option': breakfast, 'price_per_night': price, 'subtotal': subtotal,
+                    'discount': 0.0, 'promotion_id': None,
+                })
+                if status in ROOM_NIGHT_HOLDING_STATUSES:
+                    room_nights_table.extend(
+                        {'room_id': room['id'], 'night': check_in + timedelta(days=i), 'booking_id': booking_id}
+                        for i in range(nights)
+                    )
+                elif status == 'checked_out' and self.rng.random() < rating_rate:
+                    ratings_table.append({
+                        'id': self.uuid(), 'user_id': user_id, 'booking_id': booking_id,
+                        'star': self.rng.choices(self.stars, cum_weights=self.star_cumulative)[0],
+                        'comment': self.rng.choice(COMMENTS),
+                        'created_at': min(datetime.combine(check_out, dt_time()) + timedelta(
+                            seconds=self.rng.randint(3600, 14 * 86400)), now),
+                    })
+
+                generated += 1
+                if len(bookings_table) >= self.chunk_size:
+                    flush()
+                    rate = generated / (time.perf_counter() - started)
+                    print(f"   ... {generated}/{booking_count} bookings ({rate:,.0f}/s)")
+        flush()
+        return first_day, horizon, occupied
+
+    def mark_rooms_booked(self, room_ids):
+        """Rooms with a guest checked in are 'booked', as the booking status routes leave them"""
+        rooms = Room.__table__
+        for start in range(0, len(room_ids), self.chunk_size):
+            with db.engine.begin() as connection:
+                connection.execute(rooms.update().where(rooms.c.id.in_(room_ids[start:start + self.chunk_size]))
+                                   .values(status='booked'))
+
+
+class ExistingDataError(Exception):
+    pass
+
+
+def run(args):
+    generator = DataGenerator(args.seed, args.chunk_size)
+    started = time.perf_counter()
+
+    with app.app_context():
+        if args.reset:
+            print("🧹 Dropping and recreating tables...")
+            db.drop_all()
+        db.create_all()
+        # Seeded ids and room numbers would collide with an earlier run
+        if db.session.query(Room.id).first() or db.session.query(User.id).first():
+            raise ExistingDataError('The database already has rooms or users; rerun with --reset to replace them')
+
+        print(f"🏨 Generating {args.room_types} room types and {args.rooms} rooms...")
+        rooms, type_names = generator.generate_catalog(args.rooms, args.room_types)
+        print(f"👥 Generating {args.users} users...")
+        user_ids = generator.generate_users(args.users)
+        print(f"📅 Generating {args.bookings} bookings...")
+        first_day, last_day, occupied = generator.generate_bookings(
+            rooms, type_names, user_ids, args.bookings, args.ratings, args.occupancy, args.future_days
+        )
+        generator.mark_rooms_booked(occupied)
+
+        if not args.skip_aggregates:
+            # Core inserts bypass the after_flush rollups, so recompute them once at the end
+            print("📊 Rebuilding dashboard counters and rating summaries...")
+            rebuild_dashboard_counters()
+            rebuild_rating_summary()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Done in {elapsed:.1f}s (seed {args.seed}), stays from {first_day} to {last_day}")
+    for table, count in generator.counts.items():
+        print(f"   {table}: {count:,}")
+    return generator.counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Synthetic dataset generator for load tests and benchmarks')
+    parser.add_argument('--rooms', type=int, default=200)
+    parser.add_argument('--room-types', type=int, default=len(ROOM_TYPES))
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--bookings', type=int, default=100000)
+    parser.add_argument('--ratings', type=int, default=20000, help='Approximate; limited by checked-out bookings')
+    parser.add_argument('--occupancy', type=float, default=0.7, help='Average share of booked room-nights (0-1)')
+    parser.add_argument('--future-days', type=int, default=120, help='How far past today stays are generated')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=10000, help='Rows per executemany batch')
+    parser.add_argument('--reset', action='store_true',
+                        help='Drop all tables first (like seed_data.py); required unless the database is empty')
+    parser.add_argument('--skip-aggregates', action='store_true', help='Do not rebuild dashboard/rating rollups')
+    args = parser.parse_args()
+
+    if not 0 < args.occupancy < 1:
+        parser.error('--occupancy must be between 0 and 1')
+    if args.rooms < 1 or args.users < 1 or args.room_types < 1:
+        parser.error('--rooms, --users and --room-types must be positive')
+    try:
+        run(args)
+    except ExistingDataError as e:
+        parser.exit(1, f"❌ {e}\n")
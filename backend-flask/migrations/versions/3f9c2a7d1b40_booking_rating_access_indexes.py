@@ -0,0 +1,60 @@
+"""Indexes for booking, rating, notification and maintenance access paths
+
+Revision ID: 3f9c2a7d1b40
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+Tables are still created by db.create_all(); this revision only adds the
+secondary indexes the hot queries need, skipping any that already exist
+(single_app.py also creates declared indexes on startup).
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a7d1b40'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    # Admin booking list, keyset pagination: ORDER BY created_at DESC, id DESC
+    ('ix_bookings_created_at_id', 'bookings', ['created_at', 'id']),
+    # /api/bookings/me: WHERE user_id = ? ORDER BY created_at DESC
+    ('ix_bookings_user_created_at', 'bookings', ['user_id', 'created_at']),
+    # Dashboard check-ins / check-outs and the ledger rebuild: WHERE status IN (...) AND check_in|check_out ...
+    ('ix_bookings_status_check_in', 'bookings', ['status', 'check_in']),
+    ('ix_bookings_status_check_out', 'bookings', ['status', 'check_out']),
+    # Booking detail, selectinload(Booking.booking_rooms): WHERE booking_id IN (...)
+    ('ix_booking_rooms_booking_id', 'booking_rooms', ['booking_id']),
+    # Ratings feed keyset pagination and the one-rating-per-booking check
+    ('ix_ratings_created_at_id', 'ratings', ['created_at', 'id']),
+    ('ix_ratings_booking_id', 'ratings', ['booking_id']),
+    # Notification list (keyset) and unread badge count
+    ('ix_notifications_user_created_at_id', 'notifications', ['user_id', 'created_at', 'id']),
+    ('ix_notifications_user_is_read', 'notifications', ['user_id', 'is_read']),
+    # Maintenance schedule, overall and per room
+    ('ix_room_maintenance_scheduled_date', 'room_maintenance', ['scheduled_date']),
+    ('ix_room_maintenance_room_scheduled_date', 'room_maintenance', ['room_id', 'scheduled_date']),
+]
+
+
+def existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        if name not in existing_indexes(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    # On MySQL an index that now backs a foreign key cannot be dropped until
+    # InnoDB has another index on that column; drop the constraint first if needed
+    for name, table, columns in reversed(INDEXES):
+        if name in existing_indexes(table):
+            op.drop_index(name, table_name=table)
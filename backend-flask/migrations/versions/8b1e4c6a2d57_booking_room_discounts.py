@@ -0,0 +1,39 @@
+"""Record the promotion discount applied to each booking line
+
+Revision ID: 8b1e4c6a2d57
+Revises: 3f9c2a7d1b40
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b1e4c6a2d57'
+down_revision = '3f9c2a7d1b40'
+branch_labels = None
+depends_on = None
+
+
+def existing_columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    # single_app.add_missing_columns() may already have added them on startup
+    present = existing_columns('booking_rooms')
+    with op.batch_alter_table('booking_rooms') as batch_op:
+        if 'discount' not in present:
+            batch_op.add_column(sa.Column('discount', sa.Float(), nullable=False, server_default='0'))
+        if 'promotion_id' not in present:
+            batch_op.add_column(sa.Column('promotion_id', sa.String(length=36), nullable=True))
+
+
+def downgrade():
+    present = existing_columns('booking_rooms')
+    with op.batch_alter_table('booking_rooms') as batch_op:
+        if 'promotion_id' in present:
+            batch_op.drop_column('promotion_id')
+        if 'discount' in present:
+            batch_op.drop_column('discount')
@@ -0,0 +1,142 @@
+"""Room-night ledger, dashboard/rating rollups, job queue, cache versions,
+users.token_version and room_photos.variants
+
+Revision ID: c4d2e8f1a9b3
+Revises: 8b1e4c6a2d57
+Create Date: 2026-10-18 14:00:00.000000
+
+Everything here may already exist when the app was started with
+`python single_app.py` (create_all / add_missing_columns), so each step is
+skipped when present. The rollup tables start empty and rebuild themselves on
+first read; the room-night ledger is filled from the active bookings.
+
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d2e8f1a9b3'
+down_revision = '8b1e4c6a2d57'
+branch_labels = None
+depends_on = None
+
+
+ROOM_NIGHT_HOLDING_STATUSES = ('pending', 'confirmed', 'checked_in')
+RATING_SUMMARY_FIELDS = ('count', 'star_sum', 'star_1', 'star_2', 'star_3', 'star_4', 'star_5')
+
+
+def existing_tables():
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def existing_columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def backfill_room_nights():
+    """Same rule as single_app.rebuild_room_nights(): the oldest booking keeps a contested night"""
+    bookings = sa.table('bookings', sa.column('id', sa.String), sa.column('status', sa.String),
+                        sa.column('check_in', sa.Date), sa.column('check_out', sa.Date),
+                        sa.column('created_at', sa.DateTime))
+    booking_rooms = sa.table('booking_rooms', sa.column('booking_id', sa.String), sa.column('room_id', sa.String))
+    rows = op.get_bind().execute(
+        sa.select(bookings.c.id, bookings.c.check_in, bookings.c.check_out, booking_rooms.c.room_id)
+        .join(booking_rooms, booking_rooms.c.booking_id == bookings.c.id)
+        .where(bookings.c.status.in_(ROOM_NIGHT_HOLDING_STATUSES))
+        .order_by(bookings.c.created_at)
+    ).all()
+
+    taken = set()
+    ledger = []
+    for booking_id, check_in, check_out, room_id in rows:
+        for offset in range((check_out - check_in).days):
+            night = check_in + timedelta(days=offset)
+            if (room_id, night) not in taken:
+                taken.add((room_id, night))
+                ledger.append({'room_id': room_id, 'night': night, 'booking_id': booking_id})
+    if ledger:
+        room_nights = sa.table('room_nights', sa.column('room_id', sa.String), sa.column('night', sa.Date),
+                               sa.column('booking_id', sa.String))
+        op.bulk_insert(room_nights, ledger)
+
+
+def upgrade():
+    tables = existing_tables()
+
+    if 'room_nights' not in tables:
+        op.create_table(
+            'room_nights',
+            sa.Column('room_id', sa.String(length=36), sa.ForeignKey('rooms.id'), primary_key=True),
+            sa.Column('night', sa.Date(), primary_key=True),
+            sa.Column('booking_id', sa.String(length=36), sa.ForeignKey('bookings.id'), nullable=False),
+        )
+        op.create_index('ix_room_nights_booking_id', 'room_nights', ['booking_id'])
+        backfill_room_nights()
+
+    # Counters used to live in one row each; the sharded table rebuilds from the source tables
+    if 'dashboard_counters' in tables:
+        op.drop_table('dashboard_counters')
+    if 'dashboard_counter_shards' not in tables:
+        op.create_table(
+            'dashboard_counter_shards',
+            sa.Column('name', sa.String(length=50), primary_key=True),
+            sa.Column('shard', sa.SmallInteger(), primary_key=True, autoincrement=False),
+            sa.Column('value', sa.Float(), nullable=False, server_default='0'),
+        )
+
+    if 'rating_summary' not in tables:
+        op.create_table(
+            'rating_summary',
+            sa.Column('scope', sa.String(length=36), primary_key=True),
+            *[sa.Column(field, sa.Integer(), nullable=False, server_default='0') for field in RATING_SUMMARY_FIELDS],
+        )
+
+    if 'jobs' not in tables:
+        op.create_table(
+            'jobs',
+            sa.Column('id', sa.String(length=36), primary_key=True),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('payload', sa.JSON(), nullable=False),
+            sa.Column('status', sa.Enum('queued', 'running', 'done', 'failed'), nullable=False, server_default='queued'),
+            sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('max_attempts', sa.Integer(), nullable=False, server_default='5'),
+            sa.Column('run_at', sa.DateTime(), nullable=False),
+            sa.Column('locked_at', sa.DateTime(), nullable=True),
+            sa.Column('locked_by', sa.String(length=100), nullable=True),
+            sa.Column('last_error', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_jobs_status_run_at', 'jobs', ['status', 'run_at'])
+
+    if 'cache_versions' not in tables:
+        op.create_table(
+            'cache_versions',
+            sa.Column('name', sa.String(length=50), primary_key=True),
+            sa.Column('version', sa.Integer(), nullable=False, server_default='0'),
+        )
+
+    if 'token_version' not in existing_columns('users'):
+        with op.batch_alter_table('users') as batch_op:
+            batch_op.add_column(sa.Column('token_version', sa.Integer(), nullable=False, server_default='0'))
+
+    if 'variants' not in existing_columns('room_photos'):
+        with op.batch_alter_table('room_photos') as batch_op:
+            batch_op.add_column(sa.Column('variants', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    if 'variants' in existing_columns('room_photos'):
+        with op.batch_alter_table('room_photos') as batch_op:
+            batch_op.drop_column('variants')
+    if 'token_version' in existing_columns('users'):
+        with op.batch_alter_table('users') as batch_op:
+            batch_op.drop_column('token_version')
+
+    tables = existing_tables()
+    for table in ('cache_versions', 'jobs', 'rating_summary', 'dashboard_counter_shards', 'room_nights'):
+        if table in tables:
+            op.drop_table(table)
@@ -1,29 +1,200 @@
 # single_app.py - FIXED CORS COMPLETE SOLUTION
+import atexit
+import base64
+import csv
+import click
+import gzip
+import hashlib
+import io
+import json
+import logging
+import logging.handlers
+import math
+import mimetypes
 import os
+import queue
+import random
+import re
+import socket
+import sys
+import threading
+import time
 import uuid
-from datetime import datetime
-from flask import Flask, request, jsonify, send_from_directory
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache, wraps
+from flask import Flask, Response, request, jsonify, send_file, make_response, g, has_app_context, has_request_context, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as FlaskSQLAlchemySession
 from flask_migrate import Migrate
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt, get_jwt_identity, get_jwt_request_location
 from flask_cors import CORS
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
 from werkzeug.utils import secure_filename
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.exc import IntegrityError, OperationalError
 from dotenv import load_dotenv
 
+try:
+    import brotli
+except ImportError:  # optional: gzip is used when brotli is not installed
+    brotli = None
+
+try:
+    import numpy
+except ImportError:  # optional: the availability calendar falls back to pure Python
+    numpy = None
+
 load_dotenv()
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or 'dev-secret-key'
 
-# LARAGON MYSQL CONFIG
-app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql+pymysql://root:@localhost/hotel_db'
+# LARAGON MYSQL CONFIG (override with DATABASE_URL)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or 'mysql+pymysql://root:@localhost/hotel_db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+def engine_options(url):
+    """Connection pool settings from the environment"""
+    options = {
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true',
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+    # SQLite (used for local testing) does not take queue pool sizing
+    if not url.startswith('sqlite'):
+        options.update({
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+            'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        })
+    return options
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+if os.environ.get('DATABASE_REPLICA_URL'):
+    replica_url = os.environ['DATABASE_REPLICA_URL']
+    app.config['SQLALCHEMY_BINDS'] = {'replica': {'url': replica_url, **engine_options(replica_url)}}
+# A client's reads stay on the primary this long after it commits a write (read-your-writes)
+app.config['DB_REPLICA_STICKY_SECONDS'] = float(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))
 app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key'
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
-
-db = SQLAlchemy(app)
+app.config['DB_TRANSACTION_RETRIES'] = int(os.environ.get('DB_TRANSACTION_RETRIES', 3))
+app.config['CATALOG_CACHE_TTL'] = int(os.environ.get('CATALOG_CACHE_TTL', 300))
+app.config['CATALOG_CACHE_MAX_ENTRIES'] = int(os.environ.get('CATALOG_CACHE_MAX_ENTRIES', 256))
+app.config['CATALOG_VERSION_CHECK_SECONDS'] = float(os.environ.get('CATALOG_VERSION_CHECK_SECONDS', 5))
+app.config['DEFAULT_PAGE_SIZE'] = int(os.environ.get('DEFAULT_PAGE_SIZE', 50))
+app.config['MAX_PAGE_SIZE'] = int(os.environ.get('MAX_PAGE_SIZE', 200))
+app.config['EXPORT_BATCH_SIZE'] = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))  # rows per server-side fetch and per chunk written
+app.config['TOKEN_VERSION_CACHE_TTL'] = int(os.environ.get('TOKEN_VERSION_CACHE_TTL', 60))
+app.config['PASSWORD_HASH_ALGORITHM'] = os.environ.get('PASSWORD_HASH_ALGORITHM', 'pbkdf2:sha256')
+app.config['PASSWORD_HASH_ITERATIONS'] = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 600000))
+app.config['JSON_CACHE_MAX_AGE'] = int(os.environ.get('JSON_CACHE_MAX_AGE', 0))
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+app.config['COMPRESS_GZIP_LEVEL'] = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+app.config['COMPRESS_BROTLI_QUALITY'] = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5))
+app.config['UPLOADS_MAX_AGE'] = int(os.environ.get('UPLOADS_MAX_AGE', 86400))
+# '' serves bytes from Python, 'x-accel' hands them to nginx, 'x-sendfile' to Apache/lighttpd
+app.config['UPLOADS_OFFLOAD'] = os.environ.get('UPLOADS_OFFLOAD', '')
+app.config['UPLOADS_ACCEL_PREFIX'] = os.environ.get('UPLOADS_ACCEL_PREFIX', '/protected-uploads')
+app.config['USE_X_SENDFILE'] = app.config['UPLOADS_OFFLOAD'] == 'x-sendfile'
+app.config['PHOTO_VARIANT_SIZES'] = {'thumb': 480, 'large': 1280}  # longest edge in px
+app.config['NOTIFICATION_STREAM_HEARTBEAT'] = int(os.environ.get('NOTIFICATION_STREAM_HEARTBEAT', 15))
+app.config['NOTIFICATION_STREAM_QUEUE_SIZE'] = int(os.environ.get('NOTIFICATION_STREAM_QUEUE_SIZE', 100))
+app.config['NOTIFICATION_STREAM_TOKEN_TTL'] = int(os.environ.get('NOTIFICATION_STREAM_TOKEN_TTL', 60))  # seconds
+app.config['NOTIFICATION_STREAM_POLL_INTERVAL'] = float(os.environ.get('NOTIFICATION_STREAM_POLL_INTERVAL', 5))  # per process; 0 = broker only
+app.config['NOTIFICATION_STREAM_LOOKBACK'] = int(os.environ.get('NOTIFICATION_STREAM_LOOKBACK', 60))  # seconds a commit may lag created_at
+app.config['SLOW_QUERY_THRESHOLD_MS'] = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200))
+app.config['SQL_QUERY_BUDGET'] = int(os.environ.get('SQL_QUERY_BUDGET', 0))  # 0 disables the default budget
+app.config['SQL_QUERY_BUDGET_STRICT'] = os.environ.get('SQL_QUERY_BUDGET_STRICT', 'false').lower() == 'true'
+app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO').upper()
+app.config['LOG_DEBUG_SAMPLE_RATE'] = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', 1.0))
+app.config['LOG_QUEUE_SIZE'] = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+app.config['DASHBOARD_COUNTER_SHARDS'] = int(os.environ.get('DASHBOARD_COUNTER_SHARDS', 8))
+app.config['BULK_STATUS_MAX_BOOKINGS'] = int(os.environ.get('BULK_STATUS_MAX_BOOKINGS', 500))
+app.config['CALENDAR_MAX_DAYS'] = int(os.environ.get('CALENDAR_MAX_DAYS', 93))
+app.config['PRICING_HORIZON_DAYS'] = int(os.environ.get('PRICING_HORIZON_DAYS', 365))
+app.config['JOB_MAX_ATTEMPTS'] = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+app.config['JOB_RETRY_BASE_SECONDS'] = float(os.environ.get('JOB_RETRY_BASE_SECONDS', 10))
+app.config['JOB_RETRY_MAX_SECONDS'] = float(os.environ.get('JOB_RETRY_MAX_SECONDS', 3600))
+app.config['JOB_LOCK_TIMEOUT'] = int(os.environ.get('JOB_LOCK_TIMEOUT', 600))  # reclaim jobs of crashed workers
+app.config['JOB_POLL_INTERVAL'] = float(os.environ.get('JOB_POLL_INTERVAL', 2))
+app.config['JOB_RETENTION_HOURS'] = int(os.environ.get('JOB_RETENTION_HOURS', 72))
+app.config['JOB_LOCAL_WORKER'] = os.environ.get('JOB_LOCAL_WORKER', 'true').lower() == 'true'
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+
+# LOGGING
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, event and the record's fields"""
+    
+    def format(self, record):
+        entry = {
+            'ts': datetime.utcfromtimestamp(record.created).isoformat(timespec='milliseconds') + 'Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'event': record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks the request: records are dropped (and counted) when the queue is full"""
+    dropped = 0
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+def setup_logging():
+    """JSON lines on stdout, written by a background listener thread"""
+    log_queue = queue.Queue(maxsize=app.config['LOG_QUEUE_SIZE'])
+    queue_handler = DroppingQueueHandler(log_queue)
+    # Formatting happens on the caller's thread, only the write is deferred
+    queue_handler.setFormatter(JsonFormatter())
+    
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter('%(message)s'))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    
+    logger = logging.getLogger('hotel')
+    logger.setLevel(app.config['LOG_LEVEL'])
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+    return logger, listener
+
+log, log_listener = setup_logging()
+
+def log_event(logger, level, event, **fields):
+    """Structured log call; free when the level is off, DEBUG is sampled by LOG_DEBUG_SAMPLE_RATE"""
+    if not logger.isEnabledFor(level):
+        return
+    if level <= logging.DEBUG and random.random() >= app.config['LOG_DEBUG_SAMPLE_RATE']:
+        return
+    if has_request_context():
+        fields.setdefault('method', request.method)
+        fields.setdefault('path', request.path)
+    logger.log(level, event, extra={'fields': fields}, exc_info=level >= logging.ERROR and sys.exc_info()[0] is not None)
+
+class RoutingSession(FlaskSQLAlchemySession):
+    """Sends queries of @read_replica routes to the 'replica' bind; everything else uses the primary"""
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and has_app_context() and g.get('use_replica')
+                and 'replica' in self._db.engines
+                and not (clause is not None and getattr(clause, 'is_dml', False))):
+            return self._db.engines['replica']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
 migrate = Migrate(app, db)
 jwt = JWTManager(app)
 
@@ -78,6 +249,36 @@ def handle_preflight():
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'rooms'), exist_ok=True)
 
+# PASSWORD HASHING
+# Hashing runs on a bounded pool so a login storm cannot occupy more than
+# PASSWORD_HASH_WORKERS cores per process; request threads wait for the result.
+password_hash_executor = ThreadPoolExecutor(
+    max_workers=app.config['PASSWORD_HASH_WORKERS'],
+    thread_name_prefix='password-hash'
+)
+
+def password_hash_method():
+    """Werkzeug method string for the configured hashing policy"""
+    algorithm = app.config['PASSWORD_HASH_ALGORITHM']
+    if algorithm.startswith('pbkdf2'):
+        return f"{algorithm}:{app.config['PASSWORD_HASH_ITERATIONS']}"
+    return algorithm
+
+@lru_cache(maxsize=8)
+def _hash_prefix(method):
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+def hash_password(password):
+    method = password_hash_method()
+    return password_hash_executor.submit(generate_password_hash, password, method=method).result()
+
+def verify_password(password_hash, password):
+    return password_hash_executor.submit(check_password_hash, password_hash, password).result()
+
+def password_needs_rehash(password_hash):
+    """True when a stored hash was made with a different algorithm or cost than the current policy"""
+    return password_hash.split('$', 1)[0] != _hash_prefix(password_hash_method())
+
 # MODELS
 def generate_uuid():
     return str(uuid.uuid4())
@@ -91,13 +292,15 @@ class User(db.Model):
     password = db.Column(db.String(255), nullable=False)
     phone = db.Column(db.String(20))
     role = db.Column(db.Enum('admin', 'member'), default='member')
+    # Bumped to revoke every access token issued to the user
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def set_password(self, password):
-        self.password = generate_password_hash(password)
+        self.password = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password, password)
+        return verify_password(self.password, password)
 
 class RoomType(db.Model):
     __tablename__ = 'room_types'
@@ -116,7 +319,8 @@ class Room(db.Model):
     capacity = db.Column(db.Integer, nullable=False)
     price_no_breakfast = db.Column(db.Float, nullable=False)
     price_with_breakfast = db.Column(db.Float, nullable=False)
-    status = db.Column(db.Enum('available', 'unavailable', 'booked'), default='available')
+    # active_history keeps the previous value available to the dashboard counters
+    status = db.column_property(db.Column(db.Enum('available', 'unavailable', 'booked'), default='available'), active_history=True)
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -129,17 +333,37 @@ class RoomPhoto(db.Model):
     room_id = db.Column(db.String(36), db.ForeignKey('rooms.id'), nullable=False)
     photo_path = db.Column(db.String(255), nullable=False)
     is_primary = db.Column(db.Boolean, default=False)
+    # {size: {'webp': path, 'jpeg': path}}, filled in by the photo pipeline
+    variants = db.Column(db.JSON, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     room = db.relationship('Room', backref='photos')
     
     def delete_photo_file(self):
-        """Hapus file foto dari filesystem"""
-        try:
-            if os.path.exists(self.photo_path):
-                os.remove(self.photo_path)
-        except Exception as e:
-            print(f"Error deleting photo file: {e}")
+        """Hapus file foto (beserta variannya) dari filesystem"""
+        # Content-addressed files are shared by identical uploads
+        if RoomPhoto.query.filter(RoomPhoto.photo_path == self.photo_path, RoomPhoto.id != self.id).first():
+            return
+        paths = [self.photo_path]
+        for formats in (self.variants or {}).values():
+            paths.extend(formats.values())
+        for path in paths:
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except Exception as e:
+                print(f"Error deleting photo file: {e}")
+    
+    def url(self, size=None):
+        """Public URL of the WebP variant for size, or of the original while variants are pending"""
+        variant = (self.variants or {}).get(size)
+        return f"/{variant['webp'] if variant else self.photo_path}"
+    
+    def variant_urls(self):
+        return {
+            size: {fmt: f"/{path}" for fmt, path in formats.items()}
+            for size, formats in (self.variants or {}).items()
+        }
 
 class Facility(db.Model):
     __tablename__ = 'facilities'
@@ -171,11 +395,18 @@ class Booking(db.Model):
     check_out = db.Column(db.Date, nullable=False)
     total_guests = db.Column(db.Integer, nullable=False)
     payment_method = db.Column(db.String(50), nullable=False)
-    total_price = db.Column(db.Float, nullable=False)
-    status = db.Column(db.Enum('pending', 'confirmed', 'checked_in', 'checked_out', 'cancelled'), default='pending')
+    total_price = db.column_property(db.Column(db.Float, nullable=False), active_history=True)
+    status = db.column_property(db.Column(db.Enum('pending', 'confirmed', 'checked_in', 'checked_out', 'cancelled'), default='pending'), active_history=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     user = db.relationship('User', backref='bookings')
+    
+    __table_args__ = (
+        db.Index('ix_bookings_created_at_id', 'created_at', 'id'),
+        db.Index('ix_bookings_user_created_at', 'user_id', 'created_at'),
+        db.Index('ix_bookings_status_check_in', 'status', 'check_in'),
+        db.Index('ix_bookings_status_check_out', 'status', 'check_out'),
+    )
 
 class BookingRoom(db.Model):
     __tablename__ = 'booking_rooms'
@@ -188,9 +419,15 @@ class BookingRoom(db.Model):
     breakfast_option = db.Column(db.Enum('with', 'without'), nullable=False)
     price_per_night = db.Column(db.Float, nullable=False)
     subtotal = db.Column(db.Float, nullable=False)
+    discount = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    promotion_id = db.Column(db.String(36), nullable=True)  # kept after the promotion is deleted
     
     booking = db.relationship('Booking', backref='booking_rooms')
     room = db.relationship('Room', backref='booking_rooms')
+    
+    __table_args__ = (
+        db.Index('ix_booking_rooms_booking_id', 'booking_id'),
+    )
 
 class Rating(db.Model):
     __tablename__ = 'ratings'
@@ -204,6 +441,11 @@ class Rating(db.Model):
     
     user = db.relationship('User', backref='ratings')
     booking = db.relationship('Booking', backref='rating')
+    
+    __table_args__ = (
+        db.Index('ix_ratings_created_at_id', 'created_at', 'id'),
+        db.Index('ix_ratings_booking_id', 'booking_id'),
+    )
 
 # NEW MODELS FOR ENHANCED FEATURES
 
@@ -267,6 +509,11 @@ class RoomMaintenance(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     room = db.relationship('Room', backref='maintenance_records')
+    
+    __table_args__ = (
+        db.Index('ix_room_maintenance_scheduled_date', 'scheduled_date'),
+        db.Index('ix_room_maintenance_room_scheduled_date', 'room_id', 'scheduled_date'),
+    )
 
 class Notification(db.Model):
     __tablename__ = 'notifications'
@@ -282,6 +529,1543 @@ class Notification(db.Model):
     
     user = db.relationship('User', backref='notifications')
     booking = db.relationship('Booking', backref='notifications')
+    
+    __table_args__ = (
+        db.Index('ix_notifications_user_created_at_id', 'user_id', 'created_at', 'id'),
+        db.Index('ix_notifications_user_is_read', 'user_id', 'is_read'),
+    )
+
+class RoomNight(db.Model):
+    """Room-night inventory ledger: one row per (room, night) held by an active booking"""
+    __tablename__ = 'room_nights'
+    
+    room_id = db.Column(db.String(36), db.ForeignKey('rooms.id'), primary_key=True)
+    night = db.Column(db.Date, primary_key=True)
+    booking_id = db.Column(db.String(36), db.ForeignKey('bookings.id'), nullable=False, index=True)
+
+# Booking statuses that hold their rooms in the room-night ledger
+ROOM_NIGHT_HOLDING_STATUSES = ('pending', 'confirmed', 'checked_in')
+
+def stay_nights(check_in, check_out):
+    """Every night of a stay, check-in inclusive and check-out exclusive"""
+    return [check_in + timedelta(days=i) for i in range((check_out - check_in).days)]
+
+def reserve_room_nights(booking_id, room_ids, check_in, check_out):
+    """Insert ledger rows for a booking; a taken night raises IntegrityError"""
+    rows = [
+        {'room_id': room_id, 'night': night, 'booking_id': booking_id}
+        for room_id in set(room_ids)
+        for night in stay_nights(check_in, check_out)
+    ]
+    if rows:
+        db.session.execute(RoomNight.__table__.insert(), rows)
+
+def release_room_nights(booking_id):
+    """Free every ledger row held by a booking"""
+    RoomNight.query.filter_by(booking_id=booking_id).delete(synchronize_session=False)
+
+def rebuild_room_nights():
+    """Repopulate the ledger from bookings (for databases created before the ledger existed)"""
+    RoomNight.query.delete(synchronize_session=False)
+    rows = db.session.query(
+        Booking.id, Booking.check_in, Booking.check_out, BookingRoom.room_id
+    ).join(BookingRoom, BookingRoom.booking_id == Booking.id).filter(
+        Booking.status.in_(ROOM_NIGHT_HOLDING_STATUSES)
+    ).order_by(Booking.created_at).all()
+    
+    taken = set()
+    ledger = []
+    for booking_id, check_in, check_out, room_id in rows:
+        for night in stay_nights(check_in, check_out):
+            if (room_id, night) not in taken:
+                taken.add((room_id, night))
+                ledger.append({'room_id': room_id, 'night': night, 'booking_id': booking_id})
+    if ledger:
+        db.session.execute(RoomNight.__table__.insert(), ledger)
+    db.session.commit()
+    return len(ledger)
+
+# MySQL deadlock / lock wait timeout, SQLite busy database
+RETRYABLE_DB_ERROR_CODES = {1213, 1205}
+
+def is_retryable_db_error(error):
+    orig = getattr(error, 'orig', None)
+    code = orig.args[0] if orig is not None and orig.args else None
+    return code in RETRYABLE_DB_ERROR_CODES or 'database is locked' in str(orig)
+
+def run_in_transaction(operation):
+    """Run operation (which commits itself), retrying on deadlock or lock timeout"""
+    attempts = app.config['DB_TRANSACTION_RETRIES']
+    for attempt in range(1, attempts + 1):
+        try:
+            return operation()
+        except OperationalError as e:
+            db.session.rollback()
+            if attempt == attempts or not is_retryable_db_error(e):
+                raise
+            time.sleep(0.05 * 2 ** (attempt - 1))
+
+# Booking state machine: allowed next statuses (setting the current status again is a no-op)
+BOOKING_TRANSITIONS = {
+    'pending': ('confirmed', 'cancelled'),
+    'confirmed': ('pending', 'checked_in', 'cancelled'),
+    'checked_in': ('checked_out',),
+    'checked_out': (),
+    'cancelled': ('pending', 'confirmed'),
+}
+
+def booking_transition_error(old_status, new_status):
+    """Why a booking may not move from old_status to new_status, or None"""
+    if new_status not in BOOKING_TRANSITIONS:
+        return 'Invalid status'
+    if new_status != old_status and new_status not in BOOKING_TRANSITIONS[old_status]:
+        return f'Cannot change booking status from {old_status} to {new_status}'
+    return None
+
+def room_status_after_transition(old_status, new_status):
+    """Status the booking's rooms take after a transition, or None to leave them"""
+    if new_status == old_status:
+        return None
+    if new_status in ('cancelled', 'checked_out'):
+        return 'available'
+    if old_status == 'cancelled':
+        return 'booked'
+    return None
+
+def set_booking_rooms_status(booking_ids, status):
+    """One UPDATE for every room of the given bookings; the dashboard rollup is
+    adjusted here because bulk UPDATEs bypass the after_flush counters"""
+    rooms = Room.__table__
+    booked_rooms = rooms.c.id.in_(db.select(BookingRoom.room_id).where(BookingRoom.booking_id.in_(booking_ids)))
+    if status == 'available':
+        changed = db.session.execute(rooms.update().where(booked_rooms, rooms.c.status != 'available').values(status=status))
+        delta = changed.rowcount
+    else:
+        changed = db.session.execute(rooms.update().where(booked_rooms, rooms.c.status == 'available').values(status=status))
+        delta = -changed.rowcount
+        db.session.execute(rooms.update().where(booked_rooms, rooms.c.status.notin_((status, 'available'))).values(status=status))
+    queue_dashboard_deltas(db.session, {'rooms_available': delta})
+
+def transition_bookings(bookings, new_status):
+    """Move already validated bookings to new_status with set-based room and ledger
+    changes; returns the (booking_id, old_status) pairs that changed (caller commits)"""
+    changed = [(booking, booking.status) for booking in bookings if booking.status != new_status]
+    if not changed:
+        return []
+    
+    room_updates = {}
+    released, reserved = [], []
+    for booking, old_status in changed:
+        room_status = room_status_after_transition(old_status, new_status)
+        if room_status:
+            room_updates.setdefault(room_status, []).append(booking.id)
+        # Keep the room-night ledger in sync with the booking's hold on its rooms
+        was_holding = old_status in ROOM_NIGHT_HOLDING_STATUSES
+        will_hold = new_status in ROOM_NIGHT_HOLDING_STATUSES
+        if was_holding and not will_hold:
+            released.append(booking.id)
+        elif will_hold and not was_holding:
+            reserved.append(booking)
+    
+    for room_status, booking_ids in room_updates.items():
+        set_booking_rooms_status(booking_ids, room_status)
+    if released:
+        RoomNight.query.filter(RoomNight.booking_id.in_(released)).delete(synchronize_session=False)
+    if reserved:
+        stays = {booking.id: booking for booking in reserved}
+        booked_rooms = db.session.query(BookingRoom.booking_id, BookingRoom.room_id).filter(
+            BookingRoom.booking_id.in_(list(stays))
+        ).distinct().all()
+        rows = [
+            {'room_id': room_id, 'night': night, 'booking_id': booking_id}
+            for booking_id, room_id in booked_rooms
+            for night in stay_nights(stays[booking_id].check_in, stays[booking_id].check_out)
+        ]
+        if rows:
+            # A night taken meanwhile raises IntegrityError
+            db.session.execute(RoomNight.__table__.insert(), rows)
+    
+    for booking, old_status in changed:
+        booking.status = new_status
+        enqueue_job('booking_status_changed', {
+            'booking_id': booking.id,
+            'old_status': old_status,
+            'new_status': new_status
+        })
+    return [(booking.id, old_status) for booking, old_status in changed]
+
+# Availability calendar cell codes
+CALENDAR_FREE, CALENDAR_BOOKED, CALENDAR_MAINTENANCE = 0, 1, 2
+MAINTENANCE_BLOCKING_STATUSES = ('scheduled', 'in_progress')
+
+def occupancy_matrix(room_count, days, booked, maintenance):
+    """Paint [start, end) day intervals per room row; one string of cell codes per room"""
+    if numpy is not None:
+        def paint(intervals):
+            painted = numpy.zeros((room_count, days + 1), dtype=numpy.int32)
+            if intervals:
+                rows, starts, ends = numpy.array(intervals, dtype=numpy.int64).T
+                numpy.add.at(painted, (rows, starts), 1)
+                numpy.add.at(painted, (rows, ends), -1)
+            return numpy.cumsum(painted, axis=1)[:, :days] > 0
+        
+        codes = numpy.full((room_count, days), CALENDAR_FREE, dtype=numpy.uint8)
+        codes[paint(booked)] = CALENDAR_BOOKED
+        codes[paint(maintenance)] = CALENDAR_MAINTENANCE
+        cells = codes + ord('0')
+        return [row.tobytes().decode('ascii') for row in cells]
+    
+    cells = [bytearray(b'0' * days) for _ in range(room_count)]
+    for code, intervals in ((CALENDAR_BOOKED, booked), (CALENDAR_MAINTENANCE, maintenance)):
+        marker = str(code).encode('ascii')
+        for row, start, end in intervals:
+            cells[row][start:end] = marker * (end - start)
+    return [row.decode('ascii') for row in cells]
+
+class DashboardCounter(db.Model):
+    """Rollup of dashboard statistics, maintained incrementally on every commit.
+    
+    Each counter is spread over shard rows and its value is their sum, so concurrent
+    bookings mostly update different rows instead of queueing on one row lock.
+    """
+    __tablename__ = 'dashboard_counter_shards'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    shard = db.Column(db.SmallInteger, primary_key=True, autoincrement=False, default=0)
+    value = db.Column(db.Float, nullable=False, default=0)
+
+REVENUE_STATUSES = ('checked_out', 'confirmed')
+CHECKIN_STATUSES = ('confirmed', 'checked_in')
+CHECKOUT_STATUSES = ('checked_in', 'checked_out')
+
+def booking_counters(status, check_in, check_out, total_price):
+    counters = {'bookings': 1}
+    if status == 'pending':
+        counters['bookings_pending'] = 1
+    if status in REVENUE_STATUSES:
+        counters['revenue'] = total_price
+    if status in CHECKIN_STATUSES:
+        counters[f'checkins:{check_in.isoformat()}'] = 1
+    if status in CHECKOUT_STATUSES:
+        counters[f'checkouts:{check_out.isoformat()}'] = 1
+    return counters
+
+def room_counters(status):
+    return {'rooms': 1, 'rooms_available': 1 if status == 'available' else 0}
+
+def rating_counters(star):
+    return {'ratings': 1, 'rating_star_sum': star}
+
+# Model -> (attributes the counters depend on, function computing its contribution)
+COUNTED_MODELS = {
+    Booking: (('status', 'check_in', 'check_out', 'total_price'), booking_counters),
+    Room: (('status',), room_counters),
+    Rating: (('star',), rating_counters),
+}
+
+def _counter_values(obj, attrs, previous):
+    state = db.inspect(obj)
+    values = []
+    for attr in attrs:
+        history = state.attrs[attr].history
+        if previous and history.deleted:
+            values.append(history.deleted[0])
+        else:
+            values.append(getattr(obj, attr))
+    return values
+
+def _add_counters(deltas, counters, sign):
+    for name, value in counters.items():
+        deltas[name] = deltas.get(name, 0) + sign * (value or 0)
+
+def upsert_rows(connection, table, keys, rows, fields, accumulate):
+    """Insert rows; on a conflict on the keys columns add to (accumulate) or overwrite the existing fields"""
+    dialect = connection.dialect.name
+    if dialect == 'mysql':
+        stmt = mysql.insert(table).values(rows)
+        stmt = stmt.on_duplicate_key_update({
+            field: table.c[field] + stmt.inserted[field] if accumulate else stmt.inserted[field] for field in fields
+        })
+    else:
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(index_elements=list(keys), set_={
+            field: table.c[field] + stmt.excluded[field] if accumulate else stmt.excluded[field] for field in fields
+        })
+    connection.execute(stmt)
+
+def lock_rollup(model):
+    """Serialize a rollup rebuild with concurrent bumps; call before reading the source tables.
+    
+    Row (and on MySQL gap) locks on the whole rollup make bumping transactions wait for the
+    rebuild. SQLite has no row locks, so an empty write takes its database write lock instead.
+    """
+    table = model.__table__
+    key = list(table.primary_key)[0]
+    if db.session.get_bind().dialect.name == 'sqlite':
+        db.session.execute(table.delete().where(key.is_(None)))
+    else:
+        db.session.execute(db.select(key).with_for_update()).all()
+
+def bump_dashboard_counters(connection, deltas, shard):
+    """Atomically add deltas to one shard's counter rows, creating missing rows"""
+    rows = [{'name': name, 'shard': shard, 'value': value} for name, value in sorted(deltas.items()) if value]
+    if rows:
+        upsert_rows(connection, DashboardCounter.__table__, ('name', 'shard'), rows, ('value',), accumulate=True)
+
+def queue_dashboard_deltas(session, deltas):
+    """Add to the transaction's counter changes; they are written once, just before commit"""
+    _add_counters(session.info.setdefault('dashboard_deltas', {}), deltas, 1)
+
+@event.listens_for(db.session, 'after_flush')
+def maintain_dashboard_counters(session, flush_context):
+    deltas = {}
+    for obj in session.new:
+        if type(obj) in COUNTED_MODELS:
+            attrs, counters = COUNTED_MODELS[type(obj)]
+            _add_counters(deltas, counters(*_counter_values(obj, attrs, False)), 1)
+    for obj in session.dirty:
+        if type(obj) in COUNTED_MODELS and session.is_modified(obj):
+            attrs, counters = COUNTED_MODELS[type(obj)]
+            _add_counters(deltas, counters(*_counter_values(obj, attrs, True)), -1)
+            _add_counters(deltas, counters(*_counter_values(obj, attrs, False)), 1)
+    for obj in session.deleted:
+        if type(obj) in COUNTED_MODELS:
+            attrs, counters = COUNTED_MODELS[type(obj)]
+            _add_counters(deltas, counters(*_counter_values(obj, attrs, True)), -1)
+    queue_dashboard_deltas(session, deltas)
+
+@event.listens_for(db.session, 'before_commit')
+def apply_dashboard_deltas(session):
+    # One sorted upsert per transaction, however often it flushed: the row locks are taken in
+    # one order and held for the COMMIT round trip only, on a shard picked per transaction
+    session.flush()
+    deltas = session.info.pop('dashboard_deltas', None)
+    if deltas:
+        bump_dashboard_counters(session.connection(), deltas, random.randrange(app.config['DASHBOARD_COUNTER_SHARDS']))
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def discard_dashboard_deltas(session, previous_transaction):
+    session.info.pop('dashboard_deltas', None)
+
+def compute_dashboard_totals(today):
+    """Fallback: dashboard totals with conditional aggregation, one query per table"""
+    case = db.case
+    bookings = db.session.query(
+        db.func.count(Booking.id),
+        db.func.sum(case((Booking.status == 'pending', 1), else_=0)),
+        db.func.sum(case((Booking.status.in_(REVENUE_STATUSES), Booking.total_price), else_=0)),
+        db.func.sum(case((db.and_(Booking.check_in == today, Booking.status.in_(CHECKIN_STATUSES)), 1), else_=0)),
+        db.func.sum(case((db.and_(Booking.check_out == today, Booking.status.in_(CHECKOUT_STATUSES)), 1), else_=0))
+    ).one()
+    rooms = db.session.query(
+        db.func.count(Room.id),
+        db.func.sum(case((Room.status == 'available', 1), else_=0))
+    ).one()
+    ratings = db.session.query(db.func.count(Rating.id), db.func.sum(Rating.star)).one()
+    
+    return {
+        'bookings': bookings[0],
+        'bookings_pending': bookings[1] or 0,
+        'revenue': bookings[2] or 0.0,
+        f'checkins:{today.isoformat()}': bookings[3] or 0,
+        f'checkouts:{today.isoformat()}': bookings[4] or 0,
+        'rooms': rooms[0],
+        'rooms_available': rooms[1] or 0,
+        'ratings': ratings[0],
+        'rating_star_sum': ratings[1] or 0
+    }
+
+def rebuild_dashboard_counters():
+    """Recompute the whole rollup, including per-day check-in/check-out counts from today on"""
+    lock_rollup(DashboardCounter)
+    today = datetime.now().date()
+    counters = compute_dashboard_totals(today)
+    for column, statuses, prefix in ((Booking.check_in, CHECKIN_STATUSES, 'checkins'),
+                                     (Booking.check_out, CHECKOUT_STATUSES, 'checkouts')):
+        per_day = db.session.query(column, db.func.count(Booking.id)).filter(
+            column >= today,
+            Booking.status.in_(statuses)
+        ).group_by(column).all()
+        for day, count in per_day:
+            counters[f'{prefix}:{day.isoformat()}'] = count
+    counters['initialized'] = 1
+    
+    # Overwrite in place, all in shard 0: concurrent first reads may rebuild at the same time
+    DashboardCounter.query.filter(db.or_(
+        DashboardCounter.shard != 0,
+        DashboardCounter.name.notin_(list(counters))
+    )).delete(synchronize_session=False)
+    upsert_rows(db.session.connection(), DashboardCounter.__table__, ('name', 'shard'),
+                [{'name': name, 'shard': 0, 'value': value} for name, value in sorted(counters.items())],
+                ('value',), accumulate=False)
+    db.session.commit()
+    return counters
+
+def read_dashboard_counters():
+    """Dashboard rollup in one primary-key range scan, rebuilding it on first use"""
+    today = datetime.now().date()
+    names = ['initialized', 'bookings', 'bookings_pending', 'revenue', 'rooms', 'rooms_available',
+             'ratings', 'rating_star_sum', f'checkins:{today.isoformat()}', f'checkouts:{today.isoformat()}']
+    counters = dict(db.session.query(DashboardCounter.name, db.func.sum(DashboardCounter.value)).filter(
+        DashboardCounter.name.in_(names)
+    ).group_by(DashboardCounter.name).all())
+    if 'initialized' not in counters:
+        db.session.rollback()  # the rebuild must not read through this transaction's snapshot
+        counters = run_in_transaction(rebuild_dashboard_counters)
+    return dashboard_stats(counters, today)
+
+def dashboard_stats(counters, today):
+    """Dashboard figures from rollup counters (read_dashboard_counters or compute_dashboard_totals)"""
+    today = today.isoformat()
+    ratings = int(counters.get('ratings', 0))
+    return {
+        'total_bookings': int(counters.get('bookings', 0)),
+        'total_rooms': int(counters.get('rooms', 0)),
+        'available_rooms': int(counters.get('rooms_available', 0)),
+        'total_revenue': float(counters.get('revenue', 0.0)),
+        'pending_bookings': int(counters.get('bookings_pending', 0)),
+        'today_checkins': int(counters.get(f'checkins:{today}', 0)),
+        'today_checkouts': int(counters.get(f'checkouts:{today}', 0)),
+        'total_reviews': ratings,
+        'user_reviews': ratings,
+        'average_rating': counters.get('rating_star_sum', 0) / ratings if ratings else 0.0
+    }
+
+class RatingSummary(db.Model):
+    """Rating aggregate per scope: the whole hotel or one room type"""
+    __tablename__ = 'rating_summary'
+    
+    scope = db.Column(db.String(36), primary_key=True)  # RATING_SUMMARY_HOTEL or a room type id
+    count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    star_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    star_1 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    star_2 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    star_3 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    star_4 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    star_5 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+RATING_SUMMARY_HOTEL = 'hotel'
+RATING_SUMMARY_MARKER = 'initialized'
+RATING_SUMMARY_FIELDS = ('count', 'star_sum', 'star_1', 'star_2', 'star_3', 'star_4', 'star_5')
+
+def rating_room_type_ids(connection, booking_id):
+    """Room types a rating counts towards: those of its booking's rooms"""
+    return connection.execute(
+        db.select(Room.room_type_id).distinct()
+        .join(BookingRoom, BookingRoom.room_id == Room.id)
+        .where(BookingRoom.booking_id == booking_id, Room.room_type_id.isnot(None))
+    ).scalars().all()
+
+def _add_rating(deltas, scopes, star, sign):
+    for scope in scopes:
+        row = deltas.setdefault(scope, dict.fromkeys(RATING_SUMMARY_FIELDS, 0))
+        row['count'] += sign
+        row['star_sum'] += sign * star
+        if 1 <= star <= 5:
+            row[f'star_{star}'] += sign
+
+def bump_rating_summary(connection, deltas):
+    """Atomically add per-scope deltas, creating missing rows"""
+    rows = [dict(scope=scope, **values) for scope, values in sorted(deltas.items()) if any(values.values())]
+    if rows:
+        upsert_rows(connection, RatingSummary.__table__, ('scope',), rows, RATING_SUMMARY_FIELDS, accumulate=True)
+
+@event.listens_for(db.session, 'after_flush')
+def maintain_rating_summary(session, flush_context):
+    deltas = {}
+    connection = None
+    for obj, sign in [(obj, 1) for obj in session.new] + [(obj, -1) for obj in session.deleted]:
+        if isinstance(obj, Rating):
+            connection = connection or session.connection()
+            scopes = [RATING_SUMMARY_HOTEL] + rating_room_type_ids(connection, obj.booking_id)
+            star = obj.star if sign > 0 else _counter_values(obj, ('star',), True)[0]
+            _add_rating(deltas, scopes, star, sign)
+    for obj in session.dirty:
+        if isinstance(obj, Rating) and db.inspect(obj).attrs.star.history.has_changes():
+            connection = connection or session.connection()
+            scopes = [RATING_SUMMARY_HOTEL] + rating_room_type_ids(connection, obj.booking_id)
+            _add_rating(deltas, scopes, _counter_values(obj, ('star',), True)[0], -1)
+            _add_rating(deltas, scopes, obj.star, 1)
+    if deltas:
+        bump_rating_summary(connection, deltas)
+
+def rebuild_rating_summary():
+    """Recompute every scope from the ratings table"""
+    lock_rollup(RatingSummary)
+    star_columns = [db.func.sum(db.case((Rating.star == star, 1), else_=0)) for star in range(1, 6)]
+    hotel = db.session.query(db.func.count(Rating.id), db.func.sum(Rating.star), *star_columns).one()
+    # A rating counts once for each distinct room type in its booking
+    per_booking_type = db.session.query(Rating.id, Rating.star, Room.room_type_id).join(
+        BookingRoom, BookingRoom.booking_id == Rating.booking_id
+    ).join(Room, Room.id == BookingRoom.room_id).filter(Room.room_type_id.isnot(None)).distinct().subquery()
+    per_type = db.session.query(
+        per_booking_type.c.room_type_id,
+        db.func.count(per_booking_type.c.id),
+        db.func.sum(per_booking_type.c.star),
+        *[db.func.sum(db.case((per_booking_type.c.star == star, 1), else_=0)) for star in range(1, 6)]
+    ).group_by(per_booking_type.c.room_type_id).all()
+    
+    rows = [dict(zip(('scope',) + RATING_SUMMARY_FIELDS, (RATING_SUMMARY_HOTEL,) + tuple(value or 0 for value in hotel)))]
+    rows += [dict(zip(('scope',) + RATING_SUMMARY_FIELDS, (row[0],) + tuple(value or 0 for value in row[1:]))) for row in per_type]
+    rows.append(dict.fromkeys(RATING_SUMMARY_FIELDS, 0) | {'scope': RATING_SUMMARY_MARKER})
+    
+    # Overwrite in place: concurrent first reads may rebuild at the same time
+    RatingSummary.query.filter(RatingSummary.scope.notin_([row['scope'] for row in rows])).delete(synchronize_session=False)
+    upsert_rows(db.session.connection(), RatingSummary.__table__, ('scope',), rows, RATING_SUMMARY_FIELDS, accumulate=False)
+    db.session.commit()
+    return len(rows) - 1
+
+def rating_summary_payload(row):
+    return {
+        'count': row.count,
+        'average': round(row.star_sum / row.count, 2) if row.count else 0.0,
+        'histogram': {str(star): getattr(row, f'star_{star}') for star in range(1, 6)}
+    }
+
+def read_rating_summary():
+    """Hotel-wide and per room type summaries in one query, rebuilding on first use"""
+    rows = db.session.query(RatingSummary, RoomType.name).outerjoin(
+        RoomType, RoomType.id == RatingSummary.scope
+    ).all()
+    if not any(summary.scope == RATING_SUMMARY_MARKER for summary, _ in rows):
+        db.session.rollback()  # the rebuild must not read through this transaction's snapshot
+        run_in_transaction(rebuild_rating_summary)
+        rows = db.session.query(RatingSummary, RoomType.name).outerjoin(
+            RoomType, RoomType.id == RatingSummary.scope
+        ).all()
+    
+    hotel = {'count': 0, 'average': 0.0, 'histogram': {str(star): 0 for star in range(1, 6)}}
+    room_types = []
+    for summary, room_type_name in rows:
+        if summary.scope == RATING_SUMMARY_HOTEL:
+            hotel = rating_summary_payload(summary)
+        elif summary.scope != RATING_SUMMARY_MARKER and summary.count:
+            room_types.append(dict(room_type_id=summary.scope, room_type_name=room_type_name,
+                                   **rating_summary_payload(summary)))
+    room_types.sort(key=lambda room_type: room_type['room_type_name'] or '')
+    return {'hotel': hotel, 'room_types': room_types}
+
+def add_missing_columns():
+    """ALTER existing tables to add columns declared on models after the table was created"""
+    inspector = db.inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in present:
+                    column_ddl = CreateColumn(column).compile(dialect=connection.dialect)
+                    connection.execute(db.text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+
+def ensure_indexes():
+    """Create model indexes missing from tables that existed before they were declared"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+def encode_cursor(created_at, row_id):
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+class InvalidCursor(ValueError):
+    pass
+
+def decode_cursor(cursor):
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+        return datetime.fromisoformat(created_at), row_id
+    except ValueError:
+        raise InvalidCursor('Invalid cursor')
+
+def keyset_page(query, model):
+    """Page a query newest-first on (created_at, id) using the limit/cursor request args.
+    
+    Returns (items, next_cursor); next_cursor is None on the last page. Without
+    limit or cursor the whole list is returned, as before pagination existed.
+    """
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        return query.order_by(model.created_at.desc(), model.id.desc()).all(), None
+    
+    limit = request.args.get('limit', app.config['DEFAULT_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, app.config['MAX_PAGE_SIZE']))
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(db.or_(
+            model.created_at < created_at,
+            db.and_(model.created_at == created_at, model.id < row_id)
+        ))
+    
+    items = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+    return items, next_cursor
+
+def room_listing_options():
+    """Eager-load room relations so room listings run a fixed number of queries"""
+    return (
+        db.joinedload(Room.room_type),
+        db.selectinload(Room.photos),
+        db.selectinload(Room.facility_rooms).joinedload(FacilityRoom.facility)
+    )
+
+# CATALOG CACHE
+class LRUCache:
+    """Process-local TTL + LRU cache"""
+    
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.generation = 0
+        self.cleared_at = float('-inf')
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return payload
+    
+    def set(self, key, payload, generation=None):
+        with self._lock:
+            # Drop payloads built from data that was invalidated mid-request
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self.cleared_at = time.monotonic()
+            self._entries.clear()
+
+catalog_cache = LRUCache(app.config['CATALOG_CACHE_TTL'], app.config['CATALOG_CACHE_MAX_ENTRIES'])
+
+class CacheVersion(db.Model):
+    """Shared invalidation counter, so a process can drop caches another process made stale"""
+    __tablename__ = 'cache_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+catalog_version = {'seen': None, 'checked_at': float('-inf')}
+
+def bump_catalog_version():
+    """Add one to the shared catalog version in the current transaction"""
+    upsert_rows(db.session.connection(), CacheVersion.__table__, ('name',),
+                [{'name': 'catalog', 'version': 1}], ('version',), accumulate=True)
+
+def clear_catalog_caches():
+    """Drop this process's catalog-derived caches: listings, facility index, pricing, homepage reviews"""
+    catalog_cache.clear()
+    facility_index.invalidate()
+    pricing_engine.invalidate()
+    recent_reviews_cache.clear()
+    catalog_version['checked_at'] = float('-inf')
+
+def sync_catalog_cache():
+    """Clear the catalog caches if another process moved the shared catalog version.
+    
+    Checked at most every CATALOG_VERSION_CHECK_SECONDS; the cache TTLs are only a backstop.
+    """
+    now = time.monotonic()
+    if now - catalog_version['checked_at'] < app.config['CATALOG_VERSION_CHECK_SECONDS']:
+        return
+    version = db.session.query(CacheVersion.version).filter_by(name='catalog').scalar() or 0
+    if catalog_version['seen'] is not None and version != catalog_version['seen']:
+        clear_catalog_caches()
+    catalog_version['seen'] = version
+    catalog_version['checked_at'] = now
+
+def catalog_cached(f):
+    """Serve a public catalog GET from catalog_cache, keyed by path and query string"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        sync_catalog_cache()
+        key = request.full_path
+        entry = catalog_cache.get(key)
+        if entry is not None:
+            payload, etag = entry
+            response = app.response_class(payload, status=200, mimetype='application/json')
+            response.set_etag(etag, weak=True)
+            return response
+        
+        generation = catalog_cache.generation
+        response = make_response(f(*args, **kwargs))
+        # Right after a clear the replica may still lack the change; its rows are served but not kept
+        lagging = (g.get('use_replica')
+                   and time.monotonic() - catalog_cache.cleared_at < app.config['DB_REPLICA_STICKY_SECONDS'])
+        if response.status_code == 200:
+            payload = response.get_data()
+            etag = payload_etag(payload)
+            response.set_etag(etag, weak=True)
+            if not lagging:
+                catalog_cache.set(key, (payload, etag), generation)
+        return response
+    return decorated_function
+
+def invalidate_catalog_cache():
+    """Call before committing any change to rooms, room types, facilities, services, bookings,
+    promotions or ratings: the commit bumps the shared version, so every process drops its copies"""
+    db.session.info['catalog_invalidated'] = True
+
+@event.listens_for(db.session, 'before_commit')
+def bump_invalidated_catalog(session):
+    # Last statement before COMMIT, so the version row stays locked for one round trip only
+    if session.info.get('catalog_invalidated'):
+        bump_catalog_version()
+
+@event.listens_for(db.session, 'after_commit')
+def clear_invalidated_catalog(session):
+    if session.info.pop('catalog_invalidated', False):
+        clear_catalog_caches()
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def discard_invalidated_catalog(session, previous_transaction):
+    session.info.pop('catalog_invalidated', None)
+
+# Homepage reviews: newest ratings with the reviewer's name, keyed by limit
+recent_reviews_cache = LRUCache(app.config['CATALOG_CACHE_TTL'], 32)
+
+# READ-YOUR-WRITES
+# Wall-clock time of the client's last committed write, so any process can compare it
+LAST_WRITE_COOKIE = 'last_write'
+
+@app.before_request
+def reset_read_routing():
+    # g outlives the request when an app context was already pushed (CLI, tests)
+    g.use_replica = False
+    g.pop('last_write_at', None)
+
+@event.listens_for(db.session, 'after_flush')
+def mark_flushed_write(session, flush_context):
+    session.info['wrote'] = True
+
+@event.listens_for(db.session, 'do_orm_execute')
+def mark_statement_write(orm_execute_state):
+    # Bulk UPDATE/DELETE/INSERT statements bypass the flush
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info['wrote'] = True
+
+@event.listens_for(db.session, 'after_commit')
+def record_committed_write(session):
+    if session.info.pop('wrote', False) and has_request_context():
+        g.last_write_at = time.time()
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def discard_uncommitted_write(session, previous_transaction):
+    session.info.pop('wrote', None)
+
+@app.after_request
+def remember_last_write(response):
+    """Tell the client when it last wrote, for DB_REPLICA_STICKY_SECONDS"""
+    sticky = app.config['DB_REPLICA_STICKY_SECONDS']
+    if g.get('last_write_at') is not None and sticky > 0:
+        response.set_cookie(LAST_WRITE_COOKIE, f'{g.last_write_at:.3f}', max_age=math.ceil(sticky),
+                            httponly=True, samesite='Lax')
+    return response
+
+def wrote_recently():
+    """Whether this client committed a write within DB_REPLICA_STICKY_SECONDS"""
+    try:
+        last_write = float(request.cookies.get(LAST_WRITE_COOKIE, '-inf'))
+    except ValueError:
+        return False
+    return time.time() - last_write < app.config['DB_REPLICA_STICKY_SECONDS']
+
+def read_replica(f):
+    """Run a read-only route against the replica bind when one is configured; a client
+    that wrote recently reads from the primary, so it sees its own changes"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.use_replica = 'replica' in db.engines and not wrote_recently()
+        return f(*args, **kwargs)
+    return decorated_function
+
+# FACILITY INDEX
+class FacilityBitmapIndex:
+    """Facility filter as bitwise ops: one bitset per facility, one bit per room"""
+    
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.generation = 0
+        self._snapshot = None
+        self._built_at = float('-inf')
+        self._lock = threading.Lock()
+    
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._snapshot = None
+    
+    def snapshot(self):
+        """(room positions, facility bitsets), rebuilt from facility_room when stale"""
+        sync_catalog_cache()
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._built_at < self.ttl:
+            return snapshot
+        
+        generation = self.generation
+        positions = {}
+        bitsets = {}
+        for room_id, facility_id in db.session.query(FacilityRoom.room_id, FacilityRoom.facility_id):
+            position = positions.setdefault(room_id, len(positions))
+            bitsets[facility_id] = bitsets.get(facility_id, 0) | (1 << position)
+        snapshot = (positions, bitsets)
+        
+        with self._lock:
+            if generation == self.generation:
+                self._snapshot = snapshot
+                self._built_at = time.monotonic()
+        return snapshot
+    
+    def rooms_with_all(self, facility_ids):
+        """Bitset of the rooms that have every facility in facility_ids"""
+        positions, bitsets = self.snapshot()
+        matches = (1 << len(positions)) - 1
+        for facility_id in set(facility_ids):
+            matches &= bitsets.get(facility_id, 0)
+        return positions, matches
+    
+    def facet_counts(self, room_ids):
+        """Per-facility number of rooms among room_ids"""
+        positions, bitsets = self.snapshot()
+        rooms = 0
+        for room_id in room_ids:
+            position = positions.get(room_id)
+            if position is not None:
+                rooms |= 1 << position
+        return {facility_id: (bits & rooms).bit_count() for facility_id, bits in bitsets.items()}
+
+facility_index = FacilityBitmapIndex(app.config['CATALOG_CACHE_TTL'])
+
+# PROMOTION PRICING
+class PromotionPricingEngine:
+    """Active promotions compiled into per (room type, check-in date) best-discount tables"""
+    
+    def __init__(self, ttl, horizon_days):
+        self.ttl = ttl
+        self.horizon_days = horizon_days
+        self.generation = 0
+        self._snapshot = None
+        self._built_at = float('-inf')
+        self._lock = threading.Lock()
+    
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._snapshot = None
+    
+    @staticmethod
+    def discount_steps(promotions):
+        """Best (percentage, fixed) discount for every stay length up to the largest min_nights"""
+        longest = max(promo[3] for promo in promotions)
+        steps = []
+        best_percentage = best_fixed = (0.0, None)
+        for nights in range(longest + 1):
+            for promo_id, discount_type, value, min_nights in promotions:
+                if min_nights != nights:
+                    continue
+                if discount_type == 'percentage':
+                    best_percentage = max(best_percentage, (min(value, 100.0), promo_id), key=lambda best: best[0])
+                else:
+                    best_fixed = max(best_fixed, (value, promo_id), key=lambda best: best[0])
+            steps.append((best_percentage, best_fixed))
+        return steps
+    
+    def compile(self):
+        today = datetime.now().date()
+        horizon_end = today + timedelta(days=self.horizon_days)
+        rows = db.session.query(
+            Promotion.id, Promotion.discount_type, Promotion.discount_value, Promotion.min_nights,
+            Promotion.valid_from, Promotion.valid_until, Promotion.room_type_id
+        ).filter(Promotion.is_active == True, Promotion.valid_until >= today).all()
+        
+        promotions = [(row[0], row[1], row[2] or 0.0, max(row[3] or 1, 1), row[4], row[5], row[6]) for row in rows]
+        room_types = {promo[6] for promo in promotions} | {None}
+        table = {}
+        for room_type_id in room_types:
+            # Promotions without a room type apply to every type
+            candidates = [promo for promo in promotions if promo[6] in (room_type_id, None)]
+            day = today
+            while day <= horizon_end:
+                valid = [promo[:4] for promo in candidates if promo[4] <= day <= promo[5]]
+                if valid:
+                    table[(room_type_id, day)] = self.discount_steps(valid)
+                day += timedelta(days=1)
+        return today, horizon_end, promotions, table
+    
+    def snapshot(self):
+        sync_catalog_cache()
+        snapshot = self._snapshot
+        if (snapshot is not None and snapshot[0] == datetime.now().date()
+                and time.monotonic() - self._built_at < self.ttl):
+            return snapshot
+        
+        generation = self.generation
+        snapshot = self.compile()
+        with self._lock:
+            if generation == self.generation:
+                self._snapshot = snapshot
+                self._built_at = time.monotonic()
+        return snapshot
+    
+    def best_discount(self, room_type_id, check_in, nights, amount):
+        """(discount, promotion_id) for a booking line worth amount; (0.0, None) when nothing applies"""
+        today, horizon_end, promotions, table = self.snapshot()
+        if today <= check_in <= horizon_end:
+            steps = table.get((room_type_id, check_in)) or table.get((None, check_in))
+        else:
+            # Outside the compiled window: evaluate the promotions directly
+            valid = [promo[:4] for promo in promotions
+                     if promo[6] in (room_type_id, None) and promo[4] <= check_in <= promo[5]]
+            steps = self.discount_steps(valid) if valid else None
+        if not steps:
+            return 0.0, None
+        
+        (percentage, percentage_id), (fixed, fixed_id) = steps[min(nights, len(steps) - 1)]
+        by_percentage = amount * percentage / 100
+        by_fixed = min(fixed, amount)
+        if by_percentage >= by_fixed:
+            return round(by_percentage, 2), percentage_id
+        return round(by_fixed, 2), fixed_id
+
+pricing_engine = PromotionPricingEngine(app.config['CATALOG_CACHE_TTL'], app.config['PRICING_HORIZON_DAYS'])
+
+def quote_room_line(room, breakfast_option, quantity, check_in, nights):
+    """Price one booking line, applying the best eligible promotion"""
+    price_per_night = room.price_with_breakfast if breakfast_option == 'with' else room.price_no_breakfast
+    gross = price_per_night * quantity * nights
+    discount, promotion_id = pricing_engine.best_discount(room.room_type_id, check_in, nights, gross)
+    return {
+        'price_per_night': price_per_night,
+        'gross': gross,
+        'discount': discount,
+        'promotion_id': promotion_id,
+        'subtotal': gross - discount
+    }
+
+# SQL INSTRUMENTATION
+slow_query_logger = logging.getLogger('hotel.slow_query')
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_query_time(conn, cursor, statement, parameters, context, executemany):
+    elapsed = (time.perf_counter() - conn.info['query_start_time'].pop()) * 1000
+    if not has_request_context() or 'sql_stats' not in g:
+        return
+    stats = g.sql_stats
+    stats['count'] += 1
+    stats['time'] += elapsed
+    if elapsed > stats['slowest_time']:
+        stats['slowest_time'] = elapsed
+        stats['slowest'] = statement
+    if elapsed >= app.config['SLOW_QUERY_THRESHOLD_MS']:
+        log_event(
+            slow_query_logger, logging.WARNING, 'slow_query',
+            duration_ms=round(elapsed, 2),
+            endpoint=request.endpoint,
+            database=conn.engine.url.database,
+            executemany=executemany,
+            statement=' '.join(statement.split())[:2000]
+        )
+
+def query_budget(max_queries):
+    """Cap the number of SQL statements a route may run (see SQL_QUERY_BUDGET_STRICT)"""
+    def decorator(f):
+        f.query_budget = max_queries
+        return f
+    return decorator
+
+@app.before_request
+def start_sql_stats():
+    g.sql_stats = {'count': 0, 'time': 0.0, 'slowest_time': 0.0, 'slowest': None}
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def add_server_timing(response):
+    """Expose per-request query count, DB time and the slowest statement as Server-Timing"""
+    # Popped so the error response of a strict budget failure is not checked twice
+    stats = g.pop('sql_stats', None)
+    if stats is None:
+        return response
+    
+    total = (time.perf_counter() - g.request_started) * 1000
+    timings = [
+        f'db;dur={stats["time"]:.2f};desc="{stats["count"]} queries"',
+        f'app;dur={total:.2f}'
+    ]
+    if stats['slowest'] is not None:
+        timings.append(f'db-slowest;dur={stats["slowest_time"]:.2f}')
+    response.headers.add('Server-Timing', ', '.join(timings))
+    
+    view = app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None) or app.config['SQL_QUERY_BUDGET']
+    if budget and stats['count'] > budget:
+        message = f'{request.method} {request.path} ran {stats["count"]} queries (budget {budget})'
+        if app.config['SQL_QUERY_BUDGET_STRICT']:
+            raise QueryBudgetExceeded(message)
+        log_event(
+            slow_query_logger, logging.WARNING, 'query_budget_exceeded',
+            endpoint=request.endpoint,
+            queries=stats['count'],
+            budget=budget
+        )
+    return response
+
+# HTTP CACHING & COMPRESSION
+# Compressed bodies keyed by (etag, encoding); the ETag is a content hash so entries never go stale
+compressed_cache = LRUCache(24 * 60 * 60, 512)
+
+def payload_etag(payload):
+    return hashlib.sha1(payload).hexdigest()[:20]
+
+def compress_payload(payload, encoding):
+    if encoding == 'br':
+        return brotli.compress(payload, quality=app.config['COMPRESS_BROTLI_QUALITY'])
+    return gzip.compress(payload, compresslevel=app.config['COMPRESS_GZIP_LEVEL'])
+
+@app.after_request
+def conditional_and_compressed_json(response):
+    """Weak ETag + 304 and gzip/brotli for successful JSON GET responses"""
+    if (request.method not in ('GET', 'HEAD') or response.status_code != 200
+            or response.mimetype != 'application/json'
+            or response.direct_passthrough or response.is_streamed):
+        return response
+    
+    payload = response.get_data()
+    etag, _ = response.get_etag()
+    if etag is None:
+        etag = payload_etag(payload)
+        response.set_etag(etag, weak=True)
+    
+    if 'Cache-Control' not in response.headers:
+        # Per-user data must never land in a shared cache
+        if 'Authorization' in request.headers:
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+        elif app.config['JSON_CACHE_MAX_AGE']:
+            response.cache_control.public = True
+            response.cache_control.max_age = app.config['JSON_CACHE_MAX_AGE']
+        else:
+            response.cache_control.public = True
+            response.cache_control.no_cache = True
+    
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    if len(payload) < app.config['COMPRESS_MIN_SIZE'] or 'Content-Encoding' in response.headers:
+        return response
+    
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        encoding = 'br'
+    elif accepted['gzip']:
+        encoding = 'gzip'
+    else:
+        return response
+    
+    compressed = compressed_cache.get((etag, encoding))
+    if compressed is None:
+        compressed = compress_payload(payload, encoding)
+        compressed_cache.set((etag, encoding), compressed)
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+# JOB QUEUE
+class Job(db.Model):
+    """Durable background job, inserted in the same transaction as the change that caused it"""
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.Enum('queued', 'running', 'done', 'failed'), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    locked_by = db.Column(db.String(100), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+
+JOB_HANDLERS = {}
+job_wakeup = threading.Event()
+
+def job_handler(name):
+    """Register f as the handler for jobs called name; it receives the payload as keyword arguments"""
+    def decorator(f):
+        JOB_HANDLERS[name] = f
+        return f
+    return decorator
+
+def enqueue_job(name, payload=None, delay=0):
+    """Add a job to the current transaction; workers only see it once the caller commits"""
+    job = Job(
+        name=name,
+        payload=payload or {},
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+        max_attempts=app.config['JOB_MAX_ATTEMPTS']
+    )
+    db.session.add(job)
+    return job
+
+@event.listens_for(db.session, 'after_flush')
+def note_enqueued_jobs(session, flush_context):
+    if any(isinstance(obj, Job) and obj.status == 'queued' for obj in session.new):
+        session.info['jobs_enqueued'] = True
+
+@event.listens_for(db.session, 'after_commit')
+def wake_job_worker(session):
+    # Lets an in-process worker pick the job up now instead of at its next poll
+    if session.info.pop('jobs_enqueued', False):
+        job_wakeup.set()
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def forget_enqueued_jobs(session, previous_transaction):
+    session.info.pop('jobs_enqueued', None)
+
+def job_backoff(attempts):
+    """Exponential backoff with jitter, in seconds"""
+    delay = min(app.config['JOB_RETRY_BASE_SECONDS'] * 2 ** (attempts - 1), app.config['JOB_RETRY_MAX_SECONDS'])
+    return delay + random.uniform(0, delay / 10)
+
+def claim_jobs(worker_id, limit):
+    """Mark up to limit due jobs as running for this worker; safe with several workers"""
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=app.config['JOB_LOCK_TIMEOUT'])
+    due = db.or_(
+        db.and_(Job.status == 'queued', Job.run_at <= now),
+        db.and_(Job.status == 'running', Job.locked_at < stale)
+    )
+    candidates = db.session.query(Job.id).filter(due).order_by(Job.run_at).limit(limit).all()
+    
+    claimed = []
+    for (job_id,) in candidates:
+        # Conditional UPDATE: only one worker can win a given job
+        updated = Job.query.filter(Job.id == job_id, due).update({
+            'status': 'running',
+            'locked_by': worker_id,
+            'locked_at': now,
+            'attempts': Job.attempts + 1
+        }, synchronize_session=False)
+        if updated:
+            claimed.append(job_id)
+    db.session.commit()
+    return claimed
+
+def run_job(job_id):
+    """Run one claimed job; its handler's changes commit together with the job's completion"""
+    job = db.session.get(Job, job_id)
+    name, payload = job.name, dict(job.payload or {})
+    try:
+        handler = JOB_HANDLERS.get(name)
+        if handler is None:
+            raise LookupError(f'No handler registered for job {name}')
+        handler(**payload)
+        
+        job = db.session.get(Job, job_id)
+        job.status = 'done'
+        job.finished_at = datetime.utcnow()
+        job.locked_by = None
+        db.session.commit()
+        log_event(log, logging.DEBUG, 'job.done', job_id=job_id, job=name)
+        return True
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(Job, job_id)
+        job.last_error = f'{type(e).__name__}: {e}'
+        job.locked_by = None
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = 'queued'
+            job.run_at = datetime.utcnow() + timedelta(seconds=job_backoff(job.attempts))
+        db.session.commit()
+        log_event(log, logging.ERROR if job.status == 'failed' else logging.WARNING, 'job.' + job.status,
+                  job_id=job_id, job=name, attempts=job.attempts, error=str(e))
+        return False
+
+def purge_finished_jobs():
+    """Delete completed jobs past the retention window; failed jobs are kept for inspection"""
+    cutoff = datetime.utcnow() - timedelta(hours=app.config['JOB_RETENTION_HOURS'])
+    deleted = Job.query.filter(Job.status == 'done', Job.finished_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+def run_worker(worker_id=None, batch_size=10, once=False):
+    """Process due jobs until stopped (or, with once, until none are due)"""
+    worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+    last_purge = float('-inf')
+    while True:
+        with app.app_context():
+            try:
+                claimed = claim_jobs(worker_id, batch_size)
+                for job_id in claimed:
+                    run_job(job_id)
+                if time.monotonic() - last_purge > 3600:
+                    purge_finished_jobs()
+                    last_purge = time.monotonic()
+            except Exception as e:
+                db.session.rollback()
+                claimed = []
+                log_event(log, logging.ERROR, 'job.worker_error', worker=worker_id, error=str(e))
+        
+        if once and not claimed:
+            return
+        if not claimed:
+            job_wakeup.wait(app.config['JOB_POLL_INTERVAL'])
+            job_wakeup.clear()
+
+def start_local_worker():
+    """Run the job worker on a daemon thread of this process (development server)"""
+    worker = threading.Thread(target=run_worker, name='job-worker', daemon=True)
+    worker.start()
+    return worker
+
+BOOKING_STATUS_MESSAGES = {
+    'confirmed': ('Booking confirmed', 'Your booking for {check_in} - {check_out} has been confirmed.'),
+    'checked_in': ('Checked in', 'Welcome! You are checked in until {check_out}.'),
+    'checked_out': ('Checked out', 'Thank you for staying with us. We would love a rating of your stay.'),
+    'cancelled': ('Booking cancelled', 'Your booking for {check_in} - {check_out} has been cancelled.'),
+    'pending': ('Booking pending', 'Your booking for {check_in} - {check_out} is waiting for confirmation.'),
+}
+
+@job_handler('booking_created')
+def booking_created_job(booking_id):
+    booking = db.session.get(Booking, booking_id)
+    if booking:
+        notify_user(booking.user_id, 'Booking received',
+                    f'Your booking for {booking.check_in.isoformat()} - {booking.check_out.isoformat()} '
+                    f'is waiting for confirmation.', type='booking', booking_id=booking.id)
+
+@job_handler('booking_status_changed')
+def booking_status_changed_job(booking_id, old_status, new_status):
+    booking = db.session.get(Booking, booking_id)
+    if booking and new_status in BOOKING_STATUS_MESSAGES:
+        title, message = BOOKING_STATUS_MESSAGES[new_status]
+        notify_user(booking.user_id, title,
+                    message.format(check_in=booking.check_in.isoformat(), check_out=booking.check_out.isoformat()),
+                    type='booking', booking_id=booking.id)
+
+@job_handler('booking_service_added')
+def booking_service_added_job(booking_service_id):
+    booking_service = db.session.get(BookingService, booking_service_id)
+    if booking_service:
+        notify_user(booking_service.booking.user_id, 'Service added',
+                    f'{booking_service.service.name} x{booking_service.quantity} was added to your booking.',
+                    type='booking', booking_id=booking_service.booking_id)
+
+# PHOTO PIPELINE
+def build_photo_variants(photo_path):
+    """Write resized WebP and JPEG copies of an original next to it"""
+    from PIL import Image, ImageOps
+    
+    base, _ = os.path.splitext(photo_path)
+    variants = {}
+    with Image.open(photo_path) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+        for size, edge in app.config['PHOTO_VARIANT_SIZES'].items():
+            resized = image.copy()
+            resized.thumbnail((edge, edge), Image.LANCZOS)
+            # The edge is part of the name so a size change never reuses a cached URL
+            webp_path = f"{base}_{size}{edge}.webp"
+            jpeg_path = f"{base}_{size}{edge}.jpg"
+            resized.save(webp_path, 'WEBP', quality=80, method=4)
+            resized.save(jpeg_path, 'JPEG', quality=85, optimize=True, progressive=True)
+            variants[size] = {'webp': webp_path, 'jpeg': jpeg_path}
+    return variants
+
+@job_handler('process_room_photo')
+def process_room_photo(photo_id):
+    photo = db.session.get(RoomPhoto, photo_id)
+    if not photo:
+        return
+    photo.variants = build_photo_variants(photo.photo_path)
+    # run_job commits; web processes see the version bump and drop their cached listings
+    invalidate_catalog_cache()
+
+def schedule_photo_processing(photos):
+    """Queue variant generation for new RoomPhoto rows (caller commits)"""
+    if photos:
+        db.session.flush()
+    for photo in photos:
+        enqueue_job('process_room_photo', {'photo_id': photo.id})
+
+# AUTHORIZATION
+token_version_cache = LRUCache(app.config['TOKEN_VERSION_CACHE_TTL'], 10000)
+
+def create_user_token(user):
+    """Access token carrying the user's role and token version as claims"""
+    return create_access_token(
+        identity=user.id,
+        additional_claims={'role': user.role, 'ver': user.token_version or 0}
+    )
+
+def current_token_version(user_id):
+    version = token_version_cache.get(user_id)
+    if version is None:
+        version = db.session.query(User.token_version).filter_by(id=user_id).scalar()
+        # Deleted users get a version no token can match
+        version = -1 if version is None else version
+        token_version_cache.set(user_id, version)
+    return version
+
+def revoke_user_tokens(user):
+    """Invalidate every token issued to user so far (caller commits)"""
+    user.token_version = (user.token_version or 0) + 1
+    # The cache follows the database only once the bump is committed
+    db.session.info.setdefault('revoked_token_versions', {})[user.id] = user.token_version
+
+@event.listens_for(db.session, 'before_flush')
+def revoke_tokens_on_role_change(session, flush_context, instances):
+    # Tokens carry the role as a claim, so a role change must retire them
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            attrs = db.inspect(obj).attrs
+            if attrs.role.history.has_changes() and not attrs.token_version.history.has_changes():
+                revoke_user_tokens(obj)
+
+@event.listens_for(db.session, 'after_commit')
+def publish_token_versions(session):
+    for user_id, version in session.info.pop('revoked_token_versions', {}).items():
+        token_version_cache.set(user_id, version)
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def discard_token_versions(session, previous_transaction):
+    session.info.pop('revoked_token_versions', None)
+
+STREAM_TOKEN_SCOPE = 'notification_stream'
+
+def create_stream_token(user_id, version):
+    """Short-lived token that only opens the notification stream (it travels in the URL)"""
+    return create_access_token(
+        identity=user_id,
+        additional_claims={'scope': STREAM_TOKEN_SCOPE, 'ver': version},
+        expires_delta=timedelta(seconds=app.config['NOTIFICATION_STREAM_TOKEN_TTL'])
+    )
+
+@jwt.token_in_blocklist_loader
+def is_token_revoked(jwt_header, jwt_payload):
+    # A stream token is no access token: refuse it everywhere but the stream
+    if jwt_payload.get('scope') == STREAM_TOKEN_SCOPE and request.endpoint != 'stream_notifications':
+        return True
+    return jwt_payload.get('ver', 0) != current_token_version(jwt_payload['sub'])
+
+def role_required(*roles):
+    """Restrict a route to the given roles using the token's role claim, without a user lookup"""
+    def decorator(f):
+        @wraps(f)
+        @jwt_required()
+        def decorated_function(*args, **kwargs):
+            role = get_jwt().get('role')
+            if role is None:
+                # Token issued before role claims were added
+                user = User.query.get(get_jwt_identity())
+                role = user.role if user else None
+            
+            if role not in roles:
+                return jsonify({'message': f'{roles[0].capitalize()} access required'}), 403
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+# NOTIFICATION STREAM
+class NotificationBroker:
+    """In-process pub/sub: one bounded queue per open stream, keyed by user id"""
+    
+    def __init__(self, queue_size):
+        self.queue_size = queue_size
+        self.subscribers = {}
+        self.lock = threading.Lock()
+    
+    def subscribe(self, user_id):
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self.lock:
+            self.subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+    
+    def unsubscribe(self, user_id, subscriber):
+        with self.lock:
+            streams = self.subscribers.get(user_id)
+            if streams is not None:
+                streams.discard(subscriber)
+                if not streams:
+                    del self.subscribers[user_id]
+    
+    def subscribed_users(self):
+        with self.lock:
+            return list(self.subscribers)
+    
+    def publish(self, user_id, event, data):
+        with self.lock:
+            streams = list(self.subscribers.get(user_id, ()))
+        for subscriber in streams:
+            try:
+                subscriber.put_nowait((event, data))
+            except queue.Full:
+                # A stalled client misses events; it resyncs from the unread count on reconnect
+                pass
+
+notification_broker = NotificationBroker(app.config['NOTIFICATION_STREAM_QUEUE_SIZE'])
+
+def notification_payload(notification):
+    return {
+        'id': notification.id,
+        'title': notification.title,
+        'message': notification.message,
+        'type': notification.type,
+        'is_read': notification.is_read,
+        'booking_id': notification.booking_id,
+        'created_at': notification.created_at.isoformat() if notification.created_at else None
+    }
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@event.listens_for(db.session, 'after_flush')
+def collect_notification_events(session, flush_context):
+    """Queue stream events for flushed notifications; they are published only after commit"""
+    pending = session.info.setdefault('notification_events', [])
+    for obj in session.new:
+        if isinstance(obj, Notification):
+            # Published by this process after commit; the poller must not send it again
+            notification_poller.mark_seen(obj.id, obj.created_at)
+            pending.append((obj.user_id, 'notification', {
+                'notification': notification_payload(obj),
+                'unread_delta': 0 if obj.is_read else 1
+            }))
+    for obj in session.dirty:
+        if isinstance(obj, Notification):
+            history = db.inspect(obj).attrs.is_read.history
+            if history.has_changes() and bool(history.deleted and history.deleted[0]) != bool(obj.is_read):
+                pending.append((obj.user_id, 'read', {
+                    'id': obj.id,
+                    'unread_delta': -1 if obj.is_read else 1
+                }))
+    for obj in session.deleted:
+        if isinstance(obj, Notification) and not obj.is_read:
+            pending.append((obj.user_id, 'deleted', {'id': obj.id, 'unread_delta': -1}))
+
+@event.listens_for(db.session, 'after_commit')
+def publish_notification_events(session):
+    for user_id, name, data in session.info.pop('notification_events', []):
+        notification_broker.publish(user_id, name, data)
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def discard_notification_events(session, previous_transaction):
+    session.info.pop('notification_events', None)
+
+def notify_user(user_id, title, message, type='general', booking_id=None):
+    """Add a notification; open streams receive it once the caller commits"""
+    notification = Notification(user_id=user_id, title=title, message=message, type=type, booking_id=booking_id)
+    db.session.add(notification)
+    return notification
+
+def recent_notification_ids(user_id):
+    """Ids of notifications created within the stream lookback window"""
+    since = datetime.utcnow() - timedelta(seconds=app.config['NOTIFICATION_STREAM_LOOKBACK'])
+    return {notification_id for (notification_id,) in db.session.query(Notification.id).filter(
+        Notification.user_id == user_id,
+        Notification.created_at >= since
+    )}
+
+class NotificationPoller:
+    """One thread per process that fans notifications committed by other processes (the job
+    worker) out through the local broker, with one query per interval however many streams are open"""
+    
+    def __init__(self, broker):
+        self.broker = broker
+        self.seen = {}
+        self.lock = threading.Lock()
+        self.thread = None
+    
+    def mark_seen(self, notification_id, created_at):
+        # Only a running poller prunes seen (the worker process never starts one)
+        if self.thread is None:
+            return
+        with self.lock:
+            self.seen[notification_id] = created_at or datetime.utcnow()
+    
+    def start(self):
+        """Start the poller thread on first use; NOTIFICATION_STREAM_POLL_INTERVAL=0 disables it"""
+        with self.lock:
+            if app.config['NOTIFICATION_STREAM_POLL_INTERVAL'] <= 0 or self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, name='notification-poller', daemon=True)
+        self.thread.start()
+    
+    def run(self):
+        while True:
+            time.sleep(app.config['NOTIFICATION_STREAM_POLL_INTERVAL'])
+            try:
+                with app.app_context():
+                    self.poll()
+            except Exception as e:
+                log_event(log, logging.WARNING, 'notification_poller.failed', error=str(e))
+    
+    def poll(self):
+        """Publish unseen notifications created within the lookback window for users with open streams"""
+        since = datetime.utcnow() - timedelta(seconds=app.config['NOTIFICATION_STREAM_LOOKBACK'])
+        with self.lock:
+            self.seen = {nid: created_at for nid, created_at in self.seen.items() if created_at >= since}
+        user_ids = self.broker.subscribed_users()
+        published = 0
+        for start in range(0, len(user_ids), 500):
+            notifications = Notification.query.filter(
+                Notification.user_id.in_(user_ids[start:start + 500]),
+                Notification.created_at >= since
+            ).order_by(Notification.created_at, Notification.id).all()
+            for notification in notifications:
+                with self.lock:
+                    if notification.id in self.seen:
+                        continue
+                    self.seen[notification.id] = notification.created_at
+                self.broker.publish(notification.user_id, 'notification', {
+                    'notification': notification_payload(notification),
+                    'unread_delta': 0 if notification.is_read else 1
+                })
+                published += 1
+        return published
+
+notification_poller = NotificationPoller(notification_broker)
+
+def unread_notification_count(user_id):
+    return db.session.query(db.func.count(Notification.id)).filter(
+        Notification.user_id == user_id,
+        Notification.is_read.is_(False)
+    ).scalar()
 
 # ROUTES
 @app.route('/')
@@ -309,7 +2093,12 @@ def login():
         user = User.query.filter_by(email=email).first()
         
         if user and user.check_password(password):
-            access_token = create_access_token(identity=user.id)
+            # Transparently upgrade hashes made under an older policy
+            if password_needs_rehash(user.password):
+                user.set_password(password)
+                db.session.commit()
+            
+            access_token = create_user_token(user)
             return jsonify({
                 'access_token': access_token,
                 'user': {
@@ -360,7 +2149,7 @@ def register():
         db.session.commit()
         
         # Create access token
-        access_token = create_access_token(identity=user.id)
+        access_token = create_user_token(user)
         
         return jsonify({
             'access_token': access_token,
@@ -429,7 +2218,7 @@ def google_auth():
                 db.session.commit()
             
             # Create access token
-            access_token = create_access_token(identity=user.id)
+            access_token = create_user_token(user)
             
             return jsonify({
                 'access_token': access_token,
@@ -473,13 +2262,9 @@ def google_callback():
             'redirect_uri': 'http://localhost:3000/auth/google/callback'
         }
         
-        print(f"🔍 Token exchange data: {token_data}")  # Debug log
-        
         token_response = requests.post(token_url, data=token_data)
         token_json = token_response.json()
         
-        print(f"🔍 Token response: {token_json}")  # Debug log
-        
         if 'error' in token_json:
             return jsonify({'message': f'Token exchange failed: {token_json["error"]}'}), 400
         
@@ -489,8 +2274,6 @@ def google_callback():
         user_response = requests.get(user_info_url)
         user_info = user_response.json()
         
-        print(f"🔍 User info: {user_info}")  # Debug log
-        
         if 'error' in user_info:
             return jsonify({'message': 'Failed to get user info from Google'}), 400
         
@@ -525,7 +2308,7 @@ def google_callback():
             db.session.commit()
         
         # Create access token
-        access_token = create_access_token(identity=user.id)
+        access_token = create_user_token(user)
         
         return jsonify({
             'access_token': access_token,
@@ -544,6 +2327,26 @@ def google_callback():
         print(f"❌ ERROR in google_callback: {str(e)}")
         return jsonify({'message': str(e)}), 400    
 
+# ==== AUTH LOGOUT ROUTE ====
+@app.route('/api/auth/logout', methods=['POST'])
+@jwt_required()
+
+def logout():
+    """Revoke every access token issued to the current user: this signs out all of their sessions"""
+    try:
+        user = User.query.get(get_jwt_identity())
+        if not user:
+            return jsonify({'message': 'User not found'}), 404
+        
+        revoke_user_tokens(user)
+        db.session.commit()
+        
+        return jsonify({'message': 'Logged out of all sessions'}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 500
+
 # ==== AUTH ME ROUTE ====
 @app.route('/api/auth/me', methods=['GET'])
 @jwt_required()
@@ -571,6 +2374,8 @@ def get_current_user():
 
 # ==== FACILITY ROUTES ====
 @app.route('/api/facilities', methods=['GET'])
+@catalog_cached
+@read_replica
 
 def get_facilities():
     try:
@@ -589,17 +2394,11 @@ def get_facilities():
         return jsonify({'message': str(e)}), 500
 
 @app.route('/api/admin/facilities', methods=['GET', 'POST'])
-@jwt_required()
+@role_required('admin')
 
 def admin_facilities():
     try:
             
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or user.role != 'admin':
-            return jsonify({'message': 'Admin access required'}), 403
-
         if request.method == 'GET':
             facilities = Facility.query.all()
             result = []
@@ -627,6 +2426,7 @@ def admin_facilities():
             )
             
             db.session.add(facility)
+            invalidate_catalog_cache()
             db.session.commit()
             
             return jsonify({
@@ -644,6 +2444,8 @@ def admin_facilities():
 
 # ==== ROOM TYPE ROUTES ==== 
 @app.route('/api/room-types', methods=['GET'])
+@catalog_cached
+@read_replica
 
 def room_types():
     try:
@@ -672,17 +2474,11 @@ def room_types():
 
 # ==== ADMIN ROOM TYPES ROUTES ====
 @app.route('/api/admin/room-types', methods=['GET', 'POST'])
-@jwt_required()
+@role_required('admin')
 
 def admin_room_types():
     try:
             
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or user.role != 'admin':
-            return jsonify({'message': 'Admin access required'}), 403
-
         if request.method == 'GET':
             room_types = RoomType.query.all()
             result = []
@@ -721,6 +2517,7 @@ def admin_room_types():
             )
             
             db.session.add(room_type)
+            invalidate_catalog_cache()
             db.session.commit()
             
             return jsonify({
@@ -743,17 +2540,11 @@ def admin_room_types():
 
 # ==== ROOM FACILITIES ROUTES ====
 @app.route('/api/admin/rooms/<room_id>/facilities', methods=['GET', 'POST', 'DELETE'])
-@jwt_required()
+@role_required('admin')
 
 def room_facilities(room_id):
     try:
             
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or user.role != 'admin':
-            return jsonify({'message': 'Admin access required'}), 403
-
         room = Room.query.get(room_id)
         if not room:
             return jsonify({'message': 'Room not found'}), 404
@@ -794,6 +2585,7 @@ def room_facilities(room_id):
             )
             
             db.session.add(room_facility)
+            invalidate_catalog_cache()
             db.session.commit()
             
             return jsonify({
@@ -820,6 +2612,7 @@ def room_facilities(room_id):
                 return jsonify({'message': 'Facility not found in room'}), 404
 
             db.session.delete(room_facility)
+            invalidate_catalog_cache()
             db.session.commit()
             
             return jsonify({'message': 'Facility removed from room successfully'}), 200
@@ -830,6 +2623,9 @@ def room_facilities(room_id):
 
 # ==== ROOM ROUTES ====
 @app.route('/api/rooms', methods=['GET'])
+@query_budget(5)
+@catalog_cached
+@read_replica
 
 def get_rooms():
     try:
@@ -844,11 +2640,11 @@ def get_rooms():
         if not facilities_filter:
             facilities_filter = request.args.getlist('facilities')
         
-        print(f"🔍 DEBUG FILTER - room_type: '{room_type_filter}', min_price: {min_price}, max_price: {max_price}, capacity: {capacity_filter}")
-        print(f"🔍 DEBUG FACILITIES FILTER: {facilities_filter}")
+        log_event(log, logging.DEBUG, 'rooms.filter', room_type=room_type_filter, min_price=min_price,
+                  max_price=max_price, capacity=capacity_filter, facilities=facilities_filter)
         
-        # Start with base query
-        query = Room.query.filter(Room.status == 'available')
+        # Start with base query (relations eager-loaded in a fixed number of queries)
+        query = Room.query.options(*room_listing_options()).filter(Room.status == 'available')
         
         # Filter by room type
         if room_type_filter:
@@ -865,30 +2661,26 @@ def get_rooms():
         if capacity_filter:
             query = query.filter(Room.capacity >= capacity_filter)
         
-        # Filter by facilities
-        if facilities_filter:
-            subquery = db.session.query(FacilityRoom.room_id).filter(
-                FacilityRoom.facility_id.in_(facilities_filter)
-            ).group_by(FacilityRoom.room_id).having(
-                db.func.count(FacilityRoom.facility_id) == len(facilities_filter)
-            ).subquery()
-            
-            query = query.join(subquery, Room.id == subquery.c.room_id)
-        
         # Execute query
         rooms = query.all()
         
-        print(f"🔍 DEBUG - Found {len(rooms)} rooms after filtering")
+        # Filter by facilities (AND across all of them) on the in-memory bitmap index
+        if facilities_filter:
+            positions, matches = facility_index.rooms_with_all(facilities_filter)
+            rooms = [room for room in rooms
+                     if room.id in positions and matches >> positions[room.id] & 1]
+        
+        log_event(log, logging.DEBUG, 'rooms.found', count=len(rooms))
         
         result = []
         for room in rooms:
             primary_photo = None
             for photo in room.photos:
                 if photo.is_primary:
-                    primary_photo = f"/{photo.photo_path}"
+                    primary_photo = photo.url('thumb')
                     break
             if not primary_photo and room.photos:
-                primary_photo = f"/{room.photos[0].photo_path}"
+                primary_photo = room.photos[0].url('thumb')
                 
             facilities = []
             for fr in room.facility_rooms:
@@ -914,16 +2706,24 @@ def get_rooms():
                 } if room.room_type else None
             })
         
+        if request.args.get('with_facets') in ('1', 'true'):
+            # Facet counts for the filter UI: rooms in this result that have each facility
+            return jsonify({
+                'rooms': result,
+                'facets': facility_index.facet_counts(room.id for room in rooms)
+            }), 200
+        
         return jsonify(result), 200
         
     except Exception as e:
-        print(f"❌ ERROR in get_rooms: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log_event(log, logging.ERROR, 'rooms.error', error=str(e))
         return jsonify({'message': str(e)}), 500
 
 # ==== Single Room Detail ====
 @app.route('/api/rooms/<room_id>', methods=['GET'])
+@query_budget(8)
+@catalog_cached
+@read_replica
 
 def get_room(room_id):
     try:
@@ -936,7 +2736,9 @@ def get_room(room_id):
         for photo in room.photos:
             photos.append({
                 'id': photo.id,
-                'photo_path': f"/{photo.photo_path}",
+                'photo_path': photo.url('large'),
+                'original_path': f"/{photo.photo_path}",
+                'variants': photo.variant_urls(),
                 'is_primary': getattr(photo, 'is_primary', False)
             })
         
@@ -982,7 +2784,7 @@ def ratings():
         current_user_id = get_jwt_identity()
         
         if request.method == 'GET':
-            ratings = Rating.query.order_by(Rating.created_at.desc()).all()
+            ratings, next_cursor = keyset_page(Rating.query.options(db.joinedload(Rating.user)), Rating)
             
             result = []
             for rating in ratings:
@@ -1002,7 +2804,8 @@ def ratings():
             return jsonify({
                 'success': True,
                 'data': result,
-                'count': len(result)
+                'count': len(result),
+                'next_cursor': next_cursor
             }), 200
             
         elif request.method == 'POST':
@@ -1040,6 +2843,7 @@ def ratings():
             )
             
             db.session.add(rating)
+            invalidate_catalog_cache()
             db.session.commit()
             
             return jsonify({
@@ -1053,6 +2857,63 @@ def ratings():
                 }
             }), 201
             
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+@app.route('/api/ratings/public', methods=['GET'])
+@read_replica
+
+def public_ratings():
+    """Newest reviews for the homepage, reviewer names joined in one query and cached"""
+    try:
+        limit = min(max(request.args.get('limit', 6, type=int), 1), 50)
+        
+        sync_catalog_cache()
+        generation = recent_reviews_cache.generation
+        result = recent_reviews_cache.get(limit)
+        if result is None:
+            rows = db.session.query(
+                Rating.id, Rating.star, Rating.comment, Rating.created_at, User.name
+            ).join(User, User.id == Rating.user_id).order_by(
+                Rating.created_at.desc(), Rating.id.desc()
+            ).limit(limit).all()
+            result = [{
+                'id': rating_id,
+                'star': star,
+                'comment': comment,
+                'created_at': created_at.isoformat() if created_at else None,
+                'user': {'name': name}
+            } for rating_id, star, comment, created_at, name in rows]
+            recent_reviews_cache.set(limit, result, generation)
+        
+        return jsonify({
+            'success': True,
+            'data': result,
+            'count': len(result)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+@app.route('/api/ratings/summary', methods=['GET'])
+
+def ratings_summary():
+    """Rating count, average and star histogram, hotel-wide and per room type"""
+    try:
+        return jsonify({
+            'success': True,
+            **read_rating_summary()
+        }), 200
+        
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -1062,18 +2923,12 @@ def ratings():
 
 # Admin ratings endpoint
 @app.route('/api/admin/ratings', methods=['GET'])
-@jwt_required()
+@role_required('admin')
 
 def admin_ratings():
     try:
             
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or user.role != 'admin':
-            return jsonify({'message': 'Admin access required'}), 403
-
-        ratings = Rating.query.order_by(Rating.created_at.desc()).all()
+        ratings, next_cursor = keyset_page(Rating.query.options(db.joinedload(Rating.user)), Rating)
         
         result = []
         for rating in ratings:
@@ -1093,9 +2948,12 @@ def admin_ratings():
         return jsonify({
             'success': True,
             'data': result,
-            'count': len(result)
+            'count': len(result),
+            'next_cursor': next_cursor
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -1104,6 +2962,7 @@ def admin_ratings():
 
 # ==== BOOKINGS ROUTES ====
 @app.route('/api/bookings', methods=['POST'])
+@query_budget(12)
 @jwt_required()
 
 def create_booking():
@@ -1112,8 +2971,6 @@ def create_booking():
         current_user_id = get_jwt_identity()
         data = request.get_json()
         
-        print("🔍 DEBUG - Received booking data:", data)
-        
         required_fields = ['nik', 'guest_name', 'phone', 'check_in', 'check_out', 'total_guests', 'payment_method', 'rooms']
         for field in required_fields:
             if field not in data:
@@ -1123,82 +2980,158 @@ def create_booking():
         check_out_date = datetime.strptime(data['check_out'], '%Y-%m-%d').date()
         nights = (check_out_date - check_in_date).days
         
-        print(f"🔍 DEBUG - Nights calculation: {check_in_date} to {check_out_date} = {nights} nights")
+        # Only the shape of the request is logged, never guest details (NIK, phone)
+        log_event(log, logging.DEBUG, 'booking.request', user_id=current_user_id, check_in=data['check_in'],
+                  check_out=data['check_out'], nights=nights, rooms=len(data['rooms']))
         
         if nights <= 0:
             return jsonify({'message': 'Check-out date must be after check-in date'}), 400
         
-        total_price = 0
-        booking_rooms = []
-        
-        for room_data in data['rooms']:
-            room = Room.query.get(room_data['room_id'])
-            if not room:
-                return jsonify({'message': f'Room not found: {room_data["room_id"]}'}), 404
+        def place_booking():
+            total_price = 0
+            total_discount = 0
+            booking_rooms = []
             
-            if room.status != 'available':
-                return jsonify({'message': f'Room {room.room_number} is not available. Current status: {room.status}'}), 400
+            # Lock the requested rooms in a stable order so concurrent bookings
+            # serialize on the same rows instead of deadlocking; room types come
+            # from the same query (only the room rows are locked)
+            requested_ids = sorted({room_data['room_id'] for room_data in data['rooms']})
+            rooms = {
+                room.id: room
+                for room in Room.query.options(db.joinedload(Room.room_type, innerjoin=True))
+                .filter(Room.id.in_(requested_ids)).order_by(Room.id)
+                .with_for_update(of=Room).populate_existing()
+            }
             
-            price_per_night = room.price_with_breakfast if room_data['breakfast_option'] == 'with' else room.price_no_breakfast
-            subtotal = price_per_night * room_data['quantity'] * nights
+            for room_data in data['rooms']:
+                room = rooms.get(room_data['room_id'])
+                if not room:
+                    return jsonify({'message': f'Room not found: {room_data["room_id"]}'}), 404
             
-            print(f"🔍 DEBUG - Room {room.room_number}: {price_per_night} x {room_data['quantity']} x {nights} nights = {subtotal}")
+                if room.status != 'available':
+                    return jsonify({'message': f'Room {room.room_number} is not available. Current status: {room.status}'}), 400
             
-            total_price += subtotal
+                line = quote_room_line(room, room_data['breakfast_option'], room_data['quantity'], check_in_date, nights)
+                total_price += line['subtotal']
+                total_discount += line['discount']
             
-            booking_rooms.append({
-                'room': room,
-                'room_type': room.room_type.name,
-                'quantity': room_data['quantity'],
-                'breakfast_option': room_data['breakfast_option'],
-                'price_per_night': price_per_night,
-                'subtotal': subtotal
-            })
+                booking_rooms.append({
+                    'room': room,
+                    'room_type': room.room_type.name,
+                    'quantity': room_data['quantity'],
+                    'breakfast_option': room_data['breakfast_option'],
+                    'price_per_night': line['price_per_night'],
+                    'subtotal': line['subtotal'],
+                    'discount': line['discount'],
+                    'promotion_id': line['promotion_id']
+                })
+            
+            booking = Booking(
+                user_id=current_user_id,
+                nik=data['nik'],
+                guest_name=data['guest_name'],
+                phone=data['phone'],
+                check_in=check_in_date,
+                check_out=check_out_date,
+                total_guests=data['total_guests'],
+                payment_method=data['payment_method'],
+                total_price=total_price
+            )
+            
+            db.session.add(booking)
+            for room in rooms.values():
+                room.status = 'booked'
+            db.session.flush()
+            
+            # All lines in one executemany
+            db.session.execute(BookingRoom.__table__.insert(), [{
+                'booking_id': booking.id,
+                'room_id': br_data['room'].id,
+                'room_type': br_data['room_type'],
+                'quantity': br_data['quantity'],
+                'breakfast_option': br_data['breakfast_option'],
+                'price_per_night': br_data['price_per_night'],
+                'subtotal': br_data['subtotal'],
+                'discount': br_data['discount'],
+                'promotion_id': br_data['promotion_id']
+            } for br_data in booking_rooms])
+            
+            reserve_room_nights(
+                booking.id,
+                [br_data['room'].id for br_data in booking_rooms],
+                check_in_date,
+                check_out_date
+            )
+            enqueue_job('booking_created', {'booking_id': booking.id})
+            # Read before commit expires them, which would cost a refresh per room
+            booking_id = booking.id
+            room_numbers = [br_data['room'].room_number for br_data in booking_rooms]
+            
+            invalidate_catalog_cache()
+            db.session.commit()
+            log_event(log, logging.INFO, 'booking.created', booking_id=booking_id, user_id=current_user_id,
+                      rooms=room_numbers, nights=nights, total_price=total_price)
+            
+            return jsonify({
+                'message': 'Booking created successfully',
+                'booking_id': booking_id,
+                'total_price': total_price,
+                'total_discount': total_discount,
+                'nights': nights
+            }), 201
         
-        print(f"🔍 DEBUG - Final total price: {total_price}")
+        try:
+            return run_in_transaction(place_booking)
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'message': 'One or more rooms are already booked for the selected dates'}), 409
         
-        booking = Booking(
-            user_id=current_user_id,
-            nik=data['nik'],
-            guest_name=data['guest_name'],
-            phone=data['phone'],
-            check_in=check_in_date,
-            check_out=check_out_date,
-            total_guests=data['total_guests'],
-            payment_method=data['payment_method'],
-            total_price=total_price
-        )
+    except Exception as e:
+        db.session.rollback()
+        log_event(log, logging.ERROR, 'booking.error', error=str(e))
+        return jsonify({'message': str(e)}), 400
+
+@app.route('/api/bookings/quote', methods=['POST'])
+
+def quote_booking():
+    """Price a prospective booking, with promotions applied, without creating it"""
+    try:
+        data = request.get_json() or {}
         
-        db.session.add(booking)
-        db.session.flush()
+        for field in ('check_in', 'check_out', 'rooms'):
+            if field not in data:
+                return jsonify({'message': f'Missing required field: {field}'}), 400
         
-        for br_data in booking_rooms:
-            br_data['room'].status = 'booked'
-            print(f"🔄 Room {br_data['room'].room_number} status set to booked")
-            
-            booking_room = BookingRoom(
-                booking_id=booking.id,
-                room_id=br_data['room'].id,
-                room_type=br_data['room_type'],
-                quantity=br_data['quantity'],
-                breakfast_option=br_data['breakfast_option'],
-                price_per_night=br_data['price_per_night'],
-                subtotal=br_data['subtotal']
-            )
-            db.session.add(booking_room)
+        check_in_date = datetime.strptime(data['check_in'], '%Y-%m-%d').date()
+        check_out_date = datetime.strptime(data['check_out'], '%Y-%m-%d').date()
+        nights = (check_out_date - check_in_date).days
+        if nights <= 0:
+            return jsonify({'message': 'Check-out date must be after check-in date'}), 400
         
-        db.session.commit()
+        room_ids = {room_data['room_id'] for room_data in data['rooms']}
+        rooms = {room.id: room for room in Room.query.filter(Room.id.in_(room_ids))}
+        
+        lines = []
+        for room_data in data['rooms']:
+            room = rooms.get(room_data['room_id'])
+            if not room:
+                return jsonify({'message': f'Room not found: {room_data["room_id"]}'}), 404
+            
+            line = quote_room_line(room, room_data.get('breakfast_option', 'without'),
+                                   int(room_data.get('quantity', 1)), check_in_date, nights)
+            line['room_id'] = room.id
+            line['room_number'] = room.room_number
+            lines.append(line)
         
         return jsonify({
-            'message': 'Booking created successfully',
-            'booking_id': booking.id,
-            'total_price': total_price,
-            'nights': nights
-        }), 201
+            'success': True,
+            'nights': nights,
+            'rooms': lines,
+            'total_discount': sum(line['discount'] for line in lines),
+            'total_price': sum(line['subtotal'] for line in lines)
+        }), 200
         
     except Exception as e:
-        db.session.rollback()
-        print(f"❌ Booking error: {str(e)}")
         return jsonify({'message': str(e)}), 400
 
 @app.route('/api/bookings/me', methods=['GET'])
@@ -1208,12 +3141,8 @@ def get_my_bookings():
     try:
             
         current_user_id = get_jwt_identity()
-        
-        print(f"🔍 DEBUG - Current user ID: {current_user_id}")
-        
         bookings = Booking.query.filter_by(user_id=current_user_id).order_by(Booking.created_at.desc()).all()
-        
-        print(f"🔍 DEBUG - Found {len(bookings)} bookings in database")
+        log_event(log, logging.DEBUG, 'bookings.mine', user_id=current_user_id, count=len(bookings))
         
         result = []
         for booking in bookings:
@@ -1232,15 +3161,14 @@ def get_my_bookings():
                 'booking_rooms': []
             }
             
-            print(f"🔍 DEBUG - Booking: {booking.id}, Status: {booking.status}")
-            
             for br in booking.booking_rooms:
                 booking_data['booking_rooms'].append({
                     'id': br.id,
                     'room_type': br.room_type,
                     'quantity': br.quantity,
                     'breakfast_option': br.breakfast_option,
-                    'subtotal': float(br.subtotal)
+                    'subtotal': float(br.subtotal),
+                    'discount': float(br.discount or 0)
                 })
             
             result.append(booking_data)
@@ -1252,7 +3180,7 @@ def get_my_bookings():
         }), 200
         
     except Exception as e:
-        print(f"❌ ERROR in get_my_bookings: {str(e)}")
+        log_event(log, logging.ERROR, 'bookings.mine_error', error=str(e))
         return jsonify({
             'success': False,
             'message': str(e),
@@ -1261,18 +3189,12 @@ def get_my_bookings():
 
 # ==== ADMIN BOOKINGS ROUTES ====
 @app.route('/api/admin/bookings', methods=['GET'])
-@jwt_required()
+@role_required('admin')
 
 def get_all_bookings():
     try:
             
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or user.role != 'admin':
-            return jsonify({'message': 'Admin access required'}), 403
-
-        bookings = Booking.query.order_by(Booking.created_at.desc()).all()
+        bookings, next_cursor = keyset_page(Booking.query.options(db.selectinload(Booking.booking_rooms)), Booking)
         
         result = []
         for booking in bookings:
@@ -1297,7 +3219,8 @@ def get_all_bookings():
                     'room_type': br.room_type,
                     'quantity': br.quantity,
                     'breakfast_option': br.breakfast_option,
-                    'subtotal': float(br.subtotal)
+                    'subtotal': float(br.subtotal),
+                    'discount': float(br.discount or 0)
                 })
             
             result.append(booking_data)
@@ -1305,9 +3228,12 @@ def get_all_bookings():
         return jsonify({
             'success': True,
             'data': result,
-            'count': len(result)
+            'count': len(result),
+            'next_cursor': next_cursor
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         print(f"❌ ERROR in get_all_bookings: {str(e)}")
         return jsonify({
@@ -1317,131 +3243,266 @@ def get_all_bookings():
         }), 500
 
 @app.route('/api/admin/bookings/<booking_id>/status', methods=['PUT'])
-@jwt_required()
+@query_budget(12)
+@role_required('admin')
 
 def update_booking_status(booking_id):
     try:
-            
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or user.role != 'admin':
-            return jsonify({'message': 'Admin access required'}), 403
-
-        booking = Booking.query.get(booking_id)
-        if not booking:
-            return jsonify({'message': 'Booking not found'}), 404
-        
         data = request.get_json()
         if not data:
             return jsonify({'message': 'No data provided'}), 400
             
         new_status = data.get('status')
-        old_status = booking.status
-        
         if not new_status:
             return jsonify({'message': 'Status is required'}), 400
         
-        valid_statuses = ['pending', 'confirmed', 'checked_in', 'checked_out', 'cancelled']
-        if new_status not in valid_statuses:
-            return jsonify({'message': 'Invalid status'}), 400
-        
-        print(f"🔄 Updating booking {booking_id} status from {old_status} to {new_status}")
-        
-        if new_status == 'cancelled' and old_status != 'cancelled':
-            for booking_room in booking.booking_rooms:
-                room = Room.query.get(booking_room.room_id)
-                if room:
-                    room.status = 'available'
-                    print(f"🔄 Room {room.room_number} status set to available (cancelled)")
-        
-        elif old_status == 'cancelled' and new_status != 'cancelled':
-            for booking_room in booking.booking_rooms:
-                room = Room.query.get(booking_room.room_id)
-                if room:
-                    room.status = 'booked'
-                    print(f"🔄 Room {room.room_number} status set to booked (re-activated)")
-        
-        elif new_status == 'checked_out':
-            for booking_room in booking.booking_rooms:
-                room = Room.query.get(booking_room.room_id)
-                if room:
-                    print(f"🔄 Changing room {room.room_number} from {room.status} to available (check-out)")
-                    room.status = 'available'
+        def apply_transition():
+            booking = Booking.query.filter_by(id=booking_id).with_for_update().populate_existing().first()
+            if not booking:
+                return jsonify({'message': 'Booking not found'}), 404
+            
+            old_status = booking.status
+            error = booking_transition_error(old_status, new_status)
+            if error:
+                return jsonify({'message': error}), 400
+            
+            transition_bookings([booking], new_status)
+            invalidate_catalog_cache()
+            db.session.commit()
+            log_event(log, logging.INFO, 'booking.status_changed', booking_id=booking_id,
+                      old_status=old_status, new_status=new_status)
+            
+            return jsonify({
+                'success': True,
+                'message': f'Booking status updated to {new_status}',
+                'booking': {
+                    'id': booking_id,
+                    'status': new_status
+                }
+            }), 200
         
-        booking.status = new_status
-        db.session.commit()
+        try:
+            return run_in_transaction(apply_transition)
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'message': 'One or more rooms are already booked for the selected dates'}), 409
         
+    except Exception as e:
+        db.session.rollback()
+        log_event(log, logging.ERROR, 'booking.status_error', booking_id=booking_id, error=str(e))
         return jsonify({
-            'success': True,
-            'message': f'Booking status updated to {new_status}',
-            'booking': {
-                'id': booking.id,
-                'status': booking.status
-            }
-        }), 200
+            'success': False,
+            'message': str(e)
+        }), 500
+
+@app.route('/api/admin/bookings/status', methods=['PUT'])
+@query_budget(15)
+@role_required('admin')
+
+def bulk_update_booking_status():
+    """Move many bookings to one status in a single transaction (all or nothing)"""
+    try:
+        data = request.get_json() or {}
+        new_status = data.get('status')
+        booking_ids = list(dict.fromkeys(data.get('booking_ids') or []))
+        
+        if not new_status or not booking_ids:
+            return jsonify({'message': 'status and booking_ids are required'}), 400
+        if new_status not in BOOKING_TRANSITIONS:
+            return jsonify({'message': 'Invalid status'}), 400
+        if len(booking_ids) > app.config['BULK_STATUS_MAX_BOOKINGS']:
+            return jsonify({'message': f"At most {app.config['BULK_STATUS_MAX_BOOKINGS']} bookings per request"}), 400
+        
+        def apply_transitions():
+            # Stable lock order, as in create_booking
+            bookings = Booking.query.filter(Booking.id.in_(booking_ids)).order_by(Booking.id) \
+                .with_for_update().populate_existing().all()
+            found = {booking.id for booking in bookings}
+            missing = [booking_id for booking_id in booking_ids if booking_id not in found]
+            if missing:
+                return jsonify({'message': 'Booking not found', 'booking_ids': missing}), 404
+            
+            errors = {}
+            for booking in bookings:
+                error = booking_transition_error(booking.status, new_status)
+                if error:
+                    errors[booking.id] = error
+            if errors:
+                return jsonify({'message': 'Some bookings cannot change status', 'errors': errors}), 400
+            
+            changed = transition_bookings(bookings, new_status)
+            invalidate_catalog_cache()
+            db.session.commit()
+            log_event(log, logging.INFO, 'booking.status_bulk_changed', new_status=new_status,
+                      requested=len(booking_ids), changed=len(changed))
+            
+            return jsonify({
+                'success': True,
+                'message': f'{len(changed)} bookings updated to {new_status}',
+                'updated': [
+                    {'id': changed_id, 'old_status': old_status, 'status': new_status}
+                    for changed_id, old_status in changed
+                ],
+                'unchanged': len(booking_ids) - len(changed)
+            }), 200
+        
+        try:
+            return run_in_transaction(apply_transitions)
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'message': 'One or more rooms are already booked for the selected dates'}), 409
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ ERROR in update_booking_status: {str(e)}")
+        log_event(log, logging.ERROR, 'booking.status_bulk_error', error=str(e))
         return jsonify({
             'success': False,
             'message': str(e)
         }), 500
 
+# ==== ADMIN EXPORTS ====
+# Guest identity numbers and phones are left out of exports on purpose
+EXPORT_BOOKING_COLUMNS = (
+    'booking_id', 'created_at', 'check_in', 'check_out', 'nights', 'status', 'guest_name', 'user_email',
+    'payment_method', 'total_guests', 'room_number', 'room_type', 'breakfast_option', 'quantity',
+    'price_per_night', 'discount', 'subtotal', 'booking_total', 'revenue'
+)
+EXPORT_DATE_FIELDS = {'check_in': Booking.check_in, 'check_out': Booking.check_out, 'created_at': Booking.created_at}
+EXPORT_FORMATS = {'csv': ('text/csv', 'csv'), 'ndjson': ('application/x-ndjson', 'ndjson')}
+
+def export_booking_row(row):
+    """One booking line as a flat dict.
+    
+    booking_total is the booked price whatever the status. revenue is the line subtotal only for
+    REVENUE_STATUSES, the statuses the dashboard counts as revenue, so summing the revenue column
+    matches the dashboard; pending, checked-in and cancelled lines export 0.0 revenue.
+    """
+    return {
+        'booking_id': row.booking_id,
+        'created_at': row.created_at.isoformat() if row.created_at else None,
+        'check_in': row.check_in.isoformat(),
+        'check_out': row.check_out.isoformat(),
+        'nights': (row.check_out - row.check_in).days,
+        'status': row.status,
+        'guest_name': row.guest_name,
+        'user_email': row.user_email,
+        'payment_method': row.payment_method,
+        'total_guests': row.total_guests,
+        'room_number': row.room_number,
+        'room_type': row.room_type,
+        'breakfast_option': row.breakfast_option,
+        'quantity': row.quantity,
+        'price_per_night': float(row.price_per_night),
+        'discount': float(row.discount or 0),
+        'subtotal': float(row.subtotal),
+        'booking_total': float(row.booking_total),
+        'revenue': float(row.subtotal) if row.status in REVENUE_STATUSES else 0.0
+    }
+
+@app.route('/api/admin/exports/bookings', methods=['GET'])
+@role_required('admin')
+@read_replica
+
+def export_bookings():
+    """Stream booking lines as CSV or NDJSON; memory use does not grow with the number of rows"""
+    try:
+        export_format = request.args.get('format', 'csv')
+        date_field = request.args.get('date_field', 'check_in')
+        start = request.args.get('from')
+        end = request.args.get('to')
+        status = request.args.get('status')
+        
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'message': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+        if date_field not in EXPORT_DATE_FIELDS:
+            return jsonify({'message': f"date_field must be one of: {', '.join(EXPORT_DATE_FIELDS)}"}), 400
+        if status and status not in BOOKING_TRANSITIONS:
+            return jsonify({'message': 'Invalid status'}), 400
+        
+        try:
+            from_date = datetime.strptime(start, '%Y-%m-%d') if start else None
+            to_date = datetime.strptime(end, '%Y-%m-%d') if end else None
+        except ValueError:
+            return jsonify({'message': 'Dates must use the YYYY-MM-DD format'}), 400
+        if from_date and to_date and to_date < from_date:
+            return jsonify({'message': 'to must not be before from'}), 400
+        
+        # Both bounds inclusive, as for the availability calendar
+        column = EXPORT_DATE_FIELDS[date_field]
+        as_bound = (lambda day: day) if date_field == 'created_at' else (lambda day: day.date())
+        filters = []
+        if from_date:
+            filters.append(column >= as_bound(from_date))
+        if to_date:
+            filters.append(column < as_bound(to_date + timedelta(days=1)))
+        if status:
+            filters.append(Booking.status == status)
+        
+        # Plain rows, not ORM objects: nothing accumulates in the identity map
+        query = db.select(
+            Booking.id.label('booking_id'), Booking.created_at, Booking.check_in, Booking.check_out,
+            Booking.status, Booking.guest_name, User.email.label('user_email'), Booking.payment_method,
+            Booking.total_guests, Room.room_number, BookingRoom.room_type, BookingRoom.breakfast_option,
+            BookingRoom.quantity, BookingRoom.price_per_night, BookingRoom.discount, BookingRoom.subtotal,
+            Booking.total_price.label('booking_total')
+        ).join(BookingRoom, BookingRoom.booking_id == Booking.id).join(
+            Room, Room.id == BookingRoom.room_id
+        ).outerjoin(User, User.id == Booking.user_id).where(*filters).order_by(
+            column, Booking.id, BookingRoom.id
+        ).execution_options(yield_per=app.config['EXPORT_BATCH_SIZE'])
+        
+        # Executed here so query errors still get a JSON error response
+        result = db.session.execute(query)
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+    
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    
+    def generate():
+        # Server-side cursor: one batch of EXPORT_BATCH_SIZE rows is in memory at a time
+        exported = 0
+        try:
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=EXPORT_BOOKING_COLUMNS)
+            if export_format == 'csv':
+                writer.writeheader()
+            for rows in result.partitions():
+                for row in rows:
+                    if export_format == 'csv':
+                        writer.writerow(export_booking_row(row))
+                    else:
+                        buffer.write(json.dumps(export_booking_row(row), separators=(',', ':')) + '\n')
+                exported += len(rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if exported == 0 and export_format == 'csv':
+                yield buffer.getvalue()
+            log_event(log, logging.INFO, 'export.bookings', format=export_format, rows=exported,
+                      date_field=date_field, date_from=start, date_to=end)
+        except Exception as e:
+            # Headers are already sent: abort the stream so the client sees a truncated download
+            log_event(log, logging.ERROR, 'export.error', rows=exported, error=str(e))
+            raise
+        finally:
+            result.close()
+    
+    filename = f"bookings_{start or 'all'}_{end or 'all'}.{extension}"
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 # ==== DASHBOARD STATS ROUTES ====
 @app.route('/api/admin/dashboard/stats', methods=['GET'])
-@jwt_required()
+@role_required('admin')
 
 def get_dashboard_stats():
     """Endpoint untuk dashboard statistics"""
     try:
             
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or user.role != 'admin':
-            return jsonify({'message': 'Admin access required'}), 403
-
-        total_bookings = Booking.query.count()
-        total_rooms = Room.query.count()
-        available_rooms = Room.query.filter_by(status='available').count()
-        
-        revenue_result = db.session.query(db.func.sum(Booking.total_price)).filter(
-            Booking.status.in_(['checked_out', 'confirmed'])
-        ).scalar()
-        total_revenue = float(revenue_result) if revenue_result else 0.0
-        
-        pending_bookings = Booking.query.filter_by(status='pending').count()
-        
-        today = datetime.now().date()
-        today_checkins = Booking.query.filter(
-            Booking.check_in == today,
-            Booking.status.in_(['confirmed', 'checked_in'])
-        ).count()
-        
-        today_checkouts = Booking.query.filter(
-            Booking.check_out == today,
-            Booking.status.in_(['checked_in', 'checked_out'])
-        ).count()
-
-        total_reviews = Rating.query.count()
-        
-        avg_rating_result = db.session.query(db.func.avg(Rating.star)).scalar()
-        average_rating = float(avg_rating_result) if avg_rating_result else 0.0
-
-        stats_data = {
-            'total_bookings': total_bookings,
-            'total_rooms': total_rooms,
-            'available_rooms': available_rooms,
-            'total_revenue': total_revenue,
-            'pending_bookings': pending_bookings,
-            'today_checkins': today_checkins,
-            'today_checkouts': today_checkouts,
-            'total_reviews': total_reviews,
-            'user_reviews': total_reviews,
-            'average_rating': average_rating
-        }
+        stats_data = read_dashboard_counters()
 
         return jsonify({
             'success': True,
@@ -1463,20 +3524,47 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def upload_digest(stream):
+    """Content hash used as the upload's filename, so a URL always means the same bytes"""
+    sha = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(64 * 1024), b''):
+        sha.update(chunk)
+    stream.seek(0)
+    return sha.hexdigest()[:20]
+
+def save_room_photos(room, photos, has_primary):
+    """Store uploaded originals and add their RoomPhoto rows; variants are built after commit"""
+    saved = []
+    if not photos or not photos[0].filename:
+        return saved
+    
+    for i, photo in enumerate(photos):
+        if photo and allowed_file(photo.filename):
+            extension = os.path.splitext(secure_filename(photo.filename))[1].lower()
+            unique_filename = f"{upload_digest(photo.stream)}{extension}"
+            photo_path = os.path.join(app.config['UPLOAD_FOLDER'], 'rooms', unique_filename)
+            
+            os.makedirs(os.path.dirname(photo_path), exist_ok=True)
+            if not os.path.exists(photo_path):
+                photo.save(photo_path)
+            
+            room_photo = RoomPhoto(
+                room_id=room.id,
+                photo_path=photo_path,
+                is_primary=(i == 0 and not has_primary)
+            )
+            db.session.add(room_photo)
+            saved.append(room_photo)
+    return saved
+
 @app.route('/api/admin/rooms', methods=['GET', 'POST'])
-@jwt_required()
+@role_required('admin')
 
 def admin_rooms():
     try:
             
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or user.role != 'admin':
-            return jsonify({'message': 'Admin access required'}), 403
-
         if request.method == 'GET':
-            rooms = Room.query.all()
+            rooms = Room.query.options(*room_listing_options()).all()
             result = []
             for room in rooms:
                 photos = []
@@ -1488,7 +3576,7 @@ def admin_rooms():
                             'is_primary': getattr(photo, 'is_primary', False)
                         })
                 except Exception as photo_error:
-                    print(f"Error loading photos for room {room.id}: {photo_error}")
+                    log_event(log, logging.WARNING, 'admin_rooms.photo_error', room_id=room.id, error=str(photo_error))
                 
                 facilities = []
                 for fr in room.facility_rooms:
@@ -1529,7 +3617,6 @@ def admin_rooms():
                 description = request.form.get('description', '')
                 
                 facilities = request.form.getlist('facilities[]')
-                print(f"🔧 DEBUG - Received facilities for CREATE: {facilities}")
                 
             else:
                 data = request.get_json()
@@ -1562,7 +3649,6 @@ def admin_rooms():
             db.session.flush()
             
             if facilities:
-                print(f"🔄 Adding {len(facilities)} facilities to room {room.room_number}")
                 for facility_id in facilities:
                     facility = Facility.query.get(facility_id)
                     if facility:
@@ -1571,28 +3657,16 @@ def admin_rooms():
                             facility_id=facility_id
                         )
                         db.session.add(room_facility)
-                        print(f"✅ Added facility {facility.name} to room {room.room_number}")
             
+            new_photos = []
             if request.content_type.startswith('multipart/form-data'):
-                photos = request.files.getlist('photos')
-                if photos and photos[0].filename:
-                    for i, photo in enumerate(photos):
-                        if photo and allowed_file(photo.filename):
-                            filename = secure_filename(photo.filename)
-                            unique_filename = f"{uuid.uuid4()}_{filename}"
-                            photo_path = os.path.join(app.config['UPLOAD_FOLDER'], 'rooms', unique_filename)
-                            
-                            os.makedirs(os.path.dirname(photo_path), exist_ok=True)
-                            photo.save(photo_path)
-                            
-                            room_photo = RoomPhoto(
-                                room_id=room.id,
-                                photo_path=photo_path,
-                                is_primary=(i == 0)
-                            )
-                            db.session.add(room_photo)
+                new_photos = save_room_photos(room, request.files.getlist('photos'), has_primary=False)
             
+            schedule_photo_processing(new_photos)
+            invalidate_catalog_cache()
             db.session.commit()
+            log_event(log, logging.INFO, 'room.created', room_id=room.id, room_number=room.room_number,
+                      facilities=len(facilities), photos=len(new_photos))
             
             return jsonify({
                 'message': 'Room created successfully',
@@ -1604,21 +3678,15 @@ def admin_rooms():
 
     except Exception as e:
         db.session.rollback()
-        print(f"❌ ERROR in admin_rooms POST: {str(e)}")
+        log_event(log, logging.ERROR, 'admin_rooms.error', error=str(e))
         return jsonify({'message': str(e)}), 400
 
 @app.route('/api/admin/rooms/<room_id>', methods=['PUT', 'DELETE'])
-@jwt_required()
+@role_required('admin')
 
 def admin_room_detail(room_id):
     try:
             
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or user.role != 'admin':
-            return jsonify({'message': 'Admin access required'}), 403
-
         room = Room.query.get(room_id)
         if not room:
             return jsonify({'message': 'Room not found'}), 404
@@ -1634,7 +3702,6 @@ def admin_room_detail(room_id):
                 description = request.form.get('description')
                 
                 facilities = request.form.getlist('facilities[]')
-                print(f"🔧 DEBUG - Received facilities for UPDATE: {facilities}")
                 
             else:
                 data = request.get_json()
@@ -1666,6 +3733,7 @@ def admin_room_detail(room_id):
             if description is not None: 
                 room.description = description
             
+            log_event(log, logging.DEBUG, 'room.update', room_id=room_id, facilities=facilities)
             existing_facilities = FacilityRoom.query.filter_by(room_id=room_id).all()
             for existing_facility in existing_facilities:
                 db.session.delete(existing_facility)
@@ -1682,25 +3750,12 @@ def admin_room_detail(room_id):
                         )
                         db.session.add(room_facility)
             
+            new_photos = []
             if request.content_type.startswith('multipart/form-data'):
-                photos = request.files.getlist('photos')
-                if photos and photos[0].filename:
-                    for i, photo in enumerate(photos):
-                        if photo and allowed_file(photo.filename):
-                            filename = secure_filename(photo.filename)
-                            unique_filename = f"{uuid.uuid4()}_{filename}"
-                            photo_path = os.path.join(app.config['UPLOAD_FOLDER'], 'rooms', unique_filename)
-                            
-                            os.makedirs(os.path.dirname(photo_path), exist_ok=True)
-                            photo.save(photo_path)
-                            
-                            room_photo = RoomPhoto(
-                                room_id=room.id,
-                                photo_path=photo_path,
-                                is_primary=(i == 0 and not room.photos)
-                            )
-                            db.session.add(room_photo)
+                new_photos = save_room_photos(room, request.files.getlist('photos'), has_primary=bool(room.photos))
             
+            schedule_photo_processing(new_photos)
+            invalidate_catalog_cache()
             db.session.commit()
             
             return jsonify({
@@ -1719,35 +3774,30 @@ def admin_room_detail(room_id):
             FacilityRoom.query.filter_by(room_id=room_id).delete()
             
             db.session.delete(room)
+            invalidate_catalog_cache()
             db.session.commit()
             
             return jsonify({'message': 'Room deleted successfully'}), 200
 
     except Exception as e:
         db.session.rollback()
-        print(f"❌ ERROR in admin_room_detail PUT: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        # ERROR records carry the traceback
+        log_event(log, logging.ERROR, 'room.detail_error', room_id=room_id, error=str(e))
         return jsonify({'message': str(e)}), 400
 
 @app.route('/api/admin/rooms/<room_id>/photos/<photo_id>', methods=['DELETE'])
-@jwt_required()
+@role_required('admin')
 
 def delete_room_photo(room_id, photo_id):
     try:
             
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or user.role != 'admin':
-            return jsonify({'message': 'Admin access required'}), 403
-
         photo = RoomPhoto.query.filter_by(id=photo_id, room_id=room_id).first()
         if not photo:
             return jsonify({'message': 'Photo not found'}), 404
 
         photo.delete_photo_file()
         db.session.delete(photo)
+        invalidate_catalog_cache()
         db.session.commit()
         
         return jsonify({'message': 'Photo deleted successfully'}), 200
@@ -1756,15 +3806,51 @@ def delete_room_photo(room_id, photo_id):
         db.session.rollback()
         return jsonify({'message': str(e)}), 400
 
+# Content-hashed uploads and their size variants, e.g. 3f9a..c2.jpg or 3f9a..c2_thumb480.webp
+HASHED_UPLOAD_PATTERN = re.compile(r'^[0-9a-f]{20}(_[a-z]+\d+)?\.[a-z0-9]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
 @app.route('/uploads/<path:filename>')
 
 def serve_uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    """Serve an upload with strong ETags, 304/Range support and optional web-server offload"""
+    path = safe_join(os.path.abspath(app.config['UPLOAD_FOLDER']), filename)
+    if path is None or not os.path.isfile(path):
+        return jsonify({'message': 'File not found'}), 404
+    
+    # A content-hashed name is itself a strong validator and never changes meaning
+    immutable = HASHED_UPLOAD_PATTERN.match(os.path.basename(filename)) is not None
+    etag = os.path.basename(filename) if immutable else True
+    max_age = IMMUTABLE_MAX_AGE if immutable else app.config['UPLOADS_MAX_AGE']
+    offload = app.config['UPLOADS_OFFLOAD']
+    
+    if offload == 'x-accel':
+        # nginx serves the bytes (and Range) from an internal location mapped to UPLOAD_FOLDER
+        response = app.response_class(mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = f"{app.config['UPLOADS_ACCEL_PREFIX']}/{filename}"
+        if etag is True:
+            stat = os.stat(path)
+            etag = f"{int(stat.st_mtime)}-{stat.st_size}"
+        response.set_etag(etag)
+        if etag in request.if_none_match:
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+    else:
+        # USE_X_SENDFILE makes send_file emit an X-Sendfile header instead of the body
+        response = send_file(path, conditional=True, etag=etag, max_age=max_age)
+    
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if immutable:
+        response.cache_control.immutable = True
+    return response
 
 # ==== NEW ENHANCED FEATURES ====
 
 # ==== ROOM AVAILABILITY CALENDAR ====
 @app.route('/api/rooms/availability', methods=['GET'])
+@query_budget(5)
+@read_replica
 
 def check_room_availability():
     """Check room availability for specific date range"""
@@ -1783,28 +3869,21 @@ def check_room_availability():
         if check_in_date >= check_out_date:
             return jsonify({'message': 'Check-out date must be after check-in date'}), 400
         
-        # Get all rooms
-        query = Room.query.filter_by(status='available')
-        if room_type_id:
-            query = query.filter_by(room_type_id=room_type_id)
+        # Rooms with no ledger night inside the range (indexed anti-join)
+        booked_nights = db.session.query(RoomNight.room_id).filter(
+            RoomNight.room_id == Room.id,
+            RoomNight.night >= check_in_date,
+            RoomNight.night < check_out_date
+        ).exists()
         
-        available_rooms = query.all()
-        
-        # Check for conflicting bookings
-        conflicting_bookings = Booking.query.filter(
-            Booking.status.in_(['confirmed', 'checked_in']),
-            Booking.check_in < check_out_date,
-            Booking.check_out > check_in_date
-        ).all()
-        
-        # Get booked room IDs
-        booked_room_ids = set()
-        for booking in conflicting_bookings:
-            for booking_room in booking.booking_rooms:
-                booked_room_ids.add(booking_room.room_id)
+        query = Room.query.options(*room_listing_options()).filter(
+            Room.status == 'available',
+            ~booked_nights
+        )
+        if room_type_id:
+            query = query.filter(Room.room_type_id == room_type_id)
         
-        # Filter out booked rooms
-        truly_available_rooms = [room for room in available_rooms if room.id not in booked_room_ids]
+        truly_available_rooms = query.all()
         
         result = []
         for room in truly_available_rooms:
@@ -1812,10 +3891,10 @@ def check_room_availability():
             primary_photo = None
             for photo in room.photos:
                 if photo.is_primary:
-                    primary_photo = f"/{photo.photo_path}"
+                    primary_photo = photo.url('thumb')
                     break
             if not primary_photo and room.photos:
-                primary_photo = f"/{room.photos[0].photo_path}"
+                primary_photo = room.photos[0].url('thumb')
             
             # Get facilities
             facilities = []
@@ -1854,8 +3933,114 @@ def check_room_availability():
         print(f"❌ ERROR in check_room_availability: {str(e)}")
         return jsonify({'message': str(e)}), 500
 
+@app.route('/api/rooms/availability/calendar', methods=['GET'])
+@query_budget(1)
+@read_replica
+
+def room_availability_calendar():
+    """Rooms x days occupancy matrix (0 free, 1 booked, 2 maintenance) for a date range"""
+    try:
+        start = request.args.get('from')
+        end = request.args.get('to')
+        room_type_id = request.args.get('room_type_id')
+        
+        if not start or not end:
+            return jsonify({'message': 'from and to dates are required'}), 400
+        
+        try:
+            from_date = datetime.strptime(start, '%Y-%m-%d').date()
+            to_date = datetime.strptime(end, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'message': 'Dates must use the YYYY-MM-DD format'}), 400
+        
+        days = (to_date - from_date).days + 1
+        if days <= 0:
+            return jsonify({'message': 'to must not be before from'}), 400
+        if days > app.config['CALENDAR_MAX_DAYS']:
+            return jsonify({'message': f"Date range is limited to {app.config['CALENDAR_MAX_DAYS']} days"}), 400
+        
+        end_exclusive = to_date + timedelta(days=1)
+        no_date = db.cast(db.null(), db.Date)
+        # Status is read as plain text: room and maintenance status share that column of the union
+        room_columns = (Room.id, Room.room_number, Room.room_type_id, db.type_coerce(Room.status, db.String))
+        
+        # Rooms, holding bookings and blocking maintenance in a single round trip
+        rooms_part = db.select(db.literal('room'), *room_columns, no_date, no_date)
+        bookings_part = db.select(
+            db.literal('booking'), *room_columns, Booking.check_in, Booking.check_out
+        ).join(BookingRoom, BookingRoom.room_id == Room.id).join(Booking, Booking.id == BookingRoom.booking_id).where(
+            Booking.status.in_(ROOM_NIGHT_HOLDING_STATUSES),
+            Booking.check_in < end_exclusive,
+            Booking.check_out > from_date
+        )
+        maintenance_part = db.select(
+            db.literal('maintenance'), Room.id, Room.room_number, Room.room_type_id,
+            db.type_coerce(RoomMaintenance.status, db.String),
+            RoomMaintenance.scheduled_date, RoomMaintenance.completed_date
+        ).join(RoomMaintenance, RoomMaintenance.room_id == Room.id).where(
+            RoomMaintenance.status.in_(MAINTENANCE_BLOCKING_STATUSES),
+            RoomMaintenance.scheduled_date < end_exclusive,
+            db.or_(
+                RoomMaintenance.completed_date >= from_date,
+                db.and_(RoomMaintenance.completed_date.is_(None),
+                        db.or_(RoomMaintenance.status == 'in_progress', RoomMaintenance.scheduled_date >= from_date))
+            )
+        )
+        if room_type_id:
+            rooms_part = rooms_part.where(Room.room_type_id == room_type_id)
+            bookings_part = bookings_part.where(Room.room_type_id == room_type_id)
+            maintenance_part = maintenance_part.where(Room.room_type_id == room_type_id)
+        
+        rows = db.session.execute(db.union_all(rooms_part, bookings_part, maintenance_part)).all()
+        
+        rooms = sorted((row for row in rows if row[0] == 'room'), key=lambda row: row[2])
+        positions = {row[1]: index for index, row in enumerate(rooms)}
+        
+        def offset(day):
+            return min(max((day - from_date).days, 0), days)
+        
+        booked = []
+        maintenance = []
+        for kind, room_id, _, _, status, first_day, last_day in rows:
+            if kind == 'booking':
+                booked.append((positions[room_id], offset(first_day), offset(last_day)))
+            elif kind == 'maintenance':
+                # Completed date is inclusive; work in progress blocks the room to the end of the range
+                if last_day:
+                    until = last_day + timedelta(days=1)
+                elif status == 'in_progress':
+                    until = end_exclusive
+                else:
+                    until = first_day + timedelta(days=1)
+                maintenance.append((positions[room_id], offset(first_day), offset(until)))
+        
+        matrix = occupancy_matrix(len(rooms), days, booked, maintenance)
+        
+        return jsonify({
+            'success': True,
+            'from': from_date.isoformat(),
+            'to': to_date.isoformat(),
+            'days': days,
+            'legend': {
+                str(CALENDAR_FREE): 'available',
+                str(CALENDAR_BOOKED): 'booked',
+                str(CALENDAR_MAINTENANCE): 'maintenance'
+            },
+            'rooms': [{
+                'id': room_id,
+                'room_number': room_number,
+                'room_type_id': room_type,
+                'status': status,
+                'occupancy': cells
+            } for (_, room_id, room_number, room_type, status, _, _), cells in zip(rooms, matrix)]
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
 # ==== PROMOTIONS MANAGEMENT ====
 @app.route('/api/promotions', methods=['GET'])
+@read_replica
 
 def get_active_promotions():
     """Get all active promotions"""
@@ -1896,17 +4081,11 @@ def get_active_promotions():
         return jsonify({'message': str(e)}), 500
 
 @app.route('/api/admin/promotions', methods=['GET', 'POST'])
-@jwt_required()
+@role_required('admin')
 
 def admin_promotions():
     """Admin promotions management"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or user.role != 'admin':
-            return jsonify({'message': 'Admin access required'}), 403
-
         if request.method == 'GET':
             promotions = Promotion.query.order_by(Promotion.created_at.desc()).all()
             result = []
@@ -1957,6 +4136,7 @@ def admin_promotions():
             )
             
             db.session.add(promotion)
+            invalidate_catalog_cache()
             db.session.commit()
             
             return jsonify({
@@ -1973,17 +4153,11 @@ def admin_promotions():
         return jsonify({'message': str(e)}), 400
 
 @app.route('/api/admin/promotions/<promotion_id>', methods=['PUT', 'DELETE'])
-@jwt_required()
+@role_required('admin')
 
 def admin_promotion_detail(promotion_id):
     """Update or delete promotion"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or user.role != 'admin':
-            return jsonify({'message': 'Admin access required'}), 403
-
         promotion = Promotion.query.get(promotion_id)
         if not promotion:
             return jsonify({'message': 'Promotion not found'}), 404
@@ -2012,6 +4186,7 @@ def admin_promotion_detail(promotion_id):
             if 'room_type_id' in data:
                 promotion.room_type_id = data['room_type_id']
             
+            invalidate_catalog_cache()
             db.session.commit()
             
             return jsonify({
@@ -2024,6 +4199,7 @@ def admin_promotion_detail(promotion_id):
 
         elif request.method == 'DELETE':
             db.session.delete(promotion)
+            invalidate_catalog_cache()
             db.session.commit()
             
             return jsonify({'message': 'Promotion deleted successfully'}), 200
@@ -2034,6 +4210,8 @@ def admin_promotion_detail(promotion_id):
 
 # ==== GUEST SERVICES ====
 @app.route('/api/services', methods=['GET'])
+@catalog_cached
+@read_replica
 
 def get_guest_services():
     """Get all available guest services"""
@@ -2061,17 +4239,11 @@ def get_guest_services():
         return jsonify({'message': str(e)}), 500
 
 @app.route('/api/admin/services', methods=['GET', 'POST'])
-@jwt_required()
+@role_required('admin')
 
 def admin_guest_services():
     """Admin guest services management"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or user.role != 'admin':
-            return jsonify({'message': 'Admin access required'}), 403
-
         if request.method == 'GET':
             services = GuestService.query.all()
             result = []
@@ -2106,6 +4278,7 @@ def admin_guest_services():
             )
             
             db.session.add(service)
+            invalidate_catalog_cache()
             db.session.commit()
             
             return jsonify({
@@ -2123,17 +4296,11 @@ def admin_guest_services():
 
 # ==== ROOM MAINTENANCE ====
 @app.route('/api/admin/maintenance', methods=['GET', 'POST'])
-@jwt_required()
+@role_required('admin')
 
 def admin_room_maintenance():
     """Admin room maintenance management"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or user.role != 'admin':
-            return jsonify({'message': 'Admin access required'}), 403
-
         if request.method == 'GET':
             maintenance_records = RoomMaintenance.query.order_by(RoomMaintenance.scheduled_date.desc()).all()
             result = []
@@ -2199,17 +4366,11 @@ def admin_room_maintenance():
         return jsonify({'message': str(e)}), 400
 
 @app.route('/api/admin/maintenance/<maintenance_id>/status', methods=['PUT'])
-@jwt_required()
+@role_required('admin')
 
 def update_maintenance_status(maintenance_id):
     """Update maintenance status"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or user.role != 'admin':
-            return jsonify({'message': 'Admin access required'}), 403
-
         maintenance = RoomMaintenance.query.get(maintenance_id)
         if not maintenance:
             return jsonify({'message': 'Maintenance record not found'}), 404
@@ -2234,6 +4395,7 @@ def update_maintenance_status(maintenance_id):
         elif new_status == 'cancelled':
             maintenance.room.status = 'available'
         
+        invalidate_catalog_cache()
         db.session.commit()
         
         return jsonify({
@@ -2257,29 +4419,98 @@ def get_user_notifications():
     try:
         current_user_id = get_jwt_identity()
         
-        notifications = Notification.query.filter_by(user_id=current_user_id).order_by(Notification.created_at.desc()).all()
+        notifications, next_cursor = keyset_page(Notification.query.filter_by(user_id=current_user_id), Notification)
         
-        result = []
-        for notification in notifications:
-            result.append({
-                'id': notification.id,
-                'title': notification.title,
-                'message': notification.message,
-                'type': notification.type,
-                'is_read': notification.is_read,
-                'booking_id': notification.booking_id,
-                'created_at': notification.created_at.isoformat()
-            })
+        result = [notification_payload(notification) for notification in notifications]
         
         return jsonify({
             'success': True,
             'notifications': result,
-            'unread_count': len([n for n in notifications if not n.is_read])
+            'unread_count': unread_notification_count(current_user_id),
+            'next_cursor': next_cursor
         }), 200
         
+    except InvalidCursor as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
+@app.route('/api/notifications/unread-count', methods=['GET'])
+@jwt_required()
+
+def get_unread_notification_count():
+    """Unread badge count as a single COUNT query"""
+    try:
+        return jsonify({
+            'success': True,
+            'unread_count': unread_notification_count(get_jwt_identity())
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+@app.route('/api/notifications/stream-token', methods=['POST'])
+@jwt_required()
+
+def notification_stream_token():
+    """Issue a short-lived token for opening the notification stream with EventSource"""
+    try:
+        return jsonify({
+            'success': True,
+            'stream_token': create_stream_token(get_jwt_identity(), get_jwt().get('ver', 0)),
+            'expires_in': app.config['NOTIFICATION_STREAM_TOKEN_TTL']
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+@app.route('/api/notifications/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+
+def stream_notifications():
+    """Server-Sent Events stream of new notifications and unread-count changes"""
+    # URLs end up in access logs, so only a short-lived stream token may ride in ?jwt=
+    if get_jwt_request_location() == 'query_string' and get_jwt().get('scope') != STREAM_TOKEN_SCOPE:
+        return jsonify({'message': 'Use a stream token from /api/notifications/stream-token'}), 401
+    
+    current_user_id = get_jwt_identity()
+    # Subscribe before counting, so a notification committed in between is never missed.
+    # One already counted is also in sent (read first), and its queued copy is dropped
+    subscriber = notification_broker.subscribe(current_user_id)
+    try:
+        sent = recent_notification_ids(current_user_id)
+        unread_count = unread_notification_count(current_user_id)
+    except Exception as e:
+        notification_broker.unsubscribe(current_user_id, subscriber)
+        return jsonify({'message': str(e)}), 500
+    
+    heartbeat = app.config['NOTIFICATION_STREAM_HEARTBEAT']
+    notification_poller.start()
+    
+    def generate():
+        # Runs after the request context is gone: no DB access, the connection is already returned
+        try:
+            yield f"retry: {heartbeat * 1000}\n"
+            yield format_sse('unread_count', {'unread_count': unread_count})
+            while True:
+                try:
+                    name, data = subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if name == 'notification':
+                    if data['notification']['id'] in sent:
+                        continue
+                    sent.add(data['notification']['id'])
+                yield format_sse(name, data)
+        finally:
+            notification_broker.unsubscribe(current_user_id, subscriber)
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/notifications/<notification_id>/read', methods=['PUT'])
 @jwt_required()
 
@@ -2360,6 +4591,8 @@ def booking_services(booking_id):
             # Update booking total price
             booking.total_price += total_price
             
+            db.session.flush()
+            enqueue_job('booking_service_added', {'booking_service_id': booking_service.id})
             db.session.commit()
             
             return jsonify({
@@ -2371,12 +4604,55 @@ def booking_services(booking_id):
         db.session.rollback()
         return jsonify({'message': str(e)}), 400
 
+@app.cli.command('worker')
+@click.option('--batch-size', default=10, show_default=True, help='Jobs claimed per poll')
+@click.option('--once', is_flag=True, help='Exit when no job is due instead of polling')
+def worker_command(batch_size, once):
+    """Run the background job worker"""
+    print(f"👷 Job worker started ({', '.join(sorted(JOB_HANDLERS))})")
+    run_worker(batch_size=batch_size, once=once)
+
+@app.cli.command('rebuild-room-nights')
+def rebuild_room_nights_command():
+    """Rebuild the room-night ledger from bookings"""
+    print(f"✅ {rebuild_room_nights()} room-nights recorded")
+
+@app.cli.command('build-photo-variants')
+def build_photo_variants_command():
+    """Generate missing size variants for existing room photos"""
+    pending = [photo.id for photo in RoomPhoto.query.filter(RoomPhoto.variants.is_(None))]
+    for photo_id in pending:
+        try:
+            process_room_photo(photo_id)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ ERROR processing photo {photo_id}: {str(e)}")
+    print(f"✅ Processed {len(pending)} room photos")
+
+@app.cli.command('rebuild-rating-summary')
+def rebuild_rating_summary_command():
+    """Recompute the rating_summary aggregates from the ratings table"""
+    print(f"✅ {rebuild_rating_summary()} rating summaries recorded")
+
+@app.cli.command('rebuild-dashboard-counters')
+def rebuild_dashboard_counters_command():
+    """Recompute the sharded dashboard counters from bookings, rooms and ratings"""
+    counters = rebuild_dashboard_counters()
+    print(f"✅ {len(counters)} dashboard counters recorded")
+
 if __name__ == '__main__':
     with app.app_context():
         try:
             print("🔧 Creating database tables...")
             db.create_all()
             print("✅ Database tables created!")
+            add_missing_columns()
+            ensure_indexes()
+            
+            if not RoomNight.query.first() and Booking.query.first():
+                print("🔄 Building room-night ledger from existing bookings...")
+                print(f"✅ {rebuild_room_nights()} room-nights recorded")
             
             print("🔄 Running migration for room status...")
             try:
@@ -2405,6 +4681,10 @@ if __name__ == '__main__':
         except Exception as e:
             print(f"❌ Error: {e}")
     
+    if app.config['JOB_LOCAL_WORKER']:
+        start_local_worker()
+        print("👷 Background job worker running in-process")
+    
     print("🚀 Server starting on http://localhost:5000")
     print("✅ CORS Enabled for: http://localhost:3000")
     print("🔧 CORS Configuration: supports_credentials=True")
@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Tests run against a throwaway SQLite file unless TEST_MYSQL_URL points at a
+# disposable MySQL database (required by the concurrency and EXPLAIN tests).
+# Set before importing the app: the engine is configured at import time.
+_sqlite_dir = tempfile.mkdtemp(prefix='hotel-tests-')
+os.environ['DATABASE_URL'] = os.environ.get('TEST_MYSQL_URL') or f"sqlite:///{os.path.join(_sqlite_dir, 'test.db')}"
+os.environ.setdefault('JOB_LOCAL_WORKER', 'false')
+# Tests drive the notification poller by hand instead of its background thread
+os.environ.setdefault('NOTIFICATION_STREAM_POLL_INTERVAL', '0')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import single_app  # noqa: E402
+
+MYSQL_CONFIGURED = bool(os.environ.get('TEST_MYSQL_URL'))
+requires_mysql = pytest.mark.skipif(not MYSQL_CONFIGURED, reason='TEST_MYSQL_URL is not set')
+
+
+def reset_in_memory_state():
+    single_app.clear_catalog_caches()
+    single_app.catalog_version['seen'] = None
+    single_app.token_version_cache.clear()
+
+
+@pytest.fixture(scope='session')
+def app():
+    with single_app.app.app_context():
+        single_app.db.create_all()
+    return single_app.app
+
+
+@pytest.fixture
+def db(app):
+    """The app's db, emptied after each test"""
+    with app.app_context():
+        yield single_app.db
+        single_app.db.session.rollback()
+        for table in reversed(single_app.db.metadata.sorted_tables):
+            single_app.db.session.execute(table.delete())
+        single_app.db.session.commit()
+    reset_in_memory_state()
+
+
+@pytest.fixture
+def client(app, db):
+    return app.test_client()
@@ -0,0 +1,103 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import single_app
+from single_app import Booking, BookingRoom, RoomMaintenance, User, occupancy_matrix
+from test_dashboard_counters import setup_hotel
+
+pytestmark = pytest.mark.skipif(single_app.numpy is None, reason='numpy is not installed')
+
+
+def painted_by_hand(room_count, days, booked, maintenance):
+    """Cell by cell reference: maintenance over booked over free"""
+    rows = []
+    for row in range(room_count):
+        cells = ''
+        for day in range(days):
+            if any(r == row and start <= day < end for r, start, end in maintenance):
+                cells += '2'
+            elif any(r == row and start <= day < end for r, start, end in booked):
+                cells += '1'
+            else:
+                cells += '0'
+        rows.append(cells)
+    return rows
+
+
+def without_numpy(monkeypatch, function, *args):
+    with monkeypatch.context() as patched:
+        patched.setattr(single_app, 'numpy', None)
+        return function(*args)
+
+
+def random_intervals(rng, room_count, days, count):
+    intervals = []
+    for _ in range(count):
+        start = rng.randint(0, days)
+        intervals.append((rng.randrange(room_count), start, rng.randint(start, days)))
+    return intervals
+
+
+def test_numpy_and_pure_python_matrices_match(monkeypatch):
+    rng = random.Random(18)
+    for _ in range(200):
+        room_count, days = rng.randint(1, 12), rng.randint(1, 40)
+        booked = random_intervals(rng, room_count, days, rng.randint(0, 30))
+        maintenance = random_intervals(rng, room_count, days, rng.randint(0, 5))
+
+        expected = painted_by_hand(room_count, days, booked, maintenance)
+        assert occupancy_matrix(room_count, days, booked, maintenance) == expected
+        assert without_numpy(monkeypatch, occupancy_matrix, room_count, days, booked, maintenance) == expected
+
+
+def test_empty_hotel_and_empty_intervals(monkeypatch):
+    for args in ((0, 5, [], []), (2, 3, [], []), (2, 3, [(0, 1, 1), (1, 3, 3)], [(1, 0, 0)])):
+        assert occupancy_matrix(*args) == without_numpy(monkeypatch, occupancy_matrix, *args) == painted_by_hand(*args)
+
+
+def add_booking(db, room_id, check_in, check_out, status='confirmed'):
+    booking = Booking(user_id=User.query.filter_by(role='member').one().id, nik='1', guest_name='Guest', phone='0',
+                      check_in=check_in, check_out=check_out, total_guests=1, payment_method='cash',
+                      total_price=100, status=status)
+    db.session.add(booking)
+    db.session.flush()
+    db.session.add(BookingRoom(booking_id=booking.id, room_id=room_id, room_type='Deluxe', quantity=1,
+                               breakfast_option='with', price_per_night=100, subtotal=100))
+
+
+def add_maintenance(db, room_id, scheduled, completed=None, status='scheduled'):
+    db.session.add(RoomMaintenance(room_id=room_id, description='Work', scheduled_date=scheduled,
+                                   completed_date=completed, status=status))
+
+
+def test_calendar_clips_stays_to_the_window_with_and_without_numpy(client, db, monkeypatch):
+    rooms, _, _ = setup_hotel(db, rooms=6)
+    first = datetime.now().date() + timedelta(days=10)
+    day = lambda offset: first + timedelta(days=offset)
+
+    add_booking(db, rooms[0], day(-3), day(2))                          # starts before the window
+    add_booking(db, rooms[1], day(4), day(12), status='pending')        # ends after it
+    add_booking(db, rooms[2], day(-5), day(20), status='checked_in')    # covers all of it
+    add_maintenance(db, rooms[2], day(2), completed=day(3))             # completed date is inclusive
+    add_booking(db, rooms[3], day(1), day(3))
+    add_maintenance(db, rooms[3], day(5))                               # scheduled, no end: one day
+    add_booking(db, rooms[3], day(-4), day(0))                          # checks out on the first day
+    add_booking(db, rooms[3], day(7), day(9))                           # checks in the day after the window
+    add_booking(db, rooms[4], day(0), day(7), status='cancelled')
+    add_booking(db, rooms[4], day(2), day(4), status='checked_out')
+    add_maintenance(db, rooms[4], day(1), completed=day(2), status='completed')
+    add_maintenance(db, rooms[5], day(-2), status='in_progress')        # blocks to the end of the window
+    db.session.commit()
+
+    params = {'from': day(0).isoformat(), 'to': day(6).isoformat()}
+    response = client.get('/api/rooms/availability/calendar', query_string=params)
+    assert response.status_code == 200, response.get_json()
+    expected = ['1100000', '0000111', '1122111', '0110020', '0000000', '2222222']
+    assert [room['occupancy'] for room in response.get_json()['rooms']] == expected
+
+    with monkeypatch.context() as patched:
+        patched.setattr(single_app, 'numpy', None)
+        fallback = client.get('/api/rooms/availability/calendar', query_string=params)
+    assert fallback.get_json() == response.get_json()
@@ -0,0 +1,142 @@
+import pytest
+
+import single_app
+from single_app import Booking, Room, RoomNight, booking_transition_error
+from test_dashboard_counters import book, setup_hotel
+
+
+def statuses(db, booking_ids):
+    db.session.expire_all()
+    return [db.session.get(Booking, booking_id).status for booking_id in booking_ids]
+
+
+def room_state(db, room_id):
+    """(Room.status, number of ledger nights held) for one room"""
+    db.session.expire_all()
+    return db.session.get(Room, room_id).status, RoomNight.query.filter_by(room_id=room_id).count()
+
+
+def set_status(client, headers, booking_id, status):
+    return client.put(f'/api/admin/bookings/{booking_id}/status', headers=headers, json={'status': status})
+
+
+@pytest.mark.parametrize('old_status, new_status', [
+    ('pending', 'checked_in'),
+    ('pending', 'checked_out'),
+    ('confirmed', 'checked_out'),
+    ('checked_in', 'pending'),
+    ('checked_in', 'cancelled'),
+    ('checked_out', 'confirmed'),
+    ('checked_out', 'cancelled'),
+    ('cancelled', 'checked_in'),
+])
+def test_transition_outside_the_state_machine_is_rejected(old_status, new_status):
+    assert booking_transition_error(old_status, new_status) == \
+        f'Cannot change booking status from {old_status} to {new_status}'
+
+
+def test_allowed_repeated_and_unknown_statuses():
+    for old_status, allowed in single_app.BOOKING_TRANSITIONS.items():
+        for new_status in (*allowed, old_status):
+            assert booking_transition_error(old_status, new_status) is None
+    assert booking_transition_error('pending', 'archived') == 'Invalid status'
+
+
+def test_rejected_transition_leaves_booking_rooms_and_ledger_alone(client, db):
+    room_ids, admin, member = setup_hotel(db, rooms=1)
+    booking_id = book(client, member, room_ids[0])
+    for status in ('confirmed', 'checked_in', 'checked_out'):
+        assert set_status(client, admin, booking_id, status).status_code == 200
+
+    response = set_status(client, admin, booking_id, 'confirmed')
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Cannot change booking status from checked_out to confirmed'
+    assert statuses(db, [booking_id]) == ['checked_out']
+    assert room_state(db, room_ids[0]) == ('available', 0)
+
+
+def test_cancel_and_check_out_release_rooms_and_ledger(client, db):
+    room_ids, admin, member = setup_hotel(db, rooms=2)
+    cancelled, stayed = book(client, member, room_ids[0], nights=3), book(client, member, room_ids[1])
+    assert room_state(db, room_ids[0]) == ('booked', 3)
+    assert room_state(db, room_ids[1]) == ('booked', 2)
+
+    assert set_status(client, admin, cancelled, 'cancelled').status_code == 200
+    assert room_state(db, room_ids[0]) == ('available', 0)
+
+    for status in ('confirmed', 'checked_in'):
+        assert set_status(client, admin, stayed, status).status_code == 200
+        assert room_state(db, room_ids[1]) == ('booked', 2)
+    assert set_status(client, admin, stayed, 'checked_out').status_code == 200
+    assert room_state(db, room_ids[1]) == ('available', 0)
+
+    # Reinstating a cancelled booking takes its rooms and nights back
+    assert set_status(client, admin, cancelled, 'pending').status_code == 200
+    assert room_state(db, room_ids[0]) == ('booked', 3)
+
+
+def test_reinstating_a_cancelled_booking_fails_when_its_nights_were_rebooked(client, db):
+    room_ids, admin, member = setup_hotel(db, rooms=1)
+    cancelled = book(client, member, room_ids[0])
+    assert set_status(client, admin, cancelled, 'cancelled').status_code == 200
+    rebooked = book(client, member, room_ids[0])
+
+    assert set_status(client, admin, cancelled, 'confirmed').status_code == 409
+    assert statuses(db, [cancelled, rebooked]) == ['cancelled', 'pending']
+    assert RoomNight.query.filter_by(booking_id=rebooked).count() == 2
+
+
+def test_bulk_status_change_is_all_or_nothing(client, db):
+    room_ids, admin, member = setup_hotel(db, rooms=3)
+    bookings = [book(client, member, room_id) for room_id in room_ids]
+    assert set_status(client, admin, bookings[2], 'cancelled').status_code == 200
+
+    response = client.put('/api/admin/bookings/status', headers=admin,
+                          json={'booking_ids': bookings, 'status': 'checked_in'})
+    assert response.status_code == 400
+    errors = response.get_json()['errors']
+    assert errors == {
+        bookings[0]: 'Cannot change booking status from pending to checked_in',
+        bookings[1]: 'Cannot change booking status from pending to checked_in',
+        bookings[2]: 'Cannot change booking status from cancelled to checked_in',
+    }
+
+    response = client.put('/api/admin/bookings/status', headers=admin,
+                          json={'booking_ids': bookings, 'status': 'confirmed'})
+    assert response.status_code == 200, response.get_json()
+    assert statuses(db, bookings) == ['confirmed'] * 3
+    assert [room_state(db, room_id) for room_id in room_ids] == [('booked', 2)] * 3
+
+    # One booking that may not move blocks the whole batch
+    assert set_status(client, admin, bookings[0], 'checked_in').status_code == 200
+    response = client.put('/api/admin/bookings/status', headers=admin,
+                          json={'booking_ids': bookings, 'status': 'pending'})
+    assert response.status_code == 400
+    assert list(response.get_json()['errors']) == [bookings[0]]
+    assert statuses(db, bookings) == ['checked_in', 'confirmed', 'confirmed']
+
+    response = client.put('/api/admin/bookings/status', headers=admin,
+                          json={'booking_ids': [bookings[1], 'missing'], 'status': 'cancelled'})
+    assert response.status_code == 404
+    assert response.get_json()['booking_ids'] == ['missing']
+    assert statuses(db, bookings) == ['checked_in', 'confirmed', 'confirmed']
+
+
+def test_bulk_cancel_and_check_out_sync_rooms_and_ledger(client, db):
+    room_ids, admin, member = setup_hotel(db, rooms=4)
+    bookings = [book(client, member, room_id) for room_id in room_ids]
+    for status in ('confirmed', 'checked_in'):
+        response = client.put('/api/admin/bookings/status', headers=admin,
+                              json={'booking_ids': bookings[:2], 'status': status})
+        assert response.status_code == 200
+
+    response = client.put('/api/admin/bookings/status', headers=admin,
+                          json={'booking_ids': bookings[:2], 'status': 'checked_out'})
+    assert [update['old_status'] for update in response.get_json()['updated']] == ['checked_in', 'checked_in']
+    response = client.put('/api/admin/bookings/status', headers=admin,
+                          json={'booking_ids': bookings[2:], 'status': 'cancelled'})
+    assert response.get_json()['unchanged'] == 0
+
+    assert statuses(db, bookings) == ['checked_out', 'checked_out', 'cancelled', 'cancelled']
+    assert [room_state(db, room_id) for room_id in room_ids] == [('available', 0)] * 4
+    assert RoomNight.query.count() == 0
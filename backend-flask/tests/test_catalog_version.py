@@ -0,0 +1,86 @@
+import single_app
+from single_app import CacheVersion, Room, RoomPhoto, RoomType
+from test_room_listing import add_rooms
+
+
+def catalog_version(db):
+    return db.session.query(CacheVersion.version).filter_by(name='catalog').scalar() or 0
+
+
+def write_from_another_process(db, statement):
+    """Commit on a raw connection, bypassing this process's session hooks"""
+    with db.engine.begin() as connection:
+        connection.execute(statement)
+        connection.execute(CacheVersion.__table__.update().where(CacheVersion.name == 'catalog').values(
+            version=CacheVersion.version + 1))
+
+
+def expire_version_check():
+    single_app.catalog_version['checked_at'] = float('-inf')
+
+
+def test_catalog_writes_bump_the_shared_version_in_their_transaction(db):
+    before = catalog_version(db)
+    db.session.add(RoomType(name='Suite'))
+    single_app.invalidate_catalog_cache()
+    db.session.rollback()
+    assert catalog_version(db) == before
+
+    db.session.add(RoomType(name='Suite'))
+    single_app.invalidate_catalog_cache()
+    db.session.commit()
+    assert catalog_version(db) == before + 1
+
+
+def test_version_bump_from_another_process_clears_every_catalog_cache(client, db):
+    add_rooms(db, 2)
+    single_app.invalidate_catalog_cache()
+    db.session.commit()
+    assert len(client.get('/api/rooms').get_json()) == 2
+    single_app.facility_index.snapshot()
+    single_app.pricing_engine.snapshot()
+
+    booked = Room.query.filter_by(room_number='T0').one()
+    write_from_another_process(db, Room.__table__.update().where(Room.id == booked.id).values(status='booked'))
+
+    # Within the check interval the process still trusts its caches
+    assert len(client.get('/api/rooms').get_json()) == 2
+    expire_version_check()
+    single_app.sync_catalog_cache()
+    assert single_app.facility_index._snapshot is None
+    assert single_app.pricing_engine._snapshot is None
+    assert [room['room_number'] for room in client.get('/api/rooms').get_json()] == ['T1']
+
+
+def test_photo_job_invalidates_catalog_through_shared_version(client, db, monkeypatch):
+    add_rooms(db, 1)
+    photo = RoomPhoto.query.one()
+    url = f'/api/rooms/{photo.room_id}'
+    assert client.get(url).get_json()['photos'][0]['variants'] == {}
+    before = catalog_version(db)
+
+    variants = {'thumb': {'webp': 'uploads/rooms/variants/t0_thumb.webp'}}
+    monkeypatch.setattr(single_app, 'build_photo_variants', lambda path: variants)
+    job = single_app.enqueue_job('process_room_photo', {'photo_id': photo.id})
+    db.session.commit()
+    assert single_app.claim_jobs('test-worker', 1) == [job.id]
+    assert single_app.run_job(job.id)
+
+    assert catalog_version(db) == before + 1
+    assert client.get(url).get_json()['photos'][0]['variants'] == {
+        'thumb': {'webp': '/uploads/rooms/variants/t0_thumb.webp'}
+    }
+
+
+def test_build_photo_variants_command_saves_each_photo(app, db, monkeypatch):
+    add_rooms(db, 2)
+    variants = {'thumb': {'webp': 'uploads/rooms/variants/thumb.webp'}}
+    monkeypatch.setattr(single_app, 'build_photo_variants', lambda path: variants)
+    before = catalog_version(db)
+
+    result = app.test_cli_runner().invoke(args=['build-photo-variants'])
+
+    assert result.exit_code == 0
+    db.session.expire_all()
+    assert [photo.variants for photo in RoomPhoto.query] == [variants, variants]
+    assert catalog_version(db) == before + 2
@@ -0,0 +1,56 @@
+import threading
+from collections import Counter
+
+from flask_jwt_extended import create_access_token
+
+from conftest import requires_mysql
+from single_app import Booking, BookingRoom, Room, RoomNight, RoomType, User
+
+THREADS = 30
+ROOMS = 3
+
+
+@requires_mysql
+def test_concurrent_bookings_never_double_book_a_room(app, client, db):
+    # SQLite serializes writers anyway; the row locks and ledger constraint are exercised on MySQL
+    room_type = RoomType(name='Stress')
+    db.session.add(room_type)
+    db.session.flush()
+    rooms = [Room(room_type_id=room_type.id, room_number=f'S{i}', capacity=2,
+                  price_no_breakfast=100, price_with_breakfast=120) for i in range(ROOMS)]
+    users = [User(name=f'Stress {i}', email=f'stress_{i}@example.com', phone='0', role='member', password='x')
+             for i in range(THREADS)]
+    db.session.add_all(rooms + users)
+    db.session.commit()
+    room_ids = [room.id for room in rooms]
+    tokens = [create_access_token(identity=user.id) for user in users]
+
+    barrier = threading.Barrier(THREADS)
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def book(index):
+        payload = {
+            'nik': '1234567890', 'guest_name': f'Stress {index}', 'phone': '0',
+            'check_in': '2031-01-10', 'check_out': '2031-01-13', 'total_guests': 1,
+            'payment_method': 'cash',
+            'rooms': [{'room_id': room_ids[index % ROOMS], 'breakfast_option': 'without', 'quantity': 1}]
+        }
+        barrier.wait()
+        response = app.test_client().post('/api/bookings', json=payload,
+                                          headers={'Authorization': f'Bearer {tokens[index]}'})
+        with lock:
+            statuses[response.status_code] += 1
+
+    workers = [threading.Thread(target=book, args=(i,)) for i in range(THREADS)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    db.session.expire_all()
+    per_room = Counter(room_id for (room_id,) in db.session.query(BookingRoom.room_id).join(Booking))
+    assert statuses[500] == 0, statuses
+    assert statuses[201] == ROOMS, statuses
+    assert all(count == 1 for count in per_room.values()), per_room
+    assert db.session.query(RoomNight).count() == ROOMS * 3
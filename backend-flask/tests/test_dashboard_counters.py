@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import single_app
+from single_app import Room, RoomType, User, create_user_token
+
+
+def setup_hotel(db, rooms=5):
+    room_type = RoomType(name='Deluxe')
+    db.session.add(room_type)
+    db.session.flush()
+    db.session.add_all(Room(room_type_id=room_type.id, room_number=f'D{i}', capacity=2,
+                            price_no_breakfast=100, price_with_breakfast=125) for i in range(rooms))
+    admin = User(name='Admin', email='admin@example.com', phone='0', role='admin', password='x')
+    member = User(name='Member', email='member@example.com', phone='0', role='member', password='x')
+    db.session.add_all([admin, member])
+    db.session.commit()
+    room_ids = [room.id for room in Room.query.order_by(Room.room_number)]
+    return room_ids, auth(create_user_token(admin)), auth(create_user_token(member))
+
+
+def auth(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def book(client, headers, room_id, nights=2):
+    today = datetime.now().date()
+    response = client.post('/api/bookings', headers=headers, json={
+        'nik': '1234567890', 'guest_name': 'Guest', 'phone': '0',
+        'check_in': today.isoformat(), 'check_out': (today + timedelta(days=nights)).isoformat(),
+        'total_guests': 1, 'payment_method': 'cash',
+        'rooms': [{'room_id': room_id, 'breakfast_option': 'with', 'quantity': 1}]
+    })
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['booking_id']
+
+
+def assert_rollup_matches_source(db):
+    db.session.expire_all()
+    today = datetime.now().date()
+    expected = single_app.dashboard_stats(single_app.compute_dashboard_totals(today), today)
+    assert single_app.read_dashboard_counters() == pytest.approx(expected)
+
+
+def test_dashboard_rollup_follows_booking_and_rating_flows(client, db, monkeypatch):
+    monkeypatch.setitem(single_app.app.config, 'DASHBOARD_COUNTER_SHARDS', 4)
+    room_ids, admin, member = setup_hotel(db)
+    assert_rollup_matches_source(db)
+
+    first = book(client, member, room_ids[0])
+    assert_rollup_matches_source(db)
+
+    assert client.put(f'/api/admin/bookings/{first}/status', headers=admin, json={'status': 'confirmed'}).status_code == 200
+    assert_rollup_matches_source(db)
+
+    cancelled = book(client, member, room_ids[1])
+    assert client.put(f'/api/admin/bookings/{cancelled}/status', headers=admin, json={'status': 'cancelled'}).status_code == 200
+    assert_rollup_matches_source(db)
+
+    bulk = [book(client, member, room_id) for room_id in room_ids[2:]]
+    for status in ('confirmed', 'checked_in', 'checked_out'):
+        response = client.put('/api/admin/bookings/status', headers=admin, json={'booking_ids': bulk, 'status': status})
+        assert response.status_code == 200, response.get_json()
+        assert_rollup_matches_source(db)
+
+    response = client.post('/api/ratings', headers=member, json={'booking_id': bulk[0], 'star': 4})
+    assert response.status_code == 201, response.get_json()
+    assert_rollup_matches_source(db)
+
+
+def test_counter_changes_of_a_rolled_back_transaction_are_dropped(db):
+    setup_hotel(db, rooms=1)
+    assert_rollup_matches_source(db)
+    room = Room.query.one()
+    room.status = 'maintenance'
+    db.session.flush()
+    db.session.rollback()
+    db.session.add(RoomType(name='Unrelated'))
+    db.session.commit()
+    assert_rollup_matches_source(db)
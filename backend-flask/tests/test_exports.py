@@ -0,0 +1,128 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import single_app
+from single_app import Booking, BookingRoom, User
+from test_dashboard_counters import setup_hotel
+
+EXPORT_URL = '/api/admin/exports/bookings'
+
+
+def add_booking(db, room_ids, check_in, status, subtotals, created_at=None):
+    """A booking with one line per room; total_price is the sum of the line subtotals"""
+    booking = Booking(user_id=User.query.filter_by(role='member').one().id, nik='1', guest_name='Guest', phone='0',
+                      check_in=check_in, check_out=check_in + timedelta(days=2), total_guests=1,
+                      payment_method='cash', total_price=sum(subtotals), status=status,
+                      created_at=created_at or datetime.utcnow())
+    db.session.add(booking)
+    db.session.flush()
+    db.session.add_all(BookingRoom(booking_id=booking.id, room_id=room_id, room_type='Deluxe', quantity=1,
+                                   breakfast_option='without', price_per_night=subtotal / 2, subtotal=subtotal)
+                       for room_id, subtotal in zip(room_ids, subtotals))
+    return booking.id
+
+
+@pytest.fixture
+def hotel(db):
+    """Five bookings over four weeks, one of them over two rooms; returns (admin headers, first day, booking ids)"""
+    room_ids, admin, _ = setup_hotel(db, rooms=2)
+    first = datetime.now().date() + timedelta(days=7)
+    day = lambda offset: first + timedelta(days=offset)
+    bookings = {
+        'pending': add_booking(db, room_ids[:1], day(0), 'pending', [200.0]),
+        'confirmed': add_booking(db, room_ids, day(5), 'confirmed', [300.0, 150.0]),
+        'checked_in': add_booking(db, room_ids[:1], day(10), 'checked_in', [120.0]),
+        'checked_out': add_booking(db, room_ids[1:], day(15), 'checked_out', [400.0],
+                                   created_at=datetime.utcnow() - timedelta(days=30)),
+        'cancelled': add_booking(db, room_ids[:1], day(20), 'cancelled', [90.0]),
+    }
+    db.session.commit()
+    return admin, first, bookings
+
+
+def export(client, headers, **params):
+    response = client.get(EXPORT_URL, headers=headers, query_string=params)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    body = response.get_data(as_text=True)
+    if params.get('format') == 'ndjson':
+        assert response.mimetype == 'application/x-ndjson'
+        return [json.loads(line) for line in body.splitlines()]
+    assert response.mimetype == 'text/csv'
+    return list(csv.DictReader(io.StringIO(body)))
+
+
+def test_csv_and_ndjson_carry_the_same_lines(client, hotel):
+    admin, _, bookings = hotel
+    csv_rows = export(client, admin)
+    ndjson_rows = export(client, admin, format='ndjson')
+
+    assert len(csv_rows) == len(ndjson_rows) == 6
+    assert [row['booking_id'] for row in ndjson_rows] == [
+        bookings['pending'], bookings['confirmed'], bookings['confirmed'],
+        bookings['checked_in'], bookings['checked_out'], bookings['cancelled'],
+    ]
+    assert list(csv_rows[0]) == list(ndjson_rows[0]) == list(single_app.EXPORT_BOOKING_COLUMNS)
+    # CSV carries the same values as text
+    for csv_row, ndjson_row in zip(csv_rows, ndjson_rows):
+        assert csv_row == {column: '' if value is None else str(value) for column, value in ndjson_row.items()}
+
+
+def test_revenue_only_counts_dashboard_revenue_statuses(client, hotel):
+    admin, _, _ = hotel
+    rows = export(client, admin, format='ndjson')
+
+    revenue_by_status = {}
+    for row in rows:
+        revenue_by_status[row['status']] = revenue_by_status.get(row['status'], 0.0) + row['revenue']
+        if row['status'] in single_app.REVENUE_STATUSES:
+            assert row['revenue'] == row['subtotal']
+    # Pending bookings keep their booking_total but export no revenue
+    assert revenue_by_status == {'pending': 0.0, 'confirmed': 450.0, 'checked_in': 0.0,
+                                 'checked_out': 400.0, 'cancelled': 0.0}
+    assert {row['booking_total'] for row in rows if row['status'] == 'pending'} == {200.0}
+    assert {row['booking_total'] for row in rows if row['status'] == 'confirmed'} == {450.0}
+    assert sum(row['revenue'] for row in rows) == single_app.read_dashboard_counters()['total_revenue']
+
+
+def test_date_range_is_inclusive_on_the_chosen_date_field(client, hotel):
+    admin, first, bookings = hotel
+    day = lambda offset: (first + timedelta(days=offset)).isoformat()
+
+    rows = export(client, admin, format='ndjson', **{'from': day(5), 'to': day(15)})
+    assert {row['booking_id'] for row in rows} == {bookings['confirmed'], bookings['checked_in'], bookings['checked_out']}
+
+    rows = export(client, admin, format='ndjson', date_field='check_out', **{'from': day(2), 'to': day(2)})
+    assert {row['booking_id'] for row in rows} == {bookings['pending']}
+
+    today = datetime.utcnow().date().isoformat()
+    rows = export(client, admin, format='ndjson', date_field='created_at', **{'from': today, 'to': today})
+    assert bookings['checked_out'] not in {row['booking_id'] for row in rows}
+    assert len(rows) == 5
+
+
+def test_status_filter_and_empty_result(client, hotel):
+    admin, first, bookings = hotel
+    rows = export(client, admin, format='ndjson', status='confirmed')
+    assert sorted(row['room_number'] for row in rows) == ['D0', 'D1']
+    assert {row['booking_id'] for row in rows} == {bookings['confirmed']}
+
+    # An empty CSV still has its header line
+    response = client.get(EXPORT_URL, headers=admin, query_string={'status': 'cancelled', 'to': first.isoformat()})
+    assert response.get_data(as_text=True).strip() == ','.join(single_app.EXPORT_BOOKING_COLUMNS)
+    assert export(client, admin, format='ndjson', status='cancelled', to=first.isoformat()) == []
+
+
+@pytest.mark.parametrize('params', [
+    {'format': 'xlsx'},
+    {'date_field': 'nights'},
+    {'status': 'archived'},
+    {'from': '2026/01/01'},
+    {'from': '2026-02-01', 'to': '2026-01-01'},
+])
+def test_invalid_export_parameters(client, hotel, params):
+    admin, _, _ = hotel
+    assert client.get(EXPORT_URL, headers=admin, query_string=params).status_code == 400
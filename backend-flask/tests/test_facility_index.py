@@ -0,0 +1,85 @@
+import random
+
+import single_app
+from single_app import Facility, FacilityBitmapIndex, FacilityRoom
+from test_catalog_version import expire_version_check, write_from_another_process
+from test_dashboard_counters import setup_hotel
+
+
+def equip(db, room_ids, facility_names, assignments):
+    """Create the facilities and link them to rooms; assignments maps room index -> facility indexes"""
+    facilities = [Facility(name=name) for name in facility_names]
+    db.session.add_all(facilities)
+    db.session.flush()
+    for room, indexes in assignments.items():
+        db.session.add_all(FacilityRoom(room_id=room_ids[room], facility_id=facilities[i].id) for i in indexes)
+    single_app.invalidate_catalog_cache()
+    db.session.commit()
+    return [facility.id for facility in facilities]
+
+
+def matching_rooms(index, facility_ids):
+    positions, matches = index.rooms_with_all(facility_ids)
+    return {room_id for room_id, position in positions.items() if matches >> position & 1}
+
+
+def test_index_matches_a_scan_of_facility_room(db):
+    rng = random.Random(16)
+    room_ids, _, _ = setup_hotel(db, rooms=40)
+    facility_ids = equip(db, room_ids, [f'F{i}' for i in range(8)], {
+        room: rng.sample(range(8), rng.randint(0, 8)) for room in range(len(room_ids))
+    })
+    links = {}
+    for room_id, facility_id in db.session.query(FacilityRoom.room_id, FacilityRoom.facility_id):
+        links.setdefault(room_id, set()).add(facility_id)
+    index = FacilityBitmapIndex(ttl=60)
+
+    for _ in range(100):
+        wanted = rng.sample(facility_ids, rng.randint(1, 4))
+        assert matching_rooms(index, wanted + wanted[:1]) == {
+            room_id for room_id, facilities in links.items() if set(wanted) <= facilities
+        }
+        subset = rng.sample(room_ids, rng.randint(0, len(room_ids)))
+        assert index.facet_counts(subset) == {
+            facility_id: sum(facility_id in links.get(room_id, ()) for room_id in subset)
+            for facility_id in facility_ids if any(facility_id in facilities for facilities in links.values())
+        }
+
+    assert matching_rooms(index, [facility_ids[0], 'no-such-facility']) == set()
+    assert set(index.facet_counts(['no-such-room']).values()) <= {0}
+
+
+def test_room_listing_filters_and_counts_facilities(client, db):
+    room_ids, _, _ = setup_hotel(db, rooms=4)
+    wifi, pool, spa = equip(db, room_ids, ['Wifi', 'Pool', 'Spa'], {0: [0, 1], 1: [0, 1, 2], 2: [0], 3: []})
+
+    response = client.get('/api/rooms', query_string={'facilities[]': [wifi, pool]})
+    assert sorted(room['room_number'] for room in response.get_json()) == ['D0', 'D1']
+    response = client.get('/api/rooms', query_string={'facilities': [spa], 'with_facets': 'true'})
+    assert [room['room_number'] for room in response.get_json()['rooms']] == ['D1']
+    assert response.get_json()['facets'] == {wifi: 1, pool: 1, spa: 1}
+
+    response = client.get('/api/rooms', query_string={'with_facets': '1'})
+    assert len(response.get_json()['rooms']) == 4
+    assert response.get_json()['facets'] == {wifi: 3, pool: 2, spa: 1}
+
+
+def test_facility_writes_refresh_the_index(client, db):
+    room_ids, admin, _ = setup_hotel(db, rooms=2)
+    wifi, pool = equip(db, room_ids, ['Wifi', 'Pool'], {0: [0], 1: [1]})
+    assert matching_rooms(single_app.facility_index, [wifi]) == {room_ids[0]}
+
+    # Written by this process: the index is dropped on commit
+    response = client.put(f'/api/admin/rooms/{room_ids[1]}', headers=admin, json={'facilities': [wifi, pool]})
+    assert response.status_code == 200, response.get_json()
+    assert matching_rooms(single_app.facility_index, [wifi]) == set(room_ids)
+
+    # Written by another process: dropped once the shared catalog version is checked again
+    write_from_another_process(db, FacilityRoom.__table__.delete().where(FacilityRoom.room_id == room_ids[0]))
+    assert matching_rooms(single_app.facility_index, [wifi]) == set(room_ids)
+    expire_version_check()
+    assert matching_rooms(single_app.facility_index, [wifi]) == {room_ids[1]}
+
+    # Deleting a room drops it from the index
+    assert client.delete(f'/api/admin/rooms/{room_ids[1]}', headers=admin).status_code == 200
+    assert matching_rooms(single_app.facility_index, [wifi]) == set()
@@ -0,0 +1,86 @@
+import json
+from datetime import datetime
+
+from flask_jwt_extended import create_access_token
+
+import single_app
+from single_app import Notification, User, notify_user
+
+
+def member(db):
+    user = User(name='Member', email='member@example.com', phone='0', role='member', password='x')
+    db.session.add(user)
+    db.session.commit()
+    return user.id, {'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+
+
+def stream_events(response):
+    """Yield (event, data) pairs from an open SSE response, skipping keep-alives"""
+    buffer = ''
+    for chunk in response.response:
+        buffer += chunk.decode() if isinstance(chunk, bytes) else chunk
+        while '\n\n' in buffer:
+            block, buffer = buffer.split('\n\n', 1)
+            fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':') and ': ' in line)
+            if 'event' in fields:
+                yield fields['event'], json.loads(fields['data'])
+
+
+def test_notification_committed_while_connecting_is_counted_once(client, db, monkeypatch):
+    user_id, headers = member(db)
+    recent = single_app.recent_notification_ids
+
+    def recent_after_a_concurrent_commit(uid):
+        # Lands after the stream subscribed but before it counted: counted and queued
+        notify_user(uid, 'Concurrent', 'message')
+        db.session.commit()
+        return recent(uid)
+
+    monkeypatch.setattr(single_app, 'recent_notification_ids', recent_after_a_concurrent_commit)
+    response = client.get('/api/notifications/stream', headers=headers, buffered=False)
+    monkeypatch.undo()
+    notify_user(user_id, 'Later', 'message')
+    db.session.commit()
+
+    events = stream_events(response)
+    assert next(events) == ('unread_count', {'unread_count': 1})
+    name, data = next(events)
+    assert name == 'notification' and data['notification']['title'] == 'Later'
+    response.close()
+
+
+def test_stream_in_the_url_takes_only_a_short_lived_stream_token(client, db):
+    _, headers = member(db)
+    access_token = headers['Authorization'].split()[1]
+    assert client.get(f'/api/notifications/stream?jwt={access_token}').status_code == 401
+
+    stream_token = client.post('/api/notifications/stream-token', headers=headers).get_json()['stream_token']
+    response = client.get(f'/api/notifications/stream?jwt={stream_token}', buffered=False)
+    assert response.status_code == 200
+    assert next(stream_events(response)) == ('unread_count', {'unread_count': 0})
+    response.close()
+
+    # It opens the stream and nothing else
+    assert client.get('/api/notifications', headers={'Authorization': f'Bearer {stream_token}'}).status_code == 401
+
+
+def test_poller_fans_out_notifications_committed_by_another_process(client, db):
+    user_id, headers = member(db)
+    response = client.get('/api/notifications/stream', headers=headers, buffered=False)
+    events = stream_events(response)
+    assert next(events) == ('unread_count', {'unread_count': 0})
+    assert single_app.notification_poller.poll() == 0
+
+    # The job worker commits in its own process: nothing reaches this process's broker
+    with db.engine.begin() as connection:
+        connection.execute(Notification.__table__.insert().values(
+            id='worker-notification', user_id=user_id, title='From the worker', message='message',
+            type='booking', is_read=False, created_at=datetime.utcnow()))
+
+    # One query for every open stream of the process, and each notification goes out once
+    assert single_app.notification_poller.poll() == 1
+    assert single_app.notification_poller.poll() == 0
+    name, data = next(events)
+    assert name == 'notification' and data['notification']['title'] == 'From the worker'
+    assert data['unread_delta'] == 1
+    response.close()
@@ -0,0 +1,32 @@
+from flask_jwt_extended import create_access_token
+
+from single_app import User, notify_user
+
+
+def member_headers(db):
+    user = User(name='Member', email='member@example.com', phone='0', role='member', password='x')
+    db.session.add(user)
+    db.session.commit()
+    return user.id, {'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+
+
+def test_list_without_limit_or_cursor_returns_everything(client, db):
+    user_id, headers = member_headers(db)
+    for i in range(60):
+        notify_user(user_id, f'Notification {i}', 'message')
+    db.session.commit()
+
+    response = client.get('/api/notifications', headers=headers).get_json()
+    assert len(response['notifications']) == 60
+    assert response['next_cursor'] is None
+
+    first = client.get('/api/notifications?limit=25', headers=headers).get_json()
+    rest = client.get(f"/api/notifications?cursor={first['next_cursor']}", headers=headers).get_json()
+    assert len(first['notifications']) + len(rest['notifications']) == 60
+
+
+def test_malformed_cursor_is_a_client_error(client, db):
+    _, headers = member_headers(db)
+    response = client.get('/api/notifications?cursor=not-a-cursor', headers=headers)
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Invalid cursor'
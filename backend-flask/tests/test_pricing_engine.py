@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import single_app
+from single_app import Promotion, PromotionPricingEngine, RoomType
+from test_catalog_version import expire_version_check, write_from_another_process
+
+
+def promotion(db, discount_type, value, days=(0, 30), min_nights=1, room_type=None, is_active=True):
+    today = datetime.now().date()
+    promo = Promotion(title=f'{discount_type} {value}', discount_type=discount_type, discount_value=value,
+                      min_nights=min_nights, valid_from=today + timedelta(days=days[0]),
+                      valid_until=today + timedelta(days=days[1]), is_active=is_active,
+                      room_type_id=room_type.id if room_type else None)
+    db.session.add(promo)
+    db.session.flush()
+    return promo
+
+
+def room_types(db, *names):
+    types = [RoomType(name=name) for name in names]
+    db.session.add_all(types)
+    db.session.flush()
+    return types
+
+
+def expected_discount(db, room_type_id, check_in, nights, amount):
+    """Largest discount of any eligible promotion, straight from the table"""
+    best = 0.0
+    for promo in Promotion.query.filter_by(is_active=True):
+        if promo.room_type_id not in (room_type_id, None) or not promo.valid_from <= check_in <= promo.valid_until:
+            continue
+        if (promo.min_nights or 1) > nights:
+            continue
+        if promo.discount_type == 'percentage':
+            best = max(best, amount * min(promo.discount_value, 100.0) / 100)
+        else:
+            best = max(best, min(promo.discount_value, amount))
+    return round(best, 2)
+
+
+def test_discount_steps_keep_the_best_of_each_kind_per_stay_length():
+    steps = PromotionPricingEngine.discount_steps([
+        ('p10', 'percentage', 10.0, 1),
+        ('f50', 'fixed', 50.0, 1),
+        ('p25', 'percentage', 25.0, 3),
+        ('p5', 'percentage', 5.0, 4),
+        ('f30', 'fixed', 30.0, 4),
+        ('p150', 'percentage', 150.0, 5),
+    ])
+    assert steps == [
+        ((0.0, None), (0.0, None)),
+        ((10.0, 'p10'), (50.0, 'f50')),
+        ((10.0, 'p10'), (50.0, 'f50')),
+        ((25.0, 'p25'), (50.0, 'f50')),
+        ((25.0, 'p25'), (50.0, 'f50')),
+        ((100.0, 'p150'), (50.0, 'f50')),
+    ]
+
+
+def test_percentage_fixed_and_min_nights(db):
+    engine = PromotionPricingEngine(ttl=60, horizon_days=30)
+    percentage = promotion(db, 'percentage', 10)
+    fixed = promotion(db, 'fixed', 50)
+    long_stay = promotion(db, 'percentage', 30, min_nights=5)
+    promotion(db, 'percentage', 90, is_active=False)
+    db.session.commit()
+    check_in = datetime.now().date() + timedelta(days=3)
+
+    assert engine.best_discount(None, check_in, 1, 1000) == (100.0, percentage.id)
+    assert engine.best_discount(None, check_in, 1, 300) == (50.0, fixed.id)
+    # A fixed discount never exceeds the amount
+    assert engine.best_discount(None, check_in, 1, 20) == (20.0, fixed.id)
+    assert engine.best_discount(None, check_in, 4, 1000) == (100.0, percentage.id)
+    assert engine.best_discount(None, check_in, 5, 1000) == (300.0, long_stay.id)
+    assert engine.best_discount(None, check_in, 12, 1000) == (300.0, long_stay.id)
+
+
+def test_room_type_promotions_only_apply_to_their_type(db):
+    engine = PromotionPricingEngine(ttl=60, horizon_days=30)
+    suite, standard = room_types(db, 'Suite', 'Standard')
+    everyone = promotion(db, 'percentage', 10)
+    suites_only = promotion(db, 'percentage', 20, room_type=suite)
+    db.session.commit()
+    check_in = datetime.now().date() + timedelta(days=1)
+
+    assert engine.best_discount(suite.id, check_in, 2, 500) == (100.0, suites_only.id)
+    assert engine.best_discount(standard.id, check_in, 2, 500) == (50.0, everyone.id)
+    # A type without promotions of its own falls back to the general table
+    assert engine.best_discount('unknown-type', check_in, 2, 500) == (50.0, everyone.id)
+
+
+def test_validity_window_and_dates_outside_the_horizon(db):
+    engine = PromotionPricingEngine(ttl=60, horizon_days=10)
+    today = datetime.now().date()
+    early = promotion(db, 'fixed', 40, days=(0, 5))
+    late = promotion(db, 'percentage', 15, days=(8, 60))
+    db.session.commit()
+
+    assert engine.best_discount(None, today + timedelta(days=5), 1, 100) == (40.0, early.id)
+    assert engine.best_discount(None, today + timedelta(days=6), 1, 100) == (0.0, None)
+    assert engine.best_discount(None, today + timedelta(days=9), 1, 100) == (15.0, late.id)
+    # Past the compiled horizon the promotions are evaluated directly
+    assert engine.best_discount(None, today + timedelta(days=40), 1, 100) == (15.0, late.id)
+    assert engine.best_discount(None, today + timedelta(days=61), 1, 100) == (0.0, None)
+
+
+def test_engine_matches_direct_evaluation_inside_and_past_the_horizon(db):
+    engine = PromotionPricingEngine(ttl=60, horizon_days=14)
+    suite, standard = room_types(db, 'Suite', 'Standard')
+    specs = [
+        ('percentage', 12, (0, 20), 1, None),
+        ('fixed', 80, (3, 40), 2, None),
+        ('percentage', 25, (5, 9), 3, suite),
+        ('fixed', 200, (10, 30), 7, suite),
+        ('percentage', 18, (12, 25), 1, standard),
+        ('fixed', 35, (0, 2), 1, standard),
+    ]
+    for discount_type, value, days, min_nights, room_type in specs:
+        promotion(db, discount_type, value, days=days, min_nights=min_nights, room_type=room_type)
+    db.session.commit()
+
+    today = datetime.now().date()
+    for room_type_id in (suite.id, standard.id, None):
+        for offset in range(0, 45, 2):
+            check_in = today + timedelta(days=offset)
+            for nights in (1, 2, 3, 7, 10):
+                for amount in (150.0, 900.0):
+                    discount, promotion_id = engine.best_discount(room_type_id, check_in, nights, amount)
+                    assert discount == pytest.approx(expected_discount(db, room_type_id, check_in, nights, amount))
+                    assert (promotion_id is None) == (discount == 0)
+
+
+def test_promotion_writes_refresh_the_engine(db):
+    single_app.invalidate_catalog_cache()
+    db.session.commit()
+    check_in = datetime.now().date() + timedelta(days=2)
+    assert single_app.pricing_engine.best_discount(None, check_in, 1, 100) == (0.0, None)
+
+    # Written by this process: dropped on commit
+    promo = promotion(db, 'percentage', 10)
+    single_app.invalidate_catalog_cache()
+    db.session.commit()
+    assert single_app.pricing_engine.best_discount(None, check_in, 1, 100) == (10.0, promo.id)
+
+    # Written by another process: dropped once the shared version is checked again
+    write_from_another_process(db, Promotion.__table__.update().where(Promotion.id == promo.id).values(discount_value=20))
+    assert single_app.pricing_engine.best_discount(None, check_in, 1, 100) == (10.0, promo.id)
+    expire_version_check()
+    assert single_app.pricing_engine.best_discount(None, check_in, 1, 100) == (20.0, promo.id)
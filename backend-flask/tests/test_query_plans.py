@@ -0,0 +1,63 @@
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import select
+
+from conftest import requires_mysql
+from single_app import (Booking, BookingRoom, Notification, Rating, RoomMaintenance,
+                        CHECKIN_STATUSES, CHECKOUT_STATUSES)
+
+SAMPLE_ID = '00000000-0000-0000-0000-000000000000'
+HOT_QUERY_NAMES = (
+    'my bookings', 'admin bookings page', 'admin bookings next page', 'check-ins from today',
+    'check-outs from today', 'booking rooms of bookings', 'ratings page', 'rating of booking',
+    'notifications page', 'unread notifications', 'upcoming maintenance', 'room maintenance schedule',
+)
+
+
+def hot_queries(db):
+    today = date.today()
+    now = datetime.utcnow()
+    return {
+        'my bookings': select(Booking).where(Booking.user_id == SAMPLE_ID)
+            .order_by(Booking.created_at.desc()),
+        'admin bookings page': select(Booking)
+            .order_by(Booking.created_at.desc(), Booking.id.desc()).limit(51),
+        'admin bookings next page': select(Booking)
+            .where(db.or_(Booking.created_at < now, db.and_(Booking.created_at == now, Booking.id < SAMPLE_ID)))
+            .order_by(Booking.created_at.desc(), Booking.id.desc()).limit(51),
+        'check-ins from today': select(Booking.check_in, db.func.count(Booking.id))
+            .where(Booking.check_in >= today, Booking.status.in_(CHECKIN_STATUSES)).group_by(Booking.check_in),
+        'check-outs from today': select(Booking.check_out, db.func.count(Booking.id))
+            .where(Booking.check_out >= today, Booking.status.in_(CHECKOUT_STATUSES)).group_by(Booking.check_out),
+        'booking rooms of bookings': select(BookingRoom).where(BookingRoom.booking_id.in_([SAMPLE_ID])),
+        'ratings page': select(Rating)
+            .order_by(Rating.created_at.desc(), Rating.id.desc()).limit(51),
+        'rating of booking': select(Rating).where(Rating.booking_id == SAMPLE_ID).limit(1),
+        'notifications page': select(Notification).where(Notification.user_id == SAMPLE_ID)
+            .order_by(Notification.created_at.desc(), Notification.id.desc()).limit(51),
+        'unread notifications': select(db.func.count(Notification.id))
+            .where(Notification.user_id == SAMPLE_ID, Notification.is_read.is_(False)),
+        'upcoming maintenance': select(RoomMaintenance).where(RoomMaintenance.scheduled_date >= today)
+            .order_by(RoomMaintenance.scheduled_date),
+        'room maintenance schedule': select(RoomMaintenance)
+            .where(RoomMaintenance.room_id == SAMPLE_ID, RoomMaintenance.scheduled_date >= today),
+    }
+
+
+def full_scans(connection, statement):
+    """EXPLAIN rows that scan a table with no usable index"""
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+    result = connection.exec_driver_sql('EXPLAIN ' + sql)
+    rows = [dict(zip(result.keys(), row)) for row in result]
+    # On small tables MySQL may prefer a scan even when an index exists, so only
+    # a scan with no usable index at all counts as a failure
+    return [f"{row['table']}: type={row['type']} key={row['key']}"
+            for row in rows if row['type'] == 'ALL' and not row['possible_keys']]
+
+
+@requires_mysql
+@pytest.mark.parametrize('name', HOT_QUERY_NAMES)
+def test_hot_query_uses_an_index(db, name):
+    with db.engine.connect() as connection:
+        assert full_scans(connection, hot_queries(db)[name]) == []
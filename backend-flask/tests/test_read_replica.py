@@ -0,0 +1,80 @@
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+
+import single_app
+from single_app import LAST_WRITE_COOKIE, RoomType
+from test_dashboard_counters import book, setup_hotel
+
+
+@pytest.fixture
+def replica(db, monkeypatch):
+    """An empty replica bind, so every row read from it is visibly missing"""
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='hotel-replica-'), 'replica.db')}")
+    db.metadata.create_all(engine)
+    monkeypatch.setitem(db.engines, 'replica', engine)
+    yield engine
+    engine.dispose()
+
+
+def calendar_rooms(client):
+    today = datetime.now().date()
+    response = client.get('/api/rooms/availability/calendar',
+                          query_string={'from': today.isoformat(), 'to': (today + timedelta(days=3)).isoformat()})
+    assert response.status_code == 200, response.get_json()
+    return len(response.get_json()['rooms'])
+
+
+def test_clients_read_their_own_writes_from_the_primary(app, db, replica):
+    room_ids, _, member = setup_hotel(db, rooms=2)
+    writer, other = app.test_client(), app.test_client()
+    assert calendar_rooms(writer) == 0
+
+    book(writer, member, room_ids[0])
+    assert writer.get_cookie(LAST_WRITE_COOKIE) is not None
+    assert calendar_rooms(writer) == 2
+    # Another client is not held back by someone else's write
+    assert other.get_cookie(LAST_WRITE_COOKIE) is None
+    assert calendar_rooms(other) == 0
+
+    # Back on the replica once the sticky window has passed
+    expired = time.time() - single_app.app.config['DB_REPLICA_STICKY_SECONDS'] - 1
+    writer.set_cookie(LAST_WRITE_COOKIE, f'{expired:.3f}')
+    assert calendar_rooms(writer) == 0
+    writer.set_cookie(LAST_WRITE_COOKIE, 'garbage')
+    assert calendar_rooms(writer) == 0
+
+
+def test_rolled_back_and_read_only_requests_do_not_pin_the_client(app, db, replica):
+    room_ids, _, member = setup_hotel(db, rooms=1)
+    client = app.test_client()
+
+    response = client.post('/api/bookings', headers=member, json={
+        'nik': '1', 'guest_name': 'Guest', 'phone': '0', 'check_in': '2026-01-02', 'check_out': '2026-01-01',
+        'total_guests': 1, 'payment_method': 'cash', 'rooms': [{'room_id': room_ids[0], 'quantity': 1}]
+    })
+    assert response.status_code == 400
+    assert client.get('/api/bookings/me', headers=member).status_code == 200
+    assert client.get_cookie(LAST_WRITE_COOKIE) is None
+    assert calendar_rooms(client) == 0
+
+
+def test_catalog_cache_is_not_refilled_from_a_lagging_replica(app, db, replica):
+    setup_hotel(db, rooms=2)
+    single_app.invalidate_catalog_cache()
+    db.session.commit()
+    client = app.test_client()
+
+    assert client.get('/api/rooms').get_json() == []
+    assert single_app.catalog_cache.get('/api/rooms?') is None
+
+    single_app.catalog_cache.cleared_at -= single_app.app.config['DB_REPLICA_STICKY_SECONDS'] + 1
+    # Let the replica catch up
+    with replica.begin() as connection:
+        connection.execute(RoomType.__table__.insert(), [{'id': 'rt', 'name': 'Caught up'}])
+    assert client.get('/api/room-types').get_json()['data'][0]['name'] == 'Caught up'
+    assert single_app.catalog_cache.get('/api/room-types?') is not None
@@ -0,0 +1,39 @@
+import re
+
+from single_app import Facility, FacilityRoom, Room, RoomPhoto, RoomType
+from conftest import reset_in_memory_state
+
+
+def add_rooms(db, count, start=0):
+    room_type = RoomType(name=f'Type {start}')
+    facilities = [Facility(name=f'Facility {start}-{i}') for i in range(3)]
+    db.session.add_all([room_type, *facilities])
+    db.session.flush()
+    for i in range(start, start + count):
+        room = Room(room_type_id=room_type.id, room_number=f'T{i}', capacity=2,
+                    price_no_breakfast=100, price_with_breakfast=120)
+        db.session.add(room)
+        db.session.flush()
+        db.session.add(RoomPhoto(room_id=room.id, photo_path=f'uploads/rooms/t{i}.jpg', is_primary=True))
+        db.session.add_all(FacilityRoom(room_id=room.id, facility_id=facility.id) for facility in facilities)
+    db.session.commit()
+
+
+def listing_query_count(client):
+    # Cold caches, so the listing really hits the database
+    reset_in_memory_state()
+    response = client.get('/api/rooms')
+    assert response.status_code == 200
+    # Server-Timing carries the g.sql_stats count: db;dur=...;desc="N queries"
+    return len(response.get_json()), int(re.search(r'desc="(\d+) queries"', response.headers['Server-Timing']).group(1))
+
+
+def test_room_listing_query_count_does_not_grow_with_rooms(client, db):
+    add_rooms(db, 5)
+    rooms, queries = listing_query_count(client)
+    assert rooms == 5
+
+    add_rooms(db, 5, start=5)
+    rooms, queries_doubled = listing_query_count(client)
+    assert rooms == 10
+    assert queries_doubled == queries
@@ -0,0 +1,40 @@
+from single_app import User, create_user_token, revoke_user_tokens, token_version_cache
+
+
+def add_user(db, role='member'):
+    user = User(name='User', email=f'{role}@example.com', phone='0', role=role, password='x')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def auth(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_rolled_back_revocation_leaves_tokens_valid(client, db):
+    user = add_user(db)
+    token = create_user_token(user)
+    assert client.get('/api/auth/me', headers=auth(token)).status_code == 200
+
+    revoke_user_tokens(user)
+    db.session.rollback()
+    assert token_version_cache.get(user.id) in (None, 0)
+    assert client.get('/api/auth/me', headers=auth(token)).status_code == 200
+
+
+def test_logout_revokes_every_session(client, db):
+    user = add_user(db)
+    first, second = create_user_token(user), create_user_token(user)
+    assert client.post('/api/auth/logout', headers=auth(first)).status_code == 200
+    assert client.get('/api/auth/me', headers=auth(second)).status_code == 401
+
+
+def test_role_change_revokes_tokens_with_the_old_role_claim(client, db):
+    user = add_user(db, role='admin')
+    token = create_user_token(user)
+    assert client.get('/api/admin/bookings', headers=auth(token)).status_code == 200
+
+    user.role = 'member'
+    db.session.commit()
+    assert client.get('/api/admin/bookings', headers=auth(token)).status_code == 401
@@ -103,6 +103,32 @@ export const adminAPI = {
     }
   },
 
+  // Move many bookings to one status in a single transaction (all or nothing)
+  bulkUpdateBookingStatus: async (bookingIds, status) => {
+    try {
+      console.log('🚀 API Request: PUT /admin/bookings/status')
+      const response = await api.put('/admin/bookings/status', { booking_ids: bookingIds, status })
+      console.log('✅ API Response:', response.status, '/admin/bookings/status')
+      return response.data
+    } catch (error) {
+      console.error('❌ Bulk Update Booking Status API Error:', error)
+      throw error
+    }
+  },
+
+  // Booking lines as a CSV or NDJSON file; params: format, from, to, date_field, status
+  exportBookings: async (params = {}) => {
+    try {
+      console.log('🚀 API Request: GET /admin/exports/bookings')
+      const response = await api.get('/admin/exports/bookings', { params, responseType: 'blob' })
+      console.log('✅ API Response:', response.status, '/admin/exports/bookings')
+      return response.data
+    } catch (error) {
+      console.error('❌ Export Bookings API Error:', error)
+      throw error
+    }
+  },
+
   // Reviews management
   getReviews: async (filters = {}) => {
     try {
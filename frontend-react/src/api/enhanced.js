@@ -36,6 +36,35 @@ export const enhancedAPI = {
     }
   },
 
+  // Rooms x days occupancy matrix ('0' available, '1' booked, '2' maintenance per day)
+  getAvailabilityCalendar: async (from, to, roomTypeId = null) => {
+    try {
+      console.log('🚀 API Request: GET /rooms/availability/calendar')
+      const params = { from, to }
+      if (roomTypeId) params.room_type_id = roomTypeId
+      
+      const response = await api.get('/rooms/availability/calendar', { params })
+      console.log('✅ API Response:', response.status, '/rooms/availability/calendar')
+      return response.data
+    } catch (error) {
+      console.error('❌ Availability Calendar API Error:', error)
+      throw error
+    }
+  },
+
+  // Price a booking with the best eligible promotion applied (nothing is reserved)
+  quoteBooking: async (bookingData) => {
+    try {
+      console.log('🚀 API Request: POST /bookings/quote')
+      const response = await api.post('/bookings/quote', bookingData)
+      console.log('✅ API Response:', response.status, '/bookings/quote')
+      return response.data
+    } catch (error) {
+      console.error('❌ Booking Quote API Error:', error)
+      throw error
+    }
+  },
+
   // Promotions
   getActivePromotions: async () => {
     try {
@@ -198,6 +227,20 @@ export const enhancedAPI = {
     }
   },
 
+  // Live notifications (SSE). EventSource cannot send headers, so the stream is opened
+  // with a short-lived stream token instead of the access token; fetch a new one per connect
+  openNotificationStream: async () => {
+    try {
+      console.log('🚀 API Request: POST /notifications/stream-token')
+      const response = await api.post('/notifications/stream-token')
+      console.log('✅ API Response:', response.status, '/notifications/stream-token')
+      return new EventSource(`${API_BASE_URL}/notifications/stream?jwt=${encodeURIComponent(response.data.stream_token)}`)
+    } catch (error) {
+      console.error('❌ Notification Stream API Error:', error)
+      throw error
+    }
+  },
+
   // Booking Services
   getBookingServices: async (bookingId) => {
     try {
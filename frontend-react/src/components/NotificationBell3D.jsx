@@ -4,7 +4,203 @@ import { Bell, X, Check, Calendar, Gift, AlertCircle } from 'lucide-react'
 import { enhancedAPI } from '../api/enhanced'
 import { useAuth } from '../context/AuthContext'
 
+const RECONNECT_DELAY = 5000
+
 const NotificationBell3D = () => {
   const [notifications, setNotifications] = useState([])
   const [showDropdown, setShowDropdown] = useState(false)
-  const [loading, setLoadi
\ No newline at end of file
+  const [loading, setLoading] = useState(true)
+  const [unreadCount, setUnreadCount] = useState(0)
+  const { isAuthenticated } = useAuth()
+
+  useEffect(() => {
+    if (!isAuthenticated) return
+    fetchNotifications()
+  }, [isAuthenticated])
+
+  // Live updates over SSE instead of polling; the badge follows the stream's unread count
+  useEffect(() => {
+    if (!isAuthenticated) return
+
+    let source = null
+    let reconnectTimer = null
+    let closed = false
+
+    const connect = async () => {
+      try {
+        const stream = await enhancedAPI.openNotificationStream()
+        if (closed) {
+          stream.close()
+          return
+        }
+        source = stream
+
+        source.addEventListener('unread_count', (event) => {
+          setUnreadCount(JSON.parse(event.data).unread_count)
+        })
+        source.addEventListener('notification', (event) => {
+          const { notification, unread_delta } = JSON.parse(event.data)
+          setNotifications((prev) => [notification, ...prev.filter((n) => n.id !== notification.id)])
+          setUnreadCount((prev) => Math.max(0, prev + unread_delta))
+        })
+        source.addEventListener('read', (event) => {
+          const { id, unread_delta } = JSON.parse(event.data)
+          setNotifications((prev) => prev.map((n) => (n.id === id ? { ...n, is_read: unread_delta < 0 } : n)))
+          setUnreadCount((prev) => Math.max(0, prev + unread_delta))
+        })
+        source.addEventListener('deleted', (event) => {
+          const { id, unread_delta } = JSON.parse(event.data)
+          setNotifications((prev) => prev.filter((n) => n.id !== id))
+          setUnreadCount((prev) => Math.max(0, prev + unread_delta))
+        })
+
+        // The stream token has expired by the time EventSource would retry, so reconnect with a fresh one
+        source.onerror = () => {
+          source.close()
+          if (!closed) reconnectTimer = setTimeout(connect, RECONNECT_DELAY)
+        }
+      } catch (error) {
+        if (!closed) reconnectTimer = setTimeout(connect, RECONNECT_DELAY)
+      }
+    }
+
+    connect()
+    return () => {
+      closed = true
+      clearTimeout(reconnectTimer)
+      if (source) source.close()
+    }
+  }, [isAuthenticated])
+
+  const fetchNotifications = async () => {
+    try {
+      const response = await enhancedAPI.getUserNotifications()
+      setNotifications(response.notifications || [])
+    } catch (error) {
+      console.error('Error fetching notifications:', error)
+    } finally {
+      setLoading(false)
+    }
+  }
+
+  const markAsRead = async (notificationId) => {
+    try {
+      await enhancedAPI.markNotificationRead(notificationId)
+      // The unread count is updated by the stream's 'read' event
+      setNotifications((prev) => prev.map((n) => (n.id === notificationId ? { ...n, is_read: true } : n)))
+    } catch (error) {
+      console.error('Error marking notification as read:', error)
+    }
+  }
+
+  const getNotificationIcon = (type) => {
+    switch (type) {
+      case 'booking':
+        return <Calendar className="w-5 h-5 text-blue-500" />
+      case 'promotion':
+        return <Gift className="w-5 h-5 text-pink-500" />
+      default:
+        return <AlertCircle className="w-5 h-5 text-orange-500" />
+    }
+  }
+
+  const formatDate = (dateString) => {
+    return new Date(dateString).toLocaleDateString('id-ID', {
+      day: 'numeric',
+      month: 'short',
+      hour: '2-digit',
+      minute: '2-digit'
+    })
+  }
+
+  if (!isAuthenticated) {
+    return null
+  }
+
+  return (
+    <div className="relative">
+      <motion.button
+        whileHover={{ scale: 1.1 }}
+        whileTap={{ scale: 0.9 }}
+        onClick={() => setShowDropdown(!showDropdown)}
+        className="relative p-2 rounded-full hover:bg-gray-100 transition-colors"
+      >
+        <Bell className="w-6 h-6 text-gray-700" />
+        {unreadCount > 0 && (
+          <motion.span
+            initial={{ scale: 0 }}
+            animate={{ scale: 1 }}
+            className="absolute -top-1 -right-1 bg-red-500 text-white text-xs font-bold rounded-full min-w-[20px] h-5 px-1 flex items-center justify-center"
+          >
+            {unreadCount > 99 ? '99+' : unreadCount}
+          </motion.span>
+        )}
+      </motion.button>
+
+      <AnimatePresence>
+        {showDropdown && (
+          <motion.div
+            initial={{ opacity: 0, y: -10, scale: 0.95 }}
+            animate={{ opacity: 1, y: 0, scale: 1 }}
+            exit={{ opacity: 0, y: -10, scale: 0.95 }}
+            className="absolute right-0 top-full mt-2 w-80 bg-white rounded-xl shadow-2xl border border-gray-200 z-50 overflow-hidden"
+          >
+            <div className="flex items-center justify-between px-4 py-3 border-b border-gray-200">
+              <h3 className="font-semibold text-gray-900">Notifications</h3>
+              <button
+                onClick={() => setShowDropdown(false)}
+                className="p-1 rounded-full hover:bg-gray-100 transition-colors"
+              >
+                <X className="w-4 h-4 text-gray-500" />
+              </button>
+            </div>
+
+            <div className="max-h-96 overflow-y-auto">
+              {loading ? (
+                <div className="p-6 text-center">
+                  <motion.div
+                    animate={{ rotate: 360 }}
+                    transition={{ duration: 2, repeat: Infinity, ease: "linear" }}
+                    className="w-6 h-6 border-2 border-blue-500 border-t-transparent rounded-full mx-auto"
+                  />
+                </div>
+              ) : notifications.length === 0 ? (
+                <p className="p-6 text-center text-gray-500">No notifications yet</p>
+              ) : (
+                notifications.map((notification) => (
+                  <motion.div
+                    key={notification.id}
+                    layout
+                    className={`flex items-start gap-3 px-4 py-3 border-b border-gray-100 ${
+                      notification.is_read ? 'bg-white' : 'bg-blue-50'
+                    }`}
+                  >
+                    <div className="mt-1">{getNotificationIcon(notification.type)}</div>
+                    <div className="flex-1 min-w-0">
+                      <p className="font-medium text-gray-900 text-sm">{notification.title}</p>
+                      <p className="text-gray-600 text-sm">{notification.message}</p>
+                      {notification.created_at && (
+                        <p className="text-gray-400 text-xs mt-1">{formatDate(notification.created_at)}</p>
+                      )}
+                    </div>
+                    {!notification.is_read && (
+                      <button
+                        onClick={() => markAsRead(notification.id)}
+                        className="p-1 rounded-full hover:bg-green-100 transition-colors"
+                        title="Mark as read"
+                      >
+                        <Check className="w-4 h-4 text-green-600" />
+                      </button>
+                    )}
+                  </motion.div>
+                ))
+              )}
+            </div>
+          </motion.div>
+        )}
+      </AnimatePresence>
+    </div>
+  )
+}
+
+export default NotificationBell3D